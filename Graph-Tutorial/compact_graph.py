@@ -0,0 +1,1662 @@
+#!python
+
+"""Read-only graphs stored as flat arrays (compressed sparse rows).
+
+A CompactGraph numbers the vertices 0..V-1 and keeps every neighbor list
+back to back in one array. The neighbors of vertex i are
+neighbors[offsets[i]:offsets[i + 1]], and weights lines up with neighbors.
+The arrays can be published into shared memory, so many worker processes
+can traverse one copy of the graph.
+"""
+
+from array import array
+from bisect import bisect_left
+from collections import deque
+import heapq
+import json
+import math
+import mmap
+import multiprocessing
+from multiprocessing import resource_tracker, shared_memory
+import random
+import struct
+
+
+# Header of a shared memory graph: magic, version, number of vertices,
+# number of edges, flags and the number of bytes used by the ids
+_HEADER = struct.Struct("<4sIqqqq")
+_MAGIC = b"CSRG"
+_VERSION = 1
+# Bits stored in the flags field of the header
+_DIRECTED = 1
+_WEIGHTED = 2
+_INT_IDS = 4
+_SORTED = 8
+
+
+def _attach_untracked(name):
+    """Attach to a shared memory block without taking ownership of it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    # Before Python 3.13, attaching registers the block with the resource
+    # tracker, which would unlink it when this process exits
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _build_alias_tables(offsets, weights):
+    """Return Walker alias tables for sampling each vertex's edges by weight.
+
+    Both tables line up with the neighbor array. To pick an edge of vertex i
+    with degree d, choose k in range(d) uniformly, then keep k with
+    probability prob[offsets[i] + k], else take alias[offsets[i] + k].
+    """
+    num_edges = len(weights)
+    prob = array("d", [1.0]) * num_edges
+    alias = array("q", [0]) * num_edges
+
+    for i in range(len(offsets) - 1):
+        low, high = offsets[i], offsets[i + 1]
+        degree = high - low
+        if degree == 0:
+            continue
+        total = sum(weights[low:high])
+        if min(weights[low:high]) < 0:
+            raise ValueError("random walks need non-negative edge weights")
+        # Edges that all weigh nothing are picked uniformly
+        if total == 0:
+            continue
+
+        # Scale the weights so the average edge has probability 1
+        scaled = [weight * degree / total for weight in weights[low:high]]
+        small = [k for k, x in enumerate(scaled) if x < 1]
+        large = [k for k, x in enumerate(scaled) if x >= 1]
+        # Pair each light edge with a heavy edge that tops it up to 1
+        while len(small) > 0 and len(large) > 0:
+            light = small.pop()
+            heavy = large.pop()
+            prob[low + light] = scaled[light]
+            alias[low + light] = heavy
+            scaled[heavy] -= 1 - scaled[light]
+            if scaled[heavy] < 1:
+                small.append(heavy)
+            else:
+                large.append(heavy)
+        # Whatever is left over is only off by rounding, so always keep it
+        for k in small + large:
+            prob[low + k] = 1.0
+    return prob, alias
+
+
+# Mask for 64 bit hash arithmetic
+_MASK_64 = (1 << 64) - 1
+# 2 ** -r for every possible HyperLogLog register value r
+_INVERSE_POWERS = [2.0 ** -r for r in range(65)]
+
+
+def _hll_hash(x):
+    """Return a well mixed 64 bit hash of a non-negative integer."""
+    # The splitmix64 finalizer
+    x = (x + 0x9E3779B97F4A7C15) & _MASK_64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK_64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK_64
+    return x ^ (x >> 31)
+
+
+def _hll_estimate(registers, alpha):
+    """Return the number of items counted by one HyperLogLog counter."""
+    m = len(registers)
+    estimate = alpha * m * m / sum(map(_INVERSE_POWERS.__getitem__,
+                                       registers))
+    # Small counts are more accurate from the number of empty registers
+    zeros = registers.count(0)
+    if estimate <= 2.5 * m and zeros > 0:
+        return m * math.log(m / zeros)
+    return estimate
+
+
+def _interpolate_hops(totals, fraction):
+    """Return the hops at which totals reaches fraction of its last value.
+
+    The answer is interpolated linearly between whole hops.
+    """
+    target = fraction * totals[-1]
+    for h, total in enumerate(totals):
+        if total >= target:
+            if h == 0:
+                return 0.0
+            return h - 1 + (target - totals[h - 1]) / (total - totals[h - 1])
+    return float(len(totals) - 1)
+
+
+def _louvain_level(offsets, neighbors, weights, rng):
+    """Move vertices between communities until modularity stops rising.
+
+    The graph is given as symmetric CSR arrays, where an entry from a vertex
+    to itself holds the weight inside that (merged) vertex. Return the
+    community of each vertex, numbered from 0, and whether any vertex moved.
+    """
+    num_vertices = len(offsets) - 1
+    # Weighted degree of each vertex, and twice the total edge weight
+    degrees = [sum(weights[offsets[i]:offsets[i + 1]])
+               for i in range(num_vertices)]
+    total = sum(degrees)
+    if total == 0:
+        return list(range(num_vertices)), False
+
+    community = list(range(num_vertices))
+    # Sum of the degrees of the vertices in each community
+    community_degree = degrees[:]
+    order = list(range(num_vertices))
+    rng.shuffle(order)
+    moved = False
+    improved = True
+    while improved:
+        improved = False
+        for i in order:
+            # Weight from vertex i into each neighboring community
+            links = {}
+            for k in range(offsets[i], offsets[i + 1]):
+                j = neighbors[k]
+                if j != i:
+                    links[community[j]] = links.get(community[j], 0) + \
+                        weights[k]
+
+            # Take vertex i out of its community, then put it back wherever
+            # it raises modularity the most
+            current = community[i]
+            community_degree[current] -= degrees[i]
+            scale = degrees[i] / total
+            best = current
+            best_gain = links.get(current, 0) - community_degree[current] * \
+                scale
+            for c, weight in links.items():
+                gain = weight - community_degree[c] * scale
+                if gain > best_gain + 1e-12:
+                    best = c
+                    best_gain = gain
+            community_degree[best] += degrees[i]
+            if best != current:
+                community[i] = best
+                improved = True
+                moved = True
+
+    # Number the communities from 0
+    numbers = {}
+    return [numbers.setdefault(c, len(numbers)) for c in community], moved
+
+
+def _aggregate(offsets, neighbors, weights, communities):
+    """Return CSR arrays of the graph with each community merged into one.
+
+    The weight inside a community becomes an entry from the new vertex to
+    itself, so the total weight of the graph stays the same.
+    """
+    num_communities = max(communities) + 1
+    merged = [{} for _ in range(num_communities)]
+    for i in range(len(offsets) - 1):
+        row = merged[communities[i]]
+        for k in range(offsets[i], offsets[i + 1]):
+            c = communities[neighbors[k]]
+            row[c] = row.get(c, 0) + weights[k]
+
+    new_offsets = array("q", [0])
+    new_neighbors = array("q")
+    new_weights = array("d")
+    for row in merged:
+        for c, weight in row.items():
+            new_neighbors.append(c)
+            new_weights.append(weight)
+        new_offsets.append(len(new_neighbors))
+    return new_offsets, new_neighbors, new_weights
+
+
+class DistanceMatrix(object):
+    """Dense table of shortest path distances between every pair of vertices.
+
+    Distances are stored row by row in one array of doubles, so the distance
+    from vertex index i to vertex index j is at i * V + j. Unreachable pairs
+    hold infinity. If predecessors were asked for, they are stored the same
+    way as vertex indices: the vertex before j on a shortest path from i, or
+    -1 when there is none.
+    """
+
+    def __init__(self, ids, path=None, predecessors=False):
+        """Initialize a table for the vertices in ids, filled with infinity.
+
+        path: if given, keep the distances in a file of that name (and the
+            predecessors in path + ".pred"), mapped into memory, instead of
+            on the heap
+        """
+        self.ids = ids
+        self.num_vertices = len(ids)
+        self.path = path
+        self._index = None
+        self._maps = []
+        cells = self.num_vertices * self.num_vertices
+        self.distances = self._allocate(path, "d", cells, float("inf"))
+        self.predecessors = None
+        if predecessors:
+            pred_path = None if path is None else path + ".pred"
+            self.predecessors = self._allocate(pred_path, "q", cells, -1)
+
+    def _allocate(self, path, typecode, cells, fill):
+        """Return an array of cells items of the typecode, all set to fill."""
+        if path is None:
+            return array(typecode, [fill]) * cells
+        item_size = array(typecode).itemsize
+        row = array(typecode, [fill]) * self.num_vertices
+        with open(path, "wb+") as f:
+            # Write one row at a time, rather than a whole table in memory
+            for _ in range(self.num_vertices):
+                f.write(row.tobytes())
+            f.flush()
+            if cells == 0:
+                return array(typecode)
+            mapped = mmap.mmap(f.fileno(), cells * item_size)
+        self._maps.append(mapped)
+        return memoryview(mapped).cast(typecode)
+
+    @property
+    def index(self):
+        """Return a dictionary mapping each vertex id to its vertex index."""
+        if self._index is None:
+            self._index = {key: i for i, key in enumerate(self.ids)}
+        return self._index
+
+    def __getitem__(self, pair):
+        """Return the distance from the first vertex id to the second."""
+        a, b = pair
+        return self.distances[self.index[a] * self.num_vertices +
+                              self.index[b]]
+
+    def row(self, key):
+        """Return the distances from the vertex id to every vertex, in order.
+        """
+        low = self.index[key] * self.num_vertices
+        return self.distances[low:low + self.num_vertices]
+
+    def path_between(self, a, b):
+        """Return the ids on a shortest path from a to b, or None.
+
+        Needs the table to have been built with predecessors.
+        """
+        if self.predecessors is None:
+            raise ValueError("the table was built without predecessors")
+        i = self.index[a]
+        j = self.index[b]
+        if i == j:
+            return [a]
+        if self.distances[i * self.num_vertices + j] == float("inf"):
+            return None
+        path = [j]
+        while path[-1] != i:
+            path.append(self.predecessors[i * self.num_vertices + path[-1]])
+        return [self.ids[k] for k in reversed(path)]
+
+    def _set_row(self, i, distances, predecessors=None):
+        """Store the distances (and predecessors) from vertex index i."""
+        low = i * self.num_vertices
+        high = low + self.num_vertices
+        self.distances[low:high] = array("d", distances)
+        if self.predecessors is not None and predecessors is not None:
+            self.predecessors[low:high] = array("q", predecessors)
+
+    def close(self):
+        """Release the memory mapped files, if there are any."""
+        if len(self._maps) == 0:
+            return
+        # Views have to be released before their maps can be closed
+        self.distances.release()
+        if self.predecessors is not None:
+            self.predecessors.release()
+        for mapped in self._maps:
+            mapped.close()
+        self._maps = []
+
+
+class CompactGraph(object):
+    """Read-only graph whose adjacency is stored in flat typed arrays."""
+
+    def __init__(self, ids, offsets, neighbors, weights, directed=True,
+                 weighted=False, sorted_neighbors=False):
+        """Initialize a compact graph from already built arrays.
+
+        ids: sequence mapping each vertex index to its vertex id
+        offsets: V + 1 integers, the neighbors of vertex i start at
+            offsets[i] and end before offsets[i + 1]
+        neighbors: vertex indices of every neighbor list, back to back
+        weights: edge weights lined up with neighbors
+        sorted_neighbors: True if each neighbor list is sorted by vertex id,
+            which lets find_path visit neighbors in Graph.find_path order
+        """
+        self.ids = ids
+        self.offsets = offsets
+        self.neighbor_array = neighbors
+        self.weight_array = weights
+        self.directed = directed
+        self.weighted = weighted
+        self.sorted_neighbors = sorted_neighbors
+        self.num_vertices = len(offsets) - 1
+        # Map each edge attribute name to an array lined up with neighbors
+        self.edge_attributes = {}
+        self._index = None
+        self._shm = None
+        # Random walk tables, built the first time a walk needs them
+        self._alias = None
+        self._index_sorted = None
+
+    @classmethod
+    def from_graph(cls, graph):
+        """Return a compact copy of a Graph, in vert_list order."""
+        ids = list(graph.vert_list)
+        index = {key: i for i, key in enumerate(ids)}
+
+        # Neighbor lists are sorted by id when every id can be compared
+        try:
+            sorted(ids)
+            sorted_neighbors = True
+        except TypeError:
+            sorted_neighbors = False
+
+        offsets = array("q", [0])
+        neighbors = array("q")
+        weights = array("d")
+        for vertex in graph.vert_list.values():
+            items = vertex.neighbors.items()
+            if sorted_neighbors:
+                items = sorted(items, key=lambda item: item[0].id)
+            for neighbor, weight in items:
+                neighbors.append(index[neighbor.id])
+                weights.append(weight)
+            offsets.append(len(neighbors))
+
+        compact = cls(ids, offsets, neighbors, weights,
+                      directed=graph.directed, weighted=graph.weighted,
+                      sorted_neighbors=sorted_neighbors)
+        compact._index = index
+        return compact
+
+    @classmethod
+    def from_edges(cls, edges, directed=True, weighted=False, attributes=(),
+                   vertices=()):
+        """Return a compact graph built straight from a stream of edges.
+
+        edges: tuples of (from_id, to_id), then the weight if weighted, then
+            one value per attribute. The same pair may appear more than
+            once, for example with different timestamps.
+        attributes: names of the edge attribute columns, such as
+            ("timestamp", "type"). Values must be numbers; a column is
+            stored as integers if every value is an int, else as doubles.
+        vertices: ids of vertices to include even if they have no edges
+
+        Undirected edges are stored in both directions, with the same
+        attributes. Vertices are numbered in order of first appearance.
+        """
+        index = {}
+        for key in vertices:
+            index.setdefault(key, len(index))
+
+        # Collect each vertex's edges, then lay them out row by row
+        rows = []
+        for edge in edges:
+            from_key, to_key = edge[0], edge[1]
+            values = tuple(edge[2:]) if weighted else (1,) + tuple(edge[2:])
+            if len(values) != 1 + len(attributes):
+                raise ValueError(f"Expected {len(attributes)} attribute "
+                                 f"values in edge {edge!r}")
+            for key in (from_key, to_key):
+                if key not in index:
+                    index[key] = len(index)
+            while len(rows) < len(index):
+                rows.append([])
+            rows[index[from_key]].append((index[to_key],) + values)
+            if not directed and from_key != to_key:
+                rows[index[to_key]].append((index[from_key],) + values)
+        while len(rows) < len(index):
+            rows.append([])
+
+        ids = list(index)
+        # Neighbor lists are sorted by id when every id can be compared
+        try:
+            sorted(ids)
+            sorted_neighbors = True
+        except TypeError:
+            sorted_neighbors = False
+
+        offsets = array("q", [0])
+        neighbors = array("q")
+        weights = array("d")
+        columns = [[] for _ in attributes]
+        for row in rows:
+            if sorted_neighbors:
+                # Stable, so repeated pairs keep their input order
+                row.sort(key=lambda item: ids[item[0]])
+            for item in row:
+                neighbors.append(item[0])
+                weights.append(item[1])
+                for column, value in zip(columns, item[2:]):
+                    column.append(value)
+            offsets.append(len(neighbors))
+
+        compact = cls(ids, offsets, neighbors, weights, directed=directed,
+                      weighted=weighted, sorted_neighbors=sorted_neighbors)
+        compact._index = index
+        for name, column in zip(attributes, columns):
+            compact.add_edge_attribute(name, column)
+        return compact
+
+    def add_edge_attribute(self, name, values):
+        """Store a column of edge attribute values, lined up with neighbors.
+
+        Values must be numbers; the column is stored as integers if every
+        value is an int, else as doubles.
+        """
+        values = list(values)
+        if len(values) != self.num_edges:
+            raise ValueError(f"Expected {self.num_edges} values for edge "
+                             f"attribute {name!r}, got {len(values)}")
+        if all(type(value) is int for value in values):
+            self.edge_attributes[name] = array("q", values)
+        else:
+            self.edge_attributes[name] = array("d", values)
+
+    def edge_mask(self, as_of=None, where=None):
+        """Return a bytearray marking the edges a filtered traversal may use.
+
+        as_of: only keep edges whose "timestamp" attribute is at most as_of
+        where: function called once with the edge_attributes dictionary, that
+            returns a sequence of booleans lined up with the edges, for
+            example lambda columns: [t == 2 for t in columns["type"]]
+
+        Returns None when there is no filter, so traversals can skip the
+        check.
+        """
+        if as_of is None and where is None:
+            return None
+        mask = bytearray(b"\x01") * self.num_edges
+        if as_of is not None:
+            if "timestamp" not in self.edge_attributes:
+                raise ValueError("as_of needs a timestamp edge attribute")
+            mask = bytearray(timestamp <= as_of for timestamp
+                             in self.edge_attributes["timestamp"])
+        if where is not None:
+            selected = bytearray(map(bool, where(self.edge_attributes)))
+            if len(selected) != self.num_edges:
+                raise ValueError("where must select from every edge")
+            mask = bytearray(map(min, mask, selected))
+        return mask
+
+    def _neighbors_in(self, i, mask):
+        """Return the neighbors of vertex i along edges allowed by mask."""
+        if mask is None:
+            return self.neighbors(i)
+        neighbors = self.neighbor_array
+        return [neighbors[k] for k in range(self.offsets[i],
+                                            self.offsets[i + 1]) if mask[k]]
+
+    def __len__(self):
+        """Return the number of vertices."""
+        return self.num_vertices
+
+    @property
+    def num_edges(self):
+        """Return the number of stored (directed) edges."""
+        return len(self.neighbor_array)
+
+    @property
+    def index(self):
+        """Return a dictionary mapping each vertex id to its vertex index."""
+        if self._index is None:
+            self._index = {key: i for i, key in enumerate(self.ids)}
+        return self._index
+
+    def get_index(self, key):
+        """Return the index of the vertex with the given id, else KeyError."""
+        if key not in self.index:
+            raise KeyError(f"Vertex({key}) is not in the Graph")
+        return self.index[key]
+
+    def neighbors(self, i):
+        """Return the indices of the neighbors of vertex i."""
+        return self.neighbor_array[self.offsets[i]:self.offsets[i + 1]]
+
+    def weights(self, i):
+        """Return the weights of the edges leaving vertex i."""
+        return self.weight_array[self.offsets[i]:self.offsets[i + 1]]
+
+    def degree(self, i):
+        """Return the number of edges leaving vertex i."""
+        return self.offsets[i + 1] - self.offsets[i]
+
+    def breadth_first_search(self, vertex, n, only_new=True, counts=False,
+                             as_of=None, where=None):
+        """Return the ids of all vertices n edges away from the vertex id.
+
+        counts: if True, return a dictionary mapping each id to its number of
+            walks (or shortest paths), like Graph.breadth_first_search
+        as_of, where: only follow the edges selected by edge_mask
+        """
+        start = self.get_index(vertex)
+        mask = self.edge_mask(as_of, where)
+
+        # Map each vertex index on the current level to its number of walks
+        frontier = {start: 1}
+        # When only new vertices count, remember every vertex already seen
+        seen = bytearray(self.num_vertices)
+        seen[start] = 1
+
+        for _ in range(n):
+            next_frontier = {}
+            for i, walks in frontier.items():
+                for j in self._neighbors_in(i, mask):
+                    # Skip vertices found on an earlier level
+                    if only_new and seen[j]:
+                        continue
+                    next_frontier[j] = next_frontier.get(j, 0) + walks
+            if only_new:
+                for j in next_frontier:
+                    seen[j] = 1
+            frontier = next_frontier
+            # Stop early when no vertex can be reached at this level
+            if len(frontier) == 0:
+                break
+
+        if counts:
+            return {self.ids[i]: walks for i, walks in frontier.items()}
+        return {self.ids[i] for i in frontier}
+
+    def _path_to(self, parents, start, end):
+        """Follow parents back from end to start, and return the ids."""
+        path = [end]
+        while path[-1] != start:
+            path.append(parents[path[-1]])
+        return [self.ids[i] for i in reversed(path)]
+
+    def find_shortest_path(self, start, end, as_of=None, where=None):
+        """Return the ids on a shortest path from start to end, or None.
+
+        as_of, where: only follow the edges selected by edge_mask, so
+            as_of=t finds a shortest path in the graph as it was at time t
+        """
+        start_index = self.get_index(start)
+        end_index = self.get_index(end)
+        mask = self.edge_mask(as_of, where)
+
+        # Like Graph.find_shortest_path, there is no path to the same vertex
+        if start_index == end_index:
+            return None
+
+        # -1 marks vertices that have not been found yet
+        parents = array("q", [-1]) * self.num_vertices
+        parents[start_index] = start_index
+        vertex_deque = deque([start_index])
+        while len(vertex_deque) > 0:
+            i = vertex_deque.popleft()
+            for j in self._neighbors_in(i, mask):
+                if parents[j] == -1:
+                    parents[j] = i
+                    # Stop as soon as the end vertex is reached
+                    if j == end_index:
+                        return self._path_to(parents, start_index, end_index)
+                    vertex_deque.append(j)
+        return None
+
+    def find_path(self, start, end):
+        """Return the ids on the depth first path from start to end, or None.
+
+        When neighbor lists are sorted, this is the same path as
+        Graph.find_path, but it stops as soon as the end vertex is found.
+        """
+        start_index = self.get_index(start)
+        end_index = self.get_index(end)
+
+        parents = array("q", [-1]) * self.num_vertices
+        parents[start_index] = start_index
+        if start_index == end_index:
+            return [start]
+
+        # Each stack entry remembers how far through its neighbors it got
+        stack = [(start_index, iter(self.neighbors(start_index)))]
+        while len(stack) > 0:
+            i, neighbor_iter = stack[-1]
+            for j in neighbor_iter:
+                if parents[j] == -1:
+                    parents[j] = i
+                    if j == end_index:
+                        return self._path_to(parents, start_index, end_index)
+                    # Descend into the new vertex before finishing this one
+                    stack.append((j, iter(self.neighbors(j))))
+                    break
+            else:
+                # Every neighbor has been visited, so backtrack
+                stack.pop()
+        return None
+
+    def _walk_tables(self, p, q):
+        """Return the tables random walks need, building them only once.
+
+        The tables are the alias tables (None for unweighted graphs, where
+        every edge is equally likely), and when p or q is not 1, a copy of
+        the neighbor array with each neighbor list sorted by index, for
+        checking whether two vertices are adjacent.
+        """
+        if self._alias is None and self.weighted:
+            self._alias = _build_alias_tables(self.offsets, self.weight_array)
+        if p == 1 and q == 1:
+            return self._alias, None
+
+        if self._index_sorted is None:
+            index_sorted = array("q")
+            for i in range(self.num_vertices):
+                index_sorted.extend(sorted(self.neighbors(i)))
+            self._index_sorted = index_sorted
+        return self._alias, self._index_sorted
+
+    def _random_walk(self, start, length, p, q, rng, alias, index_sorted):
+        """Return one walk of up to length vertex indices, starting at start.
+
+        With p = q = 1 each step follows an edge picked by weight. Otherwise
+        the step is biased like node2vec: returning to the previous vertex is
+        weighted by 1 / p, moving to a neighbor of the previous vertex by 1,
+        and moving further away by 1 / q. The bias is applied by rejection
+        sampling, so no per-edge second order tables are needed.
+        """
+        offsets = self.offsets
+        neighbor_array = self.neighbor_array
+        random_number = rng.random
+        biased = index_sorted is not None
+        if biased:
+            max_bias = max(1 / p, 1, 1 / q)
+
+        walk = array("q", [start])
+        previous = -1
+        current = start
+        while len(walk) < length:
+            low = offsets[current]
+            degree = offsets[current + 1] - low
+            # The walk ends early at a vertex without any edges out
+            if degree == 0:
+                break
+
+            while True:
+                # Pick an edge by weight, using the alias tables if weighted
+                k = int(random_number() * degree)
+                if alias is not None and random_number() >= alias[0][low + k]:
+                    k = alias[1][low + k]
+                candidate = neighbor_array[low + k]
+
+                # Unbiased walks, and the first step, accept any edge
+                if not biased or previous == -1:
+                    break
+                if candidate == previous:
+                    bias = 1 / p
+                else:
+                    # Check if the candidate is a neighbor of previous
+                    prev_low = offsets[previous]
+                    prev_high = offsets[previous + 1]
+                    position = bisect_left(index_sorted, candidate,
+                                           prev_low, prev_high)
+                    if position < prev_high and \
+                            index_sorted[position] == candidate:
+                        bias = 1
+                    else:
+                        bias = 1 / q
+                if random_number() * max_bias < bias:
+                    break
+
+            walk.append(candidate)
+            previous = current
+            current = candidate
+        return walk
+
+    def _random_walks(self, starts, length, p, q, n_per_node, seed):
+        """Return n_per_node walks from each start index, in order."""
+        rng = random.Random(seed)
+        alias, index_sorted = self._walk_tables(p, q)
+        return [self._random_walk(start, length, p, q, rng, alias,
+                                  index_sorted)
+                for start in starts for _ in range(n_per_node)]
+
+    def random_walks(self, starts=None, length=80, p=1, q=1, n_per_node=1,
+                     seed=None, processes=None):
+        """Return random walks as arrays of vertex indices.
+
+        starts: vertex ids to start walks from, or None for every vertex
+        length: number of vertices in each walk; a walk that reaches a vertex
+            without edges out stops early
+        p, q: node2vec return and in-out parameters
+        n_per_node: number of walks started from each start vertex
+        seed: seed for the random numbers, for repeatable walks
+        processes: if set, split the walks across this many processes, which
+            attach to the graph through shared memory
+
+        Walks come back grouped by start vertex. Look up the id of index i
+        with self.ids[i].
+        """
+        if p <= 0 or q <= 0:
+            raise ValueError("p and q must be positive")
+        if starts is None:
+            start_indices = range(self.num_vertices)
+        else:
+            start_indices = [self.get_index(key) for key in starts]
+
+        if processes is None or processes <= 1:
+            return self._random_walks(start_indices, length, p, q,
+                                      n_per_node, seed)
+
+        # Give each process a share of the start vertices, and a seed
+        base_seed = random.randrange(2 ** 32) if seed is None else seed
+        size = max(1, -(-len(start_indices) // processes))
+        chunks = [(start_indices[i:i + size], length, p, q, n_per_node,
+                   f"{base_seed}-{i}")
+                  for i in range(0, len(start_indices), size)]
+
+        shm = self.to_shared_memory()
+        try:
+            with multiprocessing.Pool(processes, initializer=_attach_worker,
+                                      initargs=(shm.name,)) as pool:
+                results = pool.map(_walk_chunk, chunks)
+        finally:
+            shm.close()
+            shm.unlink()
+
+        walks = []
+        for chunk in results:
+            for data in chunk:
+                walk = array("q")
+                walk.frombytes(data)
+                walks.append(walk)
+        return walks
+
+    def symmetric(self):
+        """Return the graph as an undirected, weighted CompactGraph.
+
+        Undirected graphs are returned as they are. For directed graphs, the
+        weight between two vertices is the sum of the weights of the edges
+        between them in both directions.
+        """
+        if not self.directed:
+            return self
+
+        # Add up the weights in both directions, one dictionary per vertex
+        merged = [{} for _ in range(self.num_vertices)]
+        for i in range(self.num_vertices):
+            for j, weight in zip(self.neighbors(i), self.weights(i)):
+                merged[i][j] = merged[i].get(j, 0) + weight
+                if i != j:
+                    merged[j][i] = merged[j].get(i, 0) + weight
+
+        offsets = array("q", [0])
+        neighbors = array("q")
+        weights = array("d")
+        for row in merged:
+            for j in sorted(row):
+                neighbors.append(j)
+                weights.append(row[j])
+            offsets.append(len(neighbors))
+        compact = CompactGraph(self.ids, offsets, neighbors, weights,
+                               directed=False, weighted=self.weighted)
+        compact._index = self._index
+        return compact
+
+    def communities(self, method="label_propagation", seed=None,
+                    max_rounds=100, processes=None):
+        """Return the community number of every vertex, as an integer array.
+
+        method: "label_propagation", where every vertex repeatedly takes the
+            label most common (by weight) among its neighbors, or "louvain",
+            which moves vertices between communities to raise modularity and
+            then merges each community into a single vertex, level by level
+        seed: seed for the random visiting order, for repeatable results
+        max_rounds: limit on label propagation rounds
+        processes: if set, run label propagation in synchronous rounds split
+            across this many processes
+
+        Edge direction is ignored, and weights are used if the graph is
+        weighted. Communities are numbered from 0, in order of each
+        community's first vertex.
+        """
+        graph = self.symmetric()
+        if not self.weighted:
+            # Unweighted graphs count every edge once
+            graph = CompactGraph(graph.ids, graph.offsets,
+                                 graph.neighbor_array,
+                                 array("d", [1.0]) * graph.num_edges,
+                                 directed=False)
+
+        if method == "label_propagation":
+            if processes is None or processes <= 1:
+                labels = graph._propagate_labels(random.Random(seed),
+                                                 max_rounds)
+            else:
+                labels = graph._propagate_labels_parallel(seed, max_rounds,
+                                                          processes)
+        elif method == "louvain":
+            labels = graph._louvain(random.Random(seed))
+        else:
+            raise ValueError(f"Unknown method {method!r}")
+
+        # Number the communities in order of appearance
+        numbers = {}
+        return array("q", [numbers.setdefault(label, len(numbers))
+                           for label in labels])
+
+    def vertex_order(self, strategy="bfs", seed=None):
+        """Return the vertex indices in an order that keeps neighbors close.
+
+        strategy: "bfs" (breadth first from each vertex not yet reached),
+            "rcm" (reverse Cuthill-McKee: breadth first from a low degree
+            vertex, lowest degree neighbors first, then reversed), "degree"
+            (highest degree first) or "rabbit" (grouped by Louvain
+            community, breadth first within each, in the spirit of Rabbit
+            Order)
+        seed: seed for the community detection used by "rabbit"
+
+        Edge direction is ignored.
+        """
+        graph = self.symmetric()
+        num_vertices = graph.num_vertices
+        if strategy == "degree":
+            # Stable, so ties keep their current order
+            return sorted(range(num_vertices), key=lambda i: -graph.degree(i))
+        if strategy == "bfs":
+            return graph._breadth_first_order(range(num_vertices))
+        if strategy == "rcm":
+            # Start each component from its lowest degree vertex
+            roots = sorted(range(num_vertices), key=graph.degree)
+            order = graph._breadth_first_order(roots, by_degree=True)
+            order.reverse()
+            return order
+        if strategy == "rabbit":
+            communities = self.communities("louvain", seed=seed)
+            order = graph._breadth_first_order(range(num_vertices))
+            # Keep the breadth first order inside each community
+            return sorted(order, key=communities.__getitem__)
+        raise ValueError(f"Unknown strategy {strategy!r}")
+
+    def _breadth_first_order(self, roots, by_degree=False):
+        """Return every vertex index, searching from each unreached root.
+
+        by_degree: if True, visit each vertex's neighbors lowest degree first
+        """
+        seen = bytearray(self.num_vertices)
+        order = []
+        for root in roots:
+            if seen[root]:
+                continue
+            seen[root] = 1
+            position = len(order)
+            order.append(root)
+            while position < len(order):
+                i = order[position]
+                position += 1
+                neighbors = self.neighbors(i)
+                if by_degree:
+                    neighbors = sorted(neighbors, key=self.degree)
+                for j in neighbors:
+                    if not seen[j]:
+                        seen[j] = 1
+                        order.append(j)
+        return order
+
+    def reorder(self, strategy="bfs", seed=None):
+        """Return a copy of the graph with its vertices renumbered.
+
+        The new vertex index i holds the vertex at vertex_order(strategy)[i].
+        Vertex ids, weights and edge attributes are kept, so queries by id
+        give the same answers.
+        """
+        order = self.vertex_order(strategy, seed)
+        new_index = array("q", [0]) * self.num_vertices
+        for new, old in enumerate(order):
+            new_index[old] = new
+
+        offsets = array("q", [0])
+        neighbors = array("q")
+        weights = array("d")
+        # Old edge positions, in their new order, to move edge attributes
+        positions = array("q")
+        for old in order:
+            low, high = self.offsets[old], self.offsets[old + 1]
+            neighbors.extend(new_index[j] for j in
+                             self.neighbor_array[low:high])
+            weights.extend(self.weight_array[low:high])
+            positions.extend(range(low, high))
+            offsets.append(len(neighbors))
+
+        compact = CompactGraph([self.ids[old] for old in order], offsets,
+                               neighbors, weights, directed=self.directed,
+                               weighted=self.weighted,
+                               sorted_neighbors=self.sorted_neighbors)
+        for name, column in self.edge_attributes.items():
+            compact.edge_attributes[name] = array(
+                column.typecode, [column[k] for k in positions])
+        return compact
+
+    def average_gap(self):
+        """Return the average distance between the indices of neighbors.
+
+        Lower values mean neighbors sit closer together in the arrays.
+        """
+        if self.num_edges == 0:
+            return 0.0
+        total = 0
+        for i in range(self.num_vertices):
+            for j in self.neighbors(i):
+                total += abs(i - j)
+        return total / self.num_edges
+
+    def partition(self, k, method="fennel", seed=None, passes=1,
+                  balance=1.1):
+        """Split the vertices into k shards with few edges between them.
+
+        Returns an integer array giving the shard of every vertex index.
+        Vertices are streamed in a random order and each is placed greedily:
+        method "ldg" (linear deterministic greedy) picks the shard holding
+        the most of its neighbors, scaled down as the shard fills up, and
+        "fennel" subtracts a penalty that grows with the shard's size
+        instead. Later passes restream the vertices, using where every
+        neighbor ended up in the pass before.
+
+        seed: seed for the streaming order, for repeatable results
+        balance: no shard gets more than balance * V / k vertices; it must
+            be at least 1, or the shards can't hold every vertex
+        Edge direction and weights are ignored.
+        """
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        if balance < 1:
+            raise ValueError("balance must be at least 1")
+        if method not in ("ldg", "fennel"):
+            raise ValueError(f"Unknown method {method!r}")
+        graph = self.symmetric()
+        num_vertices = graph.num_vertices
+        capacity = max(1, math.ceil(balance * num_vertices / k))
+        # Fennel's penalty, tuned as in the paper for gamma = 1.5
+        gamma = 1.5
+        num_edges = graph.num_edges / 2
+        alpha = math.sqrt(k) * num_edges / max(1, num_vertices) ** gamma
+
+        rng = random.Random(seed)
+        order = list(range(num_vertices))
+        rng.shuffle(order)
+        parts = array("q", [-1]) * num_vertices
+        sizes = [0] * k
+        for _ in range(passes):
+            for i in order:
+                # Take the vertex out of the shard it got in the last pass
+                if parts[i] != -1:
+                    sizes[parts[i]] -= 1
+                # Count the neighbors already placed in each shard
+                placed = {}
+                for j in graph.neighbors(i):
+                    if j != i and parts[j] != -1:
+                        placed[parts[j]] = placed.get(parts[j], 0) + 1
+
+                best = None
+                best_key = None
+                for shard in range(k):
+                    if sizes[shard] >= capacity:
+                        continue
+                    if method == "ldg":
+                        score = placed.get(shard, 0) * \
+                            (1 - sizes[shard] / capacity)
+                    else:
+                        score = placed.get(shard, 0) - alpha * gamma * \
+                            sizes[shard] ** (gamma - 1)
+                    # Ties go to the emptier shard
+                    key = (score, -sizes[shard])
+                    if best_key is None or key > best_key:
+                        best = shard
+                        best_key = key
+                parts[i] = best
+                sizes[best] += 1
+        return parts
+
+    def cut_size(self, parts):
+        """Return the number of edges joining vertices in different shards.
+
+        Edge direction is ignored, so each pair of neighbors counts once.
+        """
+        graph = self.symmetric()
+        cut = 0
+        for i in range(graph.num_vertices):
+            for j in graph.neighbors(i):
+                if i < j and parts[i] != parts[j]:
+                    cut += 1
+        return cut
+
+    def _best_label(self, i, labels, rng):
+        """Return the label with the most weight among vertex i's neighbors.
+
+        Ties keep the vertex's current label if it is one of the best, else
+        are broken at random.
+        """
+        totals = {}
+        for j, weight in zip(self.neighbors(i), self.weights(i)):
+            if j != i:
+                totals[labels[j]] = totals.get(labels[j], 0) + weight
+        if len(totals) == 0:
+            return labels[i]
+        best_weight = max(totals.values())
+        best = [label for label, weight in totals.items()
+                if weight == best_weight]
+        if labels[i] in best:
+            return labels[i]
+        return rng.choice(best)
+
+    def _propagate_labels(self, rng, max_rounds):
+        """Return labels from asynchronous label propagation."""
+        labels = array("q", range(self.num_vertices))
+        order = list(range(self.num_vertices))
+        for _ in range(max_rounds):
+            rng.shuffle(order)
+            changed = False
+            for i in order:
+                label = self._best_label(i, labels, rng)
+                if label != labels[i]:
+                    labels[i] = label
+                    changed = True
+            # Stop once every vertex agrees with its neighbors
+            if not changed:
+                break
+        return labels
+
+    def _propagate_labels_parallel(self, seed, max_rounds, processes):
+        """Return labels from synchronous label propagation in processes.
+
+        Each round, every process relabels its share of the vertices using
+        the labels from the end of the previous round. Fully synchronous
+        rounds can swap labels back and forth forever, so each vertex that
+        wants a new label only takes it with probability one half.
+        """
+        base_seed = random.randrange(2 ** 32) if seed is None else seed
+        size = max(1, -(-self.num_vertices // processes))
+        labels = array("q", range(self.num_vertices))
+
+        shm = self.to_shared_memory()
+        try:
+            with multiprocessing.Pool(processes, initializer=_attach_worker,
+                                      initargs=(shm.name,)) as pool:
+                for round_number in range(max_rounds):
+                    data = labels.tobytes()
+                    chunks = [(low, min(low + size, self.num_vertices), data,
+                               f"{base_seed}-{round_number}-{low}")
+                              for low in range(0, self.num_vertices, size)]
+                    new_labels = array("q")
+                    changed = False
+                    for chunk, chunk_changed in pool.map(_propagate_chunk,
+                                                         chunks):
+                        new_labels.frombytes(chunk)
+                        changed = changed or chunk_changed
+                    labels = new_labels
+                    # Stop once every vertex agrees with its neighbors
+                    if not changed:
+                        break
+        finally:
+            shm.close()
+            shm.unlink()
+        return labels
+
+    def _louvain(self, rng):
+        """Return labels from the Louvain method."""
+        # Which vertex of the current level each original vertex belongs to
+        membership = list(range(self.num_vertices))
+        offsets = self.offsets
+        neighbors = self.neighbor_array
+        weights = self.weight_array
+
+        while True:
+            communities, moved = _louvain_level(offsets, neighbors, weights,
+                                                rng)
+            if not moved:
+                break
+            membership = [communities[c] for c in membership]
+            offsets, neighbors, weights = _aggregate(offsets, neighbors,
+                                                     weights, communities)
+        return membership
+
+    def _hyper_anf(self, max_hops, precision, seed, keep_sizes):
+        """Run HyperANF, and return the per-vertex sizes and the totals.
+
+        Every vertex gets a HyperLogLog counter of 2 ** precision one byte
+        registers, starting out holding only itself. Each round, a vertex's
+        counter takes the union (register-wise maximum) of its neighbors'
+        counters, so after h rounds it counts the vertices within h hops.
+        Only neighbors whose counters changed in the last round can add
+        anything new, so each round skips the rest.
+        """
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        m = 1 << precision
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 /
+                                                     (1 + 1.079 / m))
+        salt = random.Random(seed).getrandbits(63)
+        num_vertices = self.num_vertices
+
+        # One counter per vertex, back to back
+        registers = bytearray(num_vertices * m)
+        for i in range(num_vertices):
+            x = _hll_hash(i + salt)
+            # The top bits pick a register, the rest give its value
+            rest = x & ((1 << (64 - precision)) - 1)
+            rank = 64 - precision - rest.bit_length() + 1
+            registers[i * m + (x >> (64 - precision))] = rank
+
+        estimates = array("d", [_hll_estimate(registers[i * m:(i + 1) * m],
+                                              alpha)
+                                for i in range(num_vertices)])
+        sizes = [estimates] if keep_sizes else None
+        totals = array("d", [sum(estimates)])
+        changed = bytearray(b"\x01") * num_vertices
+
+        hops = 0
+        while max_hops is None or hops < max_hops:
+            new_registers = bytearray(registers)
+            new_changed = bytearray(num_vertices)
+            new_estimates = array("d", estimates)
+            for i in range(num_vertices):
+                low = i * m
+                counter = None
+                for j in self.neighbors(i):
+                    if not changed[j]:
+                        continue
+                    if counter is None:
+                        counter = registers[low:low + m]
+                    other = registers[j * m:(j + 1) * m]
+                    if other != counter:
+                        counter = bytes(map(max, counter, other))
+                if counter is not None and \
+                        counter != registers[low:low + m]:
+                    new_registers[low:low + m] = counter
+                    new_changed[i] = 1
+                    new_estimates[i] = _hll_estimate(counter, alpha)
+
+            # Stop once no vertex's neighborhood grows any more
+            if new_changed.count(0) == num_vertices:
+                break
+            registers = new_registers
+            changed = new_changed
+            estimates = new_estimates
+            hops += 1
+            if keep_sizes:
+                sizes.append(estimates)
+            totals.append(sum(estimates))
+        return sizes, totals
+
+    def neighborhood_sizes(self, max_hops=None, precision=7, seed=None):
+        """Estimate how many vertices are within h hops of each vertex.
+
+        Returns a list of arrays, where sizes[h][i] is the estimated number of
+        vertices within h edges of vertex index i (counting itself). The list
+        stops at max_hops, or at the first hop where no neighborhood grows,
+        since every later hop would be the same.
+
+        precision: each counter uses 2 ** precision bytes, and the relative
+            error is about 1.04 / sqrt(2 ** precision)
+        seed: seed for the hash function, for repeatable estimates
+        """
+        return self._hyper_anf(max_hops, precision, seed, True)[0]
+
+    def neighborhood_function(self, max_hops=None, precision=7, seed=None):
+        """Estimate the number of pairs within h hops, for each hop h.
+
+        Returns an array whose item h is the sum of neighborhood_sizes at h,
+        without keeping every vertex's size for every hop.
+        """
+        return self._hyper_anf(max_hops, precision, seed, False)[1]
+
+    def effective_diameter(self, fraction=0.9, max_hops=None, precision=7,
+                           seed=None):
+        """Estimate the hops needed to connect fraction of connected pairs.
+
+        The value is interpolated between whole hops from the
+        neighborhood_function, as in the HyperANF paper.
+        """
+        totals = self.neighborhood_function(max_hops, precision, seed)
+        return _interpolate_hops(totals, fraction)
+
+    def _sweep(self, start):
+        """Run a breadth first search, and return the distances and order.
+
+        distances[i] is the number of edges from start to vertex index i, or
+        -1 if i can't be reached. order lists the vertices reached, nearest
+        first, so order[-1] is one of the farthest.
+        """
+        distances = [-1] * self.num_vertices
+        distances[start] = 0
+        order = [start]
+        # order grows while it is walked through, like a queue
+        for i in order:
+            next_distance = distances[i] + 1
+            for j in self.neighbors(i):
+                if distances[j] == -1:
+                    distances[j] = next_distance
+                    order.append(j)
+        return distances, order
+
+    def eccentricity(self, vertex):
+        """Return the most edges on a shortest path from the vertex id.
+
+        Only vertices that can be reached count.
+        """
+        distances, order = self._sweep(self.get_index(vertex))
+        return distances[order[-1]]
+
+    def _component_roots(self):
+        """Generate one vertex index of each connected component.
+
+        Each root is the highest degree vertex of its component, since
+        searches from hubs tend to find far apart vertices.
+        """
+        seen = bytearray(self.num_vertices)
+        for i in range(self.num_vertices):
+            if seen[i]:
+                continue
+            _, order = self._sweep(i)
+            for j in order:
+                seen[j] = 1
+            yield max(order, key=self.degree)
+
+    def _double_sweep(self, root):
+        """Return a diameter lower bound, and a central vertex index.
+
+        Searches from root to find a far vertex a, from a to find the
+        farthest vertex b, and from b. The central vertex is the middle of a
+        shortest a-b path. Only for undirected graphs.
+        """
+        _, order = self._sweep(root)
+        distances_a, order_a = self._sweep(order[-1])
+        b = order_a[-1]
+        distances_b, order_b = self._sweep(b)
+        lower = max(distances_a[b], distances_b[order_b[-1]])
+
+        # The middle is half way along, on a shortest path from a to b
+        half = distances_a[b] // 2
+        middle = next(i for i in order_a if distances_a[i] == half and
+                      distances_b[i] == distances_a[b] - half)
+        return lower, middle
+
+    def _ifub(self, root):
+        """Return the diameter of root's connected component, with iFUB.
+
+        A double sweep finds two far apart vertices a and b, whose distance
+        is a lower bound. A search from u, the middle of a shortest a-b
+        path, splits the component into levels. Every vertex at level i or
+        below is within 2 * i of every other, so searching from the deepest
+        levels first can stop as soon as the lower bound beats twice the
+        next level number. See Crescenzi et al., "On computing the diameter
+        of real-world undirected graphs" (2013).
+        """
+        lower, u = self._double_sweep(root)
+        distances_u, order_u = self._sweep(u)
+        level = distances_u[order_u[-1]]
+        lower = max(lower, level)
+        upper = 2 * level
+        # Walk the levels from the deepest, searching from each vertex
+        position = len(order_u)
+        while upper > lower:
+            level_max = 0
+            while position > 0 and distances_u[order_u[position - 1]] == level:
+                position -= 1
+                distances_i, order_i = self._sweep(order_u[position])
+                level_max = max(level_max, distances_i[order_i[-1]])
+            if max(lower, level_max) > 2 * (level - 1):
+                return max(lower, level_max)
+            lower = max(lower, level_max)
+            upper = 2 * (level - 1)
+            level -= 1
+        return lower
+
+    def diameter(self, exact=True):
+        """Return the most edges on any shortest path in the graph.
+
+        Pairs of vertices with no path between them are left out. For
+        undirected graphs, the exact value comes from iFUB, which usually
+        needs only a handful of searches per component. Exact diameters of
+        directed graphs search from every vertex.
+
+        exact: if False, return the double sweep lower bound instead, from
+            three searches per component (undirected) or two from the
+            highest degree vertex (directed), which is often the exact value
+        """
+        if self.num_vertices == 0:
+            return 0
+        if self.directed:
+            if exact:
+                return max(self.eccentricity(key) for key in self.ids)
+            # Sweep from the hub, then back from the farthest vertex found
+            root = max(range(self.num_vertices), key=self.degree)
+            _, order = self._sweep(root)
+            distances, order_a = self._sweep(order[-1])
+            return max(self.eccentricity(self.ids[root]),
+                       distances[order_a[-1]])
+
+        diameter = 0
+        for root in self._component_roots():
+            if exact:
+                diameter = max(diameter, self._ifub(root))
+            else:
+                diameter = max(diameter, self._double_sweep(root)[0])
+        return diameter
+
+    def radius(self, exact=True):
+        """Return the smallest eccentricity of any vertex.
+
+        Raise ValueError if some vertex can't reach every other one, since
+        the radius is then infinite. For undirected graphs, every search
+        from a vertex w gives each vertex v a lower bound on its
+        eccentricity of max(d(v, w), ecc(w) - d(v, w)), and vertices whose
+        bound is no better than the best radius so far are never searched.
+
+        exact: if False, return the eccentricity of the middle of a double
+            sweep path (for directed graphs, of the highest degree vertex),
+            an upper bound that is usually close
+        """
+        if self.num_vertices == 0:
+            raise ValueError("an empty graph has no radius")
+        num_vertices = self.num_vertices
+
+        if not exact:
+            # Directed graphs use the hub itself as the center
+            center = max(range(num_vertices), key=self.degree)
+            if not self.directed:
+                _, center = self._double_sweep(center)
+            distances, order = self._sweep(center)
+            if len(order) < num_vertices:
+                raise ValueError("the graph is not connected")
+            return distances[order[-1]]
+
+        if self.directed:
+            radius = None
+            for i in range(num_vertices):
+                distances, order = self._sweep(i)
+                if len(order) < num_vertices:
+                    raise ValueError("the graph is not strongly connected")
+                ecc = distances[order[-1]]
+                radius = ecc if radius is None else min(radius, ecc)
+            return radius
+
+        lower = [0] * num_vertices
+        radius = None
+        candidates = set(range(num_vertices))
+        while len(candidates) > 0:
+            # Search from the vertex with the lowest bound
+            w = min(candidates, key=lower.__getitem__)
+            candidates.discard(w)
+            distances, order = self._sweep(w)
+            if len(order) < num_vertices:
+                raise ValueError("the graph is not connected")
+            ecc = distances[order[-1]]
+            radius = ecc if radius is None else min(radius, ecc)
+            for v in list(candidates):
+                bound = max(lower[v], distances[v], ecc - distances[v])
+                lower[v] = bound
+                if bound >= radius:
+                    candidates.discard(v)
+        return radius
+
+    def all_pairs_distances(self, method="auto", predecessors=False,
+                            path=None):
+        """Return a DistanceMatrix of shortest path lengths between all pairs.
+
+        method: "bfs" (one breadth first search per vertex, for unweighted
+            graphs), "dijkstra" (one Dijkstra search per vertex) or
+            "floyd_warshall" (which also allows negative weights). "auto"
+            picks bfs for unweighted graphs, floyd_warshall for weighted
+            graphs that are dense or have negative weights, and dijkstra
+            otherwise.
+        predecessors: if True, also fill in the predecessor table
+        path: if given, memory map the table to this file
+        """
+        num_vertices = self.num_vertices
+        if method == "auto":
+            if not self.weighted:
+                method = "bfs"
+            elif self.num_edges * 4 >= num_vertices * num_vertices or \
+                    any(weight < 0 for weight in self.weight_array):
+                method = "floyd_warshall"
+            else:
+                method = "dijkstra"
+
+        if method == "bfs":
+            if self.weighted:
+                raise ValueError("bfs distances ignore weights, use dijkstra")
+            search = self._bfs_distances
+        elif method == "dijkstra":
+            if any(weight < 0 for weight in self.weight_array):
+                raise ValueError("dijkstra needs non-negative edge weights")
+            search = self._dijkstra_distances
+        elif method != "floyd_warshall":
+            raise ValueError(f"Unknown method {method!r}")
+
+        table = DistanceMatrix(self.ids, path, predecessors)
+        if method == "floyd_warshall":
+            self._floyd_warshall(table)
+        else:
+            for i in range(num_vertices):
+                table._set_row(i, *search(i))
+        return table
+
+    def _bfs_distances(self, start):
+        """Return the hop distances and BFS parents from vertex index start."""
+        distances = [float("inf")] * self.num_vertices
+        parents = [-1] * self.num_vertices
+        distances[start] = 0.0
+        vertex_deque = deque([start])
+        while len(vertex_deque) > 0:
+            i = vertex_deque.popleft()
+            next_distance = distances[i] + 1
+            for j in self.neighbors(i):
+                if parents[j] == -1 and j != start:
+                    distances[j] = next_distance
+                    parents[j] = i
+                    vertex_deque.append(j)
+        return distances, parents
+
+    def _dijkstra_distances(self, start):
+        """Return the weighted distances and parents from vertex index start.
+        """
+        distances = [float("inf")] * self.num_vertices
+        parents = [-1] * self.num_vertices
+        distances[start] = 0.0
+        heap = [(0.0, start)]
+        offsets = self.offsets
+        neighbors = self.neighbor_array
+        weights = self.weight_array
+        while len(heap) > 0:
+            distance, i = heapq.heappop(heap)
+            # Skip entries left behind by a later, shorter distance
+            if distance > distances[i]:
+                continue
+            for k in range(offsets[i], offsets[i + 1]):
+                j = neighbors[k]
+                new_distance = distance + weights[k]
+                if new_distance < distances[j]:
+                    distances[j] = new_distance
+                    parents[j] = i
+                    heapq.heappush(heap, (new_distance, j))
+        return distances, parents
+
+    def _floyd_warshall(self, table):
+        """Fill table with Floyd-Warshall distances, relaxing it in place.
+
+        Only two rows are copied out of the table at a time, so a memory
+        mapped table stays off the heap. Raise ValueError if the graph has a
+        negative cycle.
+        """
+        num_vertices = self.num_vertices
+        inf = float("inf")
+        distances = table.distances
+        parents = table.predecessors
+        for i in range(num_vertices):
+            low = i * num_vertices
+            distances[low + i] = 0.0
+            for j, weight in zip(self.neighbors(i), self.weights(i)):
+                if j == i:
+                    # A self-loop only matters if it is a negative cycle
+                    if weight < 0:
+                        raise ValueError("the graph has a negative cycle")
+                elif weight < distances[low + j]:
+                    distances[low + j] = weight
+                    if parents is not None:
+                        parents[low + j] = i
+
+        for k in range(num_vertices):
+            low_k = k * num_vertices
+            row_k = distances[low_k:low_k + num_vertices].tolist()
+            if parents is not None:
+                parents_k = parents[low_k:low_k + num_vertices].tolist()
+            for i in range(num_vertices):
+                low = i * num_vertices
+                high = low + num_vertices
+                d_ik = distances[low + k]
+                if d_ik == inf or i == k:
+                    continue
+                row_i = distances[low:high].tolist()
+                if parents is None:
+                    # Relax the whole row at once
+                    distances[low:high] = array(
+                        "d", map(min, row_i, [d_ik + x for x in row_k]))
+                    continue
+                parents_i = None
+                for j in range(num_vertices):
+                    new_distance = d_ik + row_k[j]
+                    if new_distance < row_i[j]:
+                        if parents_i is None:
+                            parents_i = parents[low:high].tolist()
+                        row_i[j] = new_distance
+                        parents_i[j] = parents_k[j]
+                if parents_i is not None:
+                    distances[low:high] = array("d", row_i)
+                    parents[low:high] = array("q", parents_i)
+
+        for i in range(num_vertices):
+            if distances[i * num_vertices + i] < 0:
+                raise ValueError("the graph has a negative cycle")
+
+    def to_shared_memory(self, name=None):
+        """Publish the graph into a new shared memory block, and return it.
+
+        The caller owns the block: call close() and unlink() on it once every
+        worker is done. Workers attach with CompactGraph.attach(block.name).
+        """
+        flags = _SORTED if self.sorted_neighbors else 0
+        flags |= _DIRECTED if self.directed else 0
+        flags |= _WEIGHTED if self.weighted else 0
+
+        # Integer ids are stored as an array, anything else as JSON
+        if all(type(key) is int for key in self.ids):
+            flags |= _INT_IDS
+            id_bytes = array("q", self.ids).tobytes()
+        else:
+            id_bytes = json.dumps(list(self.ids)).encode()
+
+        num_vertices = self.num_vertices
+        num_edges = self.num_edges
+        sections = [array("q", self.offsets).tobytes(),
+                    array("q", self.neighbor_array).tobytes(),
+                    array("d", self.weight_array).tobytes(),
+                    id_bytes]
+        size = _HEADER.size + sum(len(section) for section in sections)
+
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _HEADER.pack_into(shm.buf, 0, _MAGIC, _VERSION, num_vertices,
+                          num_edges, flags, len(id_bytes))
+        position = _HEADER.size
+        for section in sections:
+            shm.buf[position:position + len(section)] = section
+            position += len(section)
+        return shm
+
+    @classmethod
+    def attach(cls, name):
+        """Return a CompactGraph that reads a published shared memory block.
+
+        The adjacency arrays are views of the shared block, not copies.
+        Call close() when done so the block can be released.
+        """
+        shm = _attach_untracked(name)
+
+        magic, version, num_vertices, num_edges, flags, id_size = \
+            _HEADER.unpack_from(shm.buf, 0)
+        if magic != _MAGIC or version != _VERSION:
+            shm.close()
+            raise ValueError(f"{name} does not hold a compact graph")
+
+        buf = shm.buf
+        position = _HEADER.size
+        offsets = buf[position:position + 8 * (num_vertices + 1)].cast("q")
+        position += 8 * (num_vertices + 1)
+        neighbors = buf[position:position + 8 * num_edges].cast("q")
+        position += 8 * num_edges
+        weights = buf[position:position + 8 * num_edges].cast("d")
+        position += 8 * num_edges
+        if flags & _INT_IDS:
+            ids = buf[position:position + id_size].cast("q")
+        else:
+            ids = json.loads(bytes(buf[position:position + id_size]))
+
+        compact = cls(ids, offsets, neighbors, weights,
+                      directed=bool(flags & _DIRECTED),
+                      weighted=bool(flags & _WEIGHTED),
+                      sorted_neighbors=bool(flags & _SORTED))
+        compact._shm = shm
+        return compact
+
+    def close(self):
+        """Release the shared memory views of an attached graph."""
+        if self._shm is None:
+            return
+        for view in (self.offsets, self.neighbor_array, self.weight_array,
+                     self.ids):
+            if isinstance(view, memoryview):
+                view.release()
+        self._shm.close()
+        self._shm = None
+
+
+# The graph a worker process attached to, set by _attach_worker
+_worker_graph = None
+
+
+def _attach_worker(name):
+    """Attach a pool worker process to a graph in shared memory."""
+    global _worker_graph
+    _worker_graph = CompactGraph.attach(name)
+
+
+def _walk_chunk(args):
+    """Return the walks for one chunk of start vertices, as raw bytes."""
+    starts, length, p, q, n_per_node, seed = args
+    walks = _worker_graph._random_walks(starts, length, p, q, n_per_node,
+                                        seed)
+    return [walk.tobytes() for walk in walks]
+
+
+def _propagate_chunk(args):
+    """Return new labels for one range of vertices, as raw bytes.
+
+    Also return whether any vertex in the range wanted a different label.
+    """
+    low, high, data, seed = args
+    labels = array("q")
+    labels.frombytes(data)
+    rng = random.Random(seed)
+    new_labels = array("q", labels[low:high])
+    changed = False
+    for i in range(low, high):
+        label = _worker_graph._best_label(i, labels, rng)
+        if label != labels[i]:
+            changed = True
+            # Only take the new label half the time, to avoid oscillating
+            if rng.random() < 0.5:
+                new_labels[i - low] = label
+    return new_labels.tobytes(), changed
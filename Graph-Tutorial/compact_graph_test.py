@@ -0,0 +1,488 @@
+#!python
+
+from graph import Graph
+from graph_fixtures import make_graph
+from compact_graph import CompactGraph
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+
+def shared_worker(name, queue):
+    """Attach to a shared graph in another process and run some queries."""
+    compact = CompactGraph.attach(name)
+    try:
+        queue.put((compact.find_shortest_path(1, 4),
+                   sorted(compact.breadth_first_search(1, 2)),
+                   list(compact.weights(compact.get_index(1)))))
+    finally:
+        compact.close()
+
+
+class CompactGraphTest(unittest.TestCase):
+
+    def test_from_graph(self):
+        g = make_graph()
+        compact = g.freeze()
+        assert compact.num_vertices == g.num_vertices
+        assert compact.num_edges == 13
+        assert compact.ids == list(g.vert_list)
+        # Neighbor lists are sorted by id
+        a = compact.get_index("A")
+        self.assertEqual([compact.ids[i] for i in compact.neighbors(a)],
+                         ["B", "C"])
+        assert compact.degree(compact.get_index("X")) == 0
+        with self.assertRaises(KeyError):
+            compact.get_index("Y")
+
+    def test_traversals(self):
+        g = make_graph()
+        compact = g.freeze()
+
+        # Breadth first search matches the Graph, in both modes
+        for n in range(1, 6):
+            for only_new in (True, False):
+                expected = g.breadth_first_search(g.get_vertex("A"), n,
+                                                  only_new)
+                self.assertCountEqual(
+                    compact.breadth_first_search("A", n, only_new),
+                    [v.id for v in expected])
+                # Walk counts match too
+                expected = g.breadth_first_search(g.get_vertex("A"), n,
+                                                  only_new, counts=True)
+                self.assertEqual(
+                    compact.breadth_first_search("A", n, only_new, True),
+                    {v.id: walks for v, walks in expected.items()})
+
+        # Shortest paths
+        self.assertEqual(compact.find_shortest_path("A", "I"),
+                         ["A", "B", "E", "H", "I"])
+        self.assertEqual(compact.find_shortest_path("G", "F"),
+                         ["G", "H", "J", "B", "A", "C", "D", "F"])
+        self.assertEqual(compact.find_shortest_path("A", "X"), None)
+        self.assertEqual(compact.find_shortest_path("A", "A"), None)
+
+        # Depth first paths match Graph.find_path
+        for start, end in [("A", "G"), ("D", "J"), ("B", "J"), ("J", "H"),
+                           ("I", "H"), ("H", "I"), ("A", "X")]:
+            path = g.find_path(start, end)
+            expected = None if path is None else [v.id for v in path]
+            self.assertEqual(compact.find_path(start, end), expected)
+
+        with self.assertRaises(KeyError):
+            compact.find_path("A", "Y")
+
+    def test_edge_attributes(self):
+        # Friendships with the day they started and how the pair interacts
+        edges = [("A", "B", 1, 0), ("B", "C", 5, 1), ("A", "D", 10, 0),
+                 ("D", "C", 12, 0), ("C", "E", 20, 1), ("A", "C", 30, 2)]
+        compact = CompactGraph.from_edges(edges, directed=False,
+                                          attributes=("timestamp", "type"),
+                                          vertices=["F"])
+        assert compact.num_vertices == 6 and compact.num_edges == 12
+        assert compact.edge_attributes["timestamp"].typecode == "q"
+        a = compact.get_index("A")
+        self.assertEqual([compact.ids[i] for i in compact.neighbors(a)],
+                         ["B", "C", "D"])
+        low = compact.offsets[a]
+        self.assertEqual(list(compact.edge_attributes["timestamp"]
+                              [low:low + 3]), [1, 30, 10])
+
+        # Paths as of a point in time only use edges that existed then
+        self.assertEqual(compact.find_shortest_path("A", "C"), ["A", "C"])
+        self.assertEqual(compact.find_shortest_path("A", "C", as_of=29),
+                         ["A", "B", "C"])
+        self.assertEqual(compact.find_shortest_path("A", "C", as_of=4), None)
+        self.assertEqual(compact.find_shortest_path("A", "E", as_of=19.5),
+                         None)
+        self.assertEqual(compact.breadth_first_search("A", 1, as_of=10),
+                         {"B", "D"})
+
+        # Predicates see whole columns
+        def type_0(columns):
+            return [kind == 0 for kind in columns["type"]]
+        self.assertEqual(compact.find_shortest_path("A", "C", where=type_0),
+                         ["A", "D", "C"])
+        self.assertEqual(
+            compact.breadth_first_search("A", 2, where=type_0, as_of=11),
+            set())
+        mask = compact.edge_mask(as_of=10, where=type_0)
+        assert sum(mask) == 4
+
+        # Attributes can be added to a frozen graph
+        frozen = make_graph().freeze()
+        with self.assertRaises(ValueError):
+            frozen.find_shortest_path("A", "I", as_of=3)
+        frozen.add_edge_attribute("timestamp",
+                                  [0.5 * k for k in range(frozen.num_edges)])
+        assert frozen.edge_attributes["timestamp"].typecode == "d"
+        self.assertEqual(frozen.find_shortest_path("A", "I", as_of=10),
+                         ["A", "B", "E", "H", "I"])
+        with self.assertRaises(ValueError):
+            frozen.add_edge_attribute("type", [1, 2])
+        with self.assertRaises(ValueError):
+            CompactGraph.from_edges([(1, 2, 3)], attributes=())
+
+    def test_random_walks(self):
+        g = make_graph()
+        compact = g.freeze()
+        edges = g.get_edge_list()
+
+        def check(walks, length):
+            for walk in walks:
+                assert 1 <= len(walk) <= length
+                # Every step follows an edge
+                for i in range(len(walk) - 1):
+                    assert (compact.ids[walk[i]], compact.ids[walk[i + 1]]) \
+                        in edges
+                # Walks only stop early at a vertex without edges out
+                if len(walk) < length:
+                    assert compact.degree(walk[-1]) == 0
+
+        walks = compact.random_walks(length=10, n_per_node=3, seed=1)
+        assert len(walks) == 3 * compact.num_vertices
+        check(walks, 10)
+        # The same seed gives the same walks
+        self.assertEqual(walks,
+                         compact.random_walks(length=10, n_per_node=3, seed=1))
+        # Biased walks still follow edges
+        check(compact.random_walks(["A", "H"], 20, p=0.25, q=4, seed=2), 20)
+        # Walks can be split across processes
+        walks = compact.random_walks(["A", "B", "C"], 6, n_per_node=2,
+                                     seed=3, processes=2)
+        assert len(walks) == 6
+        self.assertEqual([compact.ids[walk[0]] for walk in walks],
+                         ["A", "A", "B", "B", "C", "C"])
+        check(walks, 6)
+        # The Graph method returns ids
+        self.assertEqual(g.random_walks(["X"], 5), [["X"]])
+
+        # Weighted walks follow heavy edges more often
+        g = Graph(weighted=True, directed=True)
+        g.add_edge(0, 1, 1)
+        g.add_edge(0, 2, 9)
+        steps = [walk[1] for walk in g.random_walks([0], 2, n_per_node=2000,
+                                                    seed=4)]
+        assert 1500 < steps.count(2) < 1950
+        # Returning is strongly preferred when p is small
+        g = Graph(directed=False)
+        g.add_edge(0, 1)
+        g.add_edge(1, 2)
+        g.add_edge(1, 3)
+        walks = g.random_walks([0], 3, p=0.01, q=1, n_per_node=500, seed=5)
+        assert sum(1 for walk in walks if walk[2] == 0) > 450
+        with self.assertRaises(ValueError):
+            g.random_walks([0], 3, p=0)
+
+    def test_communities(self):
+        # Two groups of friends, joined by a single edge
+        g = Graph(directed=False)
+        for group in ([0, 1, 2, 3], [4, 5, 6, 7]):
+            for a in group:
+                for b in group:
+                    if a < b:
+                        g.add_edge(a, b)
+        g.add_edge(3, 4)
+        g.add_vertex(8)
+        expected = [0, 0, 0, 0, 1, 1, 1, 1, 2]
+
+        for method in ("label_propagation", "louvain"):
+            for seed in range(5):
+                self.assertEqual(list(g.communities(method, seed=seed)),
+                                 expected)
+        self.assertEqual(list(g.communities(seed=1, processes=2)), expected)
+
+        # Directed edges count in both directions
+        d = Graph(directed=True)
+        for a, b in [(0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3), (2, 3)]:
+            d.add_edge(a, b)
+        self.assertEqual(list(d.communities("louvain", seed=0)),
+                         [0, 0, 0, 1, 1, 1])
+
+        # Heavy edges pull vertices into their community
+        w = Graph(weighted=True, directed=False)
+        w.add_edge("A", "B", 10)
+        w.add_edge("B", "C", 1)
+        w.add_edge("C", "D", 10)
+        w.add_edge("D", "E", 1)
+        w.add_edge("E", "F", 10)
+        for method in ("label_propagation", "louvain"):
+            self.assertEqual(list(w.communities(method, seed=0)),
+                             [0, 0, 1, 1, 2, 2])
+
+        with self.assertRaises(ValueError):
+            g.communities("girvan_newman")
+
+    def test_neighborhood_function(self):
+        # A path of 6 vertices, and a vertex on its own
+        g = Graph(directed=False)
+        for i in range(5):
+            g.add_edge(i, i + 1)
+        g.add_vertex(6)
+        sizes = g.neighborhood_sizes(seed=0)
+        # The neighborhoods stop growing after 5 hops
+        assert len(sizes) == 6
+        for h in range(6):
+            for i in range(6):
+                expected = min(i + h, 5) - max(i - h, 0) + 1
+                self.assertAlmostEqual(sizes[h][i], expected, delta=0.5)
+            self.assertAlmostEqual(sizes[h][6], 1, delta=0.5)
+
+        totals = g.neighborhood_function(seed=0)
+        self.assertEqual(list(totals), [sum(size) for size in sizes])
+        self.assertEqual(len(g.neighborhood_function(max_hops=2, seed=0)), 3)
+        # Half of the 37 pairs is 18.5, between 17 pairs within 1 hop and 25
+        # within 2 hops
+        self.assertAlmostEqual(g.effective_diameter(0.5, seed=0), 1.1875,
+                               delta=0.1)
+        self.assertAlmostEqual(g.effective_diameter(1, seed=0), 5, delta=0.1)
+
+        # Directed edges are only followed forwards
+        d = Graph(directed=True)
+        d.add_edge("A", "B")
+        d.add_edge("B", "C")
+        sizes = d.neighborhood_sizes(seed=1)
+        self.assertEqual([round(size) for size in sizes[-1]], [3, 2, 1])
+
+        with self.assertRaises(ValueError):
+            g.neighborhood_function(precision=2)
+
+    def test_reorder(self):
+        g = make_graph()
+        compact = g.freeze()
+        compact.add_edge_attribute("timestamp", range(compact.num_edges))
+        for strategy in ("bfs", "rcm", "degree", "rabbit"):
+            order = compact.vertex_order(strategy, seed=0)
+            self.assertCountEqual(order, range(compact.num_vertices))
+            reordered = compact.reorder(strategy, seed=0)
+            self.assertEqual(reordered.ids,
+                             [compact.ids[i] for i in order])
+            # Queries by id are unchanged
+            for start, end in [("A", "I"), ("G", "F"), ("A", "X")]:
+                self.assertEqual(reordered.find_shortest_path(start, end),
+                                 compact.find_shortest_path(start, end))
+                self.assertEqual(reordered.find_path(start, end),
+                                 compact.find_path(start, end))
+                self.assertEqual(
+                    reordered.find_shortest_path(start, end, as_of=8),
+                    compact.find_shortest_path(start, end, as_of=8))
+            self.assertEqual(reordered.breadth_first_search("A", 3),
+                             compact.breadth_first_search("A", 3))
+        self.assertEqual(compact.vertex_order("degree")[0],
+                         compact.get_index("H"))
+        with self.assertRaises(ValueError):
+            compact.vertex_order("random")
+
+        # Renumbering a shuffled path puts neighbors next to each other
+        keys = list(range(100))
+        random.Random(0).shuffle(keys)
+        path = Graph(directed=False)
+        for key in keys:
+            path.add_vertex(key)
+        for key in range(99):
+            path.add_edge(key, key + 1)
+        scrambled = path.freeze()
+        assert scrambled.average_gap() > 10
+        # Searching from the middle interleaves the two halves a little
+        assert scrambled.reorder("bfs").average_gap() < 2
+        # Reverse Cuthill-McKee starts from an end
+        self.assertEqual(scrambled.reorder("rcm").average_gap(), 1)
+
+        # Graph.reorder changes the storage order, not the graph
+        edges = path.get_edge_list()
+        path.reorder("rcm")
+        self.assertEqual(path.get_edge_list(), edges)
+        self.assertEqual(path.freeze().average_gap(), 1)
+        assert abs(list(path.vert_list)[0] - list(path.vert_list)[1]) == 1
+        self.assertEqual(len(path.find_shortest_path(0, 99)), 100)
+
+    def test_diameter(self):
+        # A path of 7 vertices with a branch off the middle, and a triangle
+        g = Graph(directed=False)
+        for i in range(6):
+            g.add_edge(i, i + 1)
+        g.add_edge(3, 7)
+        for a, b in [(10, 11), (11, 12), (12, 10)]:
+            g.add_edge(a, b)
+        self.assertEqual(g.diameter(), 6)
+        self.assertEqual(g.diameter(exact=False), 6)
+        self.assertEqual(g.eccentricity(0), 6)
+        self.assertEqual(g.eccentricity(7), 4)
+        self.assertEqual(g.eccentricity(10), 1)
+        # The radius needs every vertex to reach every other
+        with self.assertRaises(ValueError):
+            g.radius()
+        for key in (10, 11, 12):
+            g.remove_vertex(key)
+        self.assertEqual(g.radius(), 3)
+        self.assertEqual(g.radius(exact=False), 3)
+
+        # Exact answers come from a few searches, not one per vertex
+        compact = CompactGraph.from_edges(
+            [(i, i + 1) for i in range(999)], directed=False)
+        searches = []
+        sweep = compact._sweep
+        compact._sweep = lambda start: searches.append(start) or sweep(start)
+        self.assertEqual(compact.diameter(), 999)
+        self.assertEqual(compact.radius(), 500)
+        assert len(searches) < 20
+
+        # Directed graphs follow edges forwards
+        d = make_graph()
+        self.assertEqual(d.diameter(), 7)
+        assert d.diameter(exact=False) <= 7
+        self.assertEqual(d.eccentricity("A"), 4)
+        self.assertEqual(d.eccentricity("X"), 0)
+        with self.assertRaises(ValueError):
+            d.radius()
+        d.remove_vertex("X")
+        d.remove_vertex("I")
+        self.assertEqual(d.radius(), 4)
+        self.assertEqual(Graph().diameter(), 0)
+
+    def test_all_pairs_distances(self):
+        g = make_graph()
+        table = g.all_pairs_distances(predecessors=True)
+        inf = float("inf")
+        self.assertEqual(table["A", "I"], 4)
+        self.assertEqual(table["G", "F"], 7)
+        self.assertEqual(table["A", "A"], 0)
+        self.assertEqual(table["A", "X"], inf)
+        self.assertEqual(table["X", "A"], inf)
+        self.assertEqual(list(table.row("I")),
+                         [inf] * 8 + [0, inf, inf])
+        # Paths have the same length as find_shortest_path's
+        for a in g.vert_list:
+            for b in g.vert_list:
+                path = table.path_between(a, b)
+                expected = g.find_shortest_path(a, b)
+                if a == b:
+                    self.assertEqual(path, [a])
+                elif expected is None:
+                    self.assertEqual(path, None)
+                else:
+                    self.assertEqual(len(path), len(expected))
+                    self.assertEqual(len(path) - 1, table[a, b])
+
+        # Every method agrees on a weighted graph
+        w = Graph(weighted=True, directed=True)
+        for a, b, weight in [(1, 2, 4), (1, 3, 1), (3, 2, 2), (2, 4, 1),
+                             (4, 1, 3), (3, 4, 7)]:
+            w.add_edge(a, b, weight)
+        tables = [w.all_pairs_distances(method, predecessors=True)
+                  for method in ("auto", "dijkstra", "floyd_warshall")]
+        for table in tables:
+            self.assertEqual(list(table.row(1)), [0, 3, 1, 4])
+            self.assertEqual(table.path_between(1, 4), [1, 3, 2, 4])
+        with self.assertRaises(ValueError):
+            w.all_pairs_distances("bfs")
+        with self.assertRaises(ValueError):
+            w.all_pairs_distances("johnson")
+        with self.assertRaises(ValueError):
+            g.all_pairs_distances().path_between("A", "B")
+
+        # Negative weights need Floyd-Warshall, and no negative cycles
+        w.remove_edge(3, 2)
+        w.add_edge(3, 2, -2)
+        self.assertEqual(w.all_pairs_distances()[1, 4], 0)
+        with self.assertRaises(ValueError):
+            w.all_pairs_distances("dijkstra")
+        w.remove_edge(4, 1)
+        w.add_edge(4, 1, -1)
+        with self.assertRaises(ValueError):
+            w.all_pairs_distances()
+        # A negative self-loop is a negative cycle too
+        w.remove_edge(4, 1)
+        w.add_edge(4, 1, 3)
+        w.add_edge(2, 2, -1)
+        with self.assertRaises(ValueError):
+            w.all_pairs_distances("floyd_warshall")
+        with self.assertRaises(ValueError):
+            w.all_pairs_distances()
+
+        # The table can live in a memory mapped file
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "distances")
+        table = g.all_pairs_distances(predecessors=True, path=path)
+        try:
+            self.assertEqual(table["A", "I"], 4)
+            self.assertEqual(table.path_between("A", "I"),
+                             ["A", "B", "E", "H", "I"])
+            assert os.path.getsize(path) == 8 * 11 * 11
+            assert os.path.getsize(path + ".pred") == 8 * 11 * 11
+        finally:
+            table.close()
+
+        # Floyd-Warshall relaxes a memory mapped table in place
+        rng = random.Random(4)
+        w = Graph(weighted=True, directed=True)
+        for key in range(30):
+            w.add_vertex(key)
+        for _ in range(120):
+            a, b = rng.randrange(30), rng.randrange(30)
+            if a != b and w.get_vertex(b) not in w.get_vertex(a).neighbors:
+                w.add_edge(a, b, rng.randint(1, 9))
+        expected = w.all_pairs_distances("dijkstra")
+        path = os.path.join(directory, "floyd")
+        for predecessors in (False, True):
+            table = w.all_pairs_distances("floyd_warshall", predecessors,
+                                          path=path)
+            try:
+                self.assertEqual(list(table.distances),
+                                 list(expected.distances))
+                if predecessors:
+                    for a, b in [(0, 29), (5, 17), (12, 3)]:
+                        route = table.path_between(a, b)
+                        if route is not None:
+                            self.assertEqual(
+                                sum(w.get_vertex(x).neighbors[
+                                    w.get_vertex(y)]
+                                    for x, y in zip(route, route[1:])),
+                                expected[a, b])
+            finally:
+                table.close()
+
+    def test_shared_memory(self):
+        g = Graph(weighted=True, directed=False)
+        g.add_edge(1, 2, 5)
+        g.add_edge(2, 3, 2)
+        g.add_edge(3, 4, 1)
+        g.add_edge(1, 5, 7)
+        shm = g.freeze().to_shared_memory()
+        try:
+            # Attach in this process
+            compact = CompactGraph.attach(shm.name)
+            assert compact.weighted and not compact.directed
+            self.assertEqual(compact.find_shortest_path(1, 4), [1, 2, 3, 4])
+            compact.close()
+
+            # Attach from another process
+            queue = multiprocessing.Queue()
+            worker = multiprocessing.Process(target=shared_worker,
+                                             args=(shm.name, queue))
+            worker.start()
+            result = queue.get(timeout=30)
+            worker.join()
+            self.assertEqual(result, ([1, 2, 3, 4], [3], [5.0, 7.0]))
+        finally:
+            shm.close()
+            shm.unlink()
+
+        # String ids are shared too
+        shm = make_graph().freeze().to_shared_memory()
+        try:
+            compact = CompactGraph.attach(shm.name)
+            self.assertEqual(compact.find_path("A", "G"),
+                             ["A", "B", "E", "H", "G"])
+            compact.close()
+        finally:
+            shm.close()
+            shm.unlink()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+#!python
+
+"""A read-only Graph whose neighbor lists are gap-compressed in memory.
+
+Like WebGraph, every vertex gets an index, each neighbor list is sorted by
+index and stored as the gaps between neighbors, and each gap is written as a
+varint (7 bits per byte, the high bit set on all but the last byte). The
+first neighbor is stored relative to the vertex itself, zigzag encoded since
+it may be lower. Neighbor lists are decoded when a traversal asks for them.
+
+Gaps stay small, and so take few bytes, when neighbors have nearby indices.
+Numbering the vertices in breadth first order ("bfs") usually gives social
+graphs that locality.
+"""
+
+from array import array
+
+from graph import ReadOnlyGraph, ReadOnlyVertex
+
+
+def _write_varint(data, value):
+    """Append a non-negative integer to data as a varint."""
+    while value >= 0x80:
+        data.append((value & 0x7F) | 0x80)
+        value >>= 7
+    data.append(value)
+
+
+def _encode(data, i, indices):
+    """Append the sorted neighbor indices of vertex i to data."""
+    previous = None
+    for j in indices:
+        if previous is None:
+            # Zigzag encode the distance from i: 0, -1, 1, -2 -> 0, 1, 2, 3
+            gap = j - i
+            _write_varint(data, 2 * gap if gap >= 0 else -2 * gap - 1)
+        else:
+            # Neighbors are distinct, so every later gap is at least 1
+            _write_varint(data, j - previous - 1)
+        previous = j
+
+
+def _decode(data, low, high, i):
+    """Return the neighbor indices of vertex i, stored in data[low:high]."""
+    indices = []
+    previous = None
+    value = 0
+    shift = 0
+    for position in range(low, high):
+        byte = data[position]
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        if previous is None:
+            # Undo the zigzag encoding of the first gap
+            gap = value >> 1 if value & 1 == 0 else -(value >> 1) - 1
+            previous = i + gap
+        else:
+            previous += value + 1
+        indices.append(previous)
+        value = 0
+        shift = 0
+    return indices
+
+
+class CompressedVertex(ReadOnlyVertex):
+    """Vertex whose neighbors are decoded from the compressed adjacency."""
+
+    def __init__(self, vertex_id, graph, index):
+        """Initialize a vertex stub that belongs to a CompressedGraph.
+
+        Only the id, the vertex index and the traversal parent are kept.
+        """
+        super().__init__(vertex_id)
+        self._graph = graph
+        self._index = index
+
+    @property
+    def neighbors(self):
+        """Return the neighbors dictionary, decoded from the adjacency."""
+        return self._graph._load_neighbors(self._index)
+
+
+class CompressedGraph(ReadOnlyGraph):
+    """Graph stored as gap-compressed neighbor lists in one byte buffer."""
+
+    def __init__(self, ids, data, offsets, edge_offsets, weights=None,
+                 directed=True):
+        """Initialize a compressed graph from already encoded buffers.
+
+        ids: sequence mapping each vertex index to its vertex id
+        data: the encoded neighbor lists, back to back
+        offsets: V + 1 integers, vertex i's list is data[offsets[i]:
+            offsets[i + 1]]
+        edge_offsets: V + 1 integers, vertex i's edges are numbered from
+            edge_offsets[i] up to edge_offsets[i + 1], in decoding order
+        weights: for weighted graphs, the edge weights in the order the
+            neighbor lists decode, else None
+        """
+        super().__init__(weighted=weights is not None, directed=directed)
+        self.ids = ids
+        self.data = data
+        self.offsets = offsets
+        self.edge_offsets = edge_offsets
+        self.weight_array = weights
+        for i, key in enumerate(ids):
+            self.vert_list[key] = CompressedVertex(key, self, i)
+        self.num_vertices = len(ids)
+
+    @classmethod
+    def from_graph(cls, graph, order=None):
+        """Return a compressed copy of a Graph.
+
+        order: how to number the vertices; None keeps vert_list order, a
+            strategy name of CompactGraph.vertex_order ("bfs", "rcm",
+            "degree" or "rabbit") reorders them, and a list of every vertex
+            id gives the order directly
+        """
+        ids = _vertex_order(graph, order)
+        index = {key: i for i, key in enumerate(ids)}
+
+        data = bytearray()
+        offsets = array("q", [0])
+        edge_offsets = array("q", [0])
+        weights = array("d") if graph.weighted else None
+        for i, key in enumerate(ids):
+            pairs = sorted((index[neighbor.id], weight) for neighbor, weight
+                           in graph.vert_list[key].neighbors.items())
+            _encode(data, i, [j for j, _ in pairs])
+            if weights is not None:
+                weights.extend(weight for _, weight in pairs)
+            offsets.append(len(data))
+            edge_offsets.append(edge_offsets[-1] + len(pairs))
+        return cls(ids, bytes(data), offsets, edge_offsets, weights,
+                   directed=graph.directed)
+
+    @property
+    def num_edges(self):
+        """Return the number of stored (directed) edges."""
+        return self.edge_offsets[-1]
+
+    def bits_per_edge(self):
+        """Return the average size of a stored edge in the byte buffer."""
+        num_edges = self.num_edges
+        return 8 * len(self.data) / num_edges if num_edges > 0 else 0.0
+
+    def neighbor_indices(self, i):
+        """Return the sorted indices of the neighbors of vertex index i."""
+        return _decode(self.data, self.offsets[i], self.offsets[i + 1], i)
+
+    def _load_neighbors(self, i):
+        """Return the neighbors dictionary of vertex index i."""
+        indices = self.neighbor_indices(i)
+        ids = self.ids
+        vert_list = self.vert_list
+        if self.weight_array is None:
+            return {vert_list[ids[j]]: 1 for j in indices}
+        weights = self.weight_array[self.edge_offsets[i]:
+                                    self.edge_offsets[i + 1]]
+        return {vert_list[ids[j]]: weight
+                for j, weight in zip(indices, weights)}
+
+
+def _vertex_order(graph, order):
+    """Return the vertex ids of graph, in the order they should be numbered."""
+    if order is None:
+        return list(graph.vert_list)
+
+    if isinstance(order, str):
+        # Named orders come from CompactGraph.vertex_order
+        compact = graph.freeze()
+        return [compact.ids[i] for i in compact.vertex_order(order)]
+
+    ids = list(order)
+    if len(ids) != graph.num_vertices or set(ids) != set(graph.vert_list):
+        raise ValueError("order must list every vertex id exactly once")
+    return ids
@@ -0,0 +1,111 @@
+#!python
+
+from graph import Graph
+from graph_fixtures import make_graph
+from compressed_graph import CompressedGraph, _decode, _encode
+import random
+import unittest
+
+
+def ids(vertices):
+    """Return the ids of a list of vertices, or None."""
+    return None if vertices is None else [v.id for v in vertices]
+
+
+class CompressedGraphTest(unittest.TestCase):
+
+    def test_encoding(self):
+        # Neighbors below, above and far from the vertex round-trip
+        for i, indices in [(5, []), (5, [0]), (5, [5]), (5, [6, 7, 8]),
+                           (100, [0, 99, 101, 100000, 2 ** 40])]:
+            data = bytearray()
+            _encode(data, i, indices)
+            self.assertEqual(_decode(data, 0, len(data), i), indices)
+        # Close neighbors take one byte each
+        data = bytearray()
+        _encode(data, 10, [9, 11, 12, 20])
+        assert len(data) == 4
+
+    def test_traversals(self):
+        g = make_graph()
+        for order in (None, "bfs", "degree", list("XJIHGFEDCBA")):
+            c = CompressedGraph.from_graph(g, order)
+            assert c.num_vertices == g.num_vertices
+            assert c.num_edges == 13
+            assert c.directed and not c.weighted
+            self.assertCountEqual(c.get_edge_list(), g.get_edge_list())
+
+            # Breadth first search matches the Graph
+            for n in range(1, 6):
+                for only_new in (True, False):
+                    self.assertCountEqual(
+                        ids(c.breadth_first_search(c.get_vertex("A"), n,
+                                                   only_new)),
+                        ids(g.breadth_first_search(g.get_vertex("A"), n,
+                                                   only_new)))
+            # Paths match the Graph
+            for start, end in [("A", "I"), ("G", "F"), ("J", "H"),
+                               ("A", "X")]:
+                self.assertEqual(ids(c.find_shortest_path(start, end)),
+                                 ids(g.find_shortest_path(start, end)))
+                self.assertEqual(ids(c.find_path(start, end)),
+                                 ids(g.find_path(start, end)))
+
+        # The order changes the numbering
+        c = CompressedGraph.from_graph(g, "bfs")
+        self.assertEqual(c.ids[:3], ["A", "B", "C"])
+        with self.assertRaises(ValueError):
+            CompressedGraph.from_graph(g, "random")
+        with self.assertRaises(ValueError):
+            CompressedGraph.from_graph(g, ["A", "B"])
+
+    def test_weighted(self):
+        g = Graph(weighted=True, directed=False)
+        g.add_edge(1, 2, 3)
+        g.add_edge(2, 3, 4.5)
+        g.add_edge(3, 1, 2)
+        c = CompressedGraph.from_graph(g, order=[3, 1, 2])
+        assert c.weighted and not c.directed
+        # Reading one vertex's weights decodes only that vertex's list
+        decoded = []
+        neighbor_indices = c.neighbor_indices
+        c.neighbor_indices = lambda i: decoded.append(i) or \
+            neighbor_indices(i)
+        assert c.get_vertex(2).get_edge_weight(c.get_vertex(3)) == 4.5
+        self.assertEqual(decoded, [2])
+        assert c.num_edges == 6
+        self.assertEqual(decoded, [2])
+        del c.neighbor_indices
+        self.assertCountEqual(c.get_edge_list(), g.get_edge_list())
+        # Compressed graphs can't be changed
+        with self.assertRaises(TypeError):
+            c.add_edge(1, 4)
+        with self.assertRaises(TypeError):
+            c.add_vertex(4)
+        with self.assertRaises(TypeError):
+            c.remove_edge(1, 2)
+
+    def test_locality(self):
+        # A ring where each vertex knows its 5 nearest on each side, added in
+        # a scrambled order
+        keys = list(range(1000))
+        random.Random(0).shuffle(keys)
+        g = Graph(directed=False)
+        for key in keys:
+            g.add_vertex(key)
+        for i in range(1000):
+            for k in range(1, 6):
+                g.add_edge(i, (i + k) % 1000)
+
+        scrambled = CompressedGraph.from_graph(g)
+        ordered = CompressedGraph.from_graph(g, "bfs")
+        # Breadth first numbering keeps neighbors close, so nearly every gap
+        # fits in one byte
+        assert ordered.bits_per_edge() < 9
+        assert scrambled.bits_per_edge() > ordered.bits_per_edge()
+        self.assertEqual(len(ordered.find_shortest_path(0, 500)),
+                         len(g.find_shortest_path(0, 500)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+#!python
+
+"""A read-only Graph whose edges live on disk and are loaded on demand.
+
+DiskGraph.build writes a graph into two files:
+    <path>: a JSON header line, then one JSON line per vertex holding its id
+        and its [neighbor id, weight] pairs
+    <path>.idx: one JSON line per vertex holding its id, and the byte offset
+        and length of its line in <path>
+Opening a DiskGraph only reads the index. Neighbor lists are read when a
+traversal first asks for them, and the most recently used ones are cached.
+"""
+
+from collections import OrderedDict
+import json
+import os
+
+from graph import ReadOnlyGraph, ReadOnlyVertex
+
+
+class DiskVertex(ReadOnlyVertex):
+    """Vertex whose neighbors are read from the adjacency file when needed."""
+
+    def __init__(self, vertex_id, graph):
+        """Initialize a vertex stub that belongs to a DiskGraph.
+
+        Only the id and the traversal parent are kept in memory.
+        """
+        super().__init__(vertex_id)
+        self._graph = graph
+
+    @property
+    def neighbors(self):
+        """Return the neighbors dictionary, loading it from disk if needed."""
+        return self._graph._load_neighbors(self.id)
+
+
+class DiskGraph(ReadOnlyGraph):
+    """Graph backed by an adjacency file, with a bounded neighbor cache."""
+
+    def __init__(self, path, cache_size=4096):
+        """Open a graph written by DiskGraph.build.
+
+        path: the adjacency file; its index is read from path + ".idx"
+        cache_size: maximum number of neighbor lists kept in memory
+        """
+        self.path = path
+        self.cache_size = cache_size
+        # Count cache hits and misses, to help choose a cache size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._fd = None
+
+        # The header line holds the graph type
+        with open(path, "r") as f:
+            header = json.loads(f.readline())
+        super().__init__(weighted=header["weighted"],
+                         directed=header["directed"])
+
+        # The index maps each vertex id to the location of its neighbors
+        self._locations = {}
+        with open(path + ".idx", "r") as f:
+            for line in f:
+                key, offset, length = json.loads(line)
+                self._locations[key] = (offset, length)
+                self.vert_list[key] = DiskVertex(key, self)
+        self.num_vertices = len(self.vert_list)
+
+        # Only keep the file open once the header and index have been read,
+        # so a bad file doesn't leak the descriptor
+        self._fd = os.open(path, os.O_RDONLY)
+
+    @classmethod
+    def build(cls, graph, path):
+        """Write graph to path and path + ".idx", for opening as a DiskGraph.
+
+        Vertex ids and weights must be JSON values (numbers or strings).
+        """
+        with open(path, "wb") as f, open(path + ".idx", "w") as index:
+            header = {"weighted": graph.weighted, "directed": graph.directed}
+            f.write(json.dumps(header).encode() + b"\n")
+            for vertex in graph:
+                neighbors = [[neighbor.id, weight]
+                             for neighbor, weight in vertex.neighbors.items()]
+                line = json.dumps([vertex.id, neighbors]).encode() + b"\n"
+                # Record where this vertex's line starts, and how long it is
+                index.write(json.dumps([vertex.id, f.tell(), len(line)]))
+                index.write("\n")
+                f.write(line)
+
+    def close(self):
+        """Close the adjacency file."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _load_neighbors(self, key):
+        """Return the neighbors dictionary of a vertex, using the cache."""
+        neighbors = self._cache.get(key)
+        if neighbors is not None:
+            # Mark the neighbors as the most recently used
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return neighbors
+
+        # Read the vertex's line, without moving a shared file position
+        self.misses += 1
+        offset, length = self._locations[key]
+        _, pairs = json.loads(os.pread(self._fd, length, offset))
+        neighbors = {self.vert_list[neighbor_key]: weight
+                     for neighbor_key, weight in pairs}
+
+        # Evict the least recently used neighbors when the cache is full
+        self._cache[key] = neighbors
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return neighbors
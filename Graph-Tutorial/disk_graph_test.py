@@ -0,0 +1,91 @@
+#!python
+
+from graph import Graph
+from graph_fixtures import make_graph
+from disk_graph import DiskGraph
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class DiskGraphTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "graph.adj")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_traversals(self):
+        g = make_graph()
+        DiskGraph.build(g, self.path)
+        # A cache smaller than the graph forces neighbors to be reloaded
+        d = DiskGraph(self.path, cache_size=2)
+        try:
+            assert d.num_vertices == g.num_vertices
+            assert d.directed and not d.weighted
+            self.assertEqual(d.get_edge_list(), g.get_edge_list())
+
+            def ids(vertices):
+                return None if vertices is None else [v.id for v in vertices]
+
+            # Breadth first search matches the in-memory graph
+            for n in range(1, 6):
+                for only_new in (True, False):
+                    self.assertCountEqual(
+                        ids(d.breadth_first_search(d.get_vertex("A"), n,
+                                                   only_new)),
+                        ids(g.breadth_first_search(g.get_vertex("A"), n,
+                                                   only_new)))
+            # Paths match the in-memory graph
+            for start, end in [("A", "I"), ("G", "F"), ("J", "H"),
+                               ("A", "X")]:
+                self.assertEqual(ids(d.find_shortest_path(start, end)),
+                                 ids(g.find_shortest_path(start, end)))
+                self.assertEqual(ids(d.find_path(start, end)),
+                                 ids(g.find_path(start, end)))
+
+            # The cache never holds more than cache_size neighbor lists
+            assert len(d._cache) <= 2
+            assert d.misses > 0 and d.hits > 0
+        finally:
+            d.close()
+
+    def test_weighted(self):
+        g = Graph(weighted=True, directed=False)
+        g.add_edge(1, 2, 3)
+        g.add_edge(2, 3, 4)
+        DiskGraph.build(g, self.path)
+        d = DiskGraph(self.path)
+        try:
+            v2 = d.get_vertex(2)
+            assert v2.get_edge_weight(d.get_vertex(3)) == 4
+            self.assertEqual(d.get_edge_list(), g.get_edge_list())
+            # Disk graphs can't be changed
+            with self.assertRaises(TypeError):
+                d.add_edge(1, 3)
+            with self.assertRaises(TypeError):
+                d.add_vertex(4)
+            with self.assertRaises(TypeError):
+                d.remove_vertex(1)
+        finally:
+            d.close()
+
+    @unittest.skipUnless(os.path.isdir("/proc/self/fd"),
+                         "needs /proc to count open files")
+    def test_bad_file(self):
+        DiskGraph.build(make_graph(), self.path)
+        with open(self.path, "r+b") as f:
+            f.write(b"{not json")
+        open_files = len(os.listdir("/proc/self/fd"))
+        # A bad header is reported without leaking the file descriptor
+        for _ in range(3):
+            with self.assertRaises(ValueError):
+                DiskGraph(self.path)
+        self.assertEqual(len(os.listdir("/proc/self/fd")), open_files)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,19 @@
 #!python
 
-from collections import deque
+from abc import ABCMeta, abstractmethod
+from bisect import bisect_left, insort
+from collections.abc import Mapping
+import csv
+import gzip
+import heapq
+from itertools import count
 import random
 import string
+import time
+import weakref
+from xml.sax.saxutils import escape, quoteattr
+
+from compact_graph import CompactGraph
 
 
 class Vertex(object):
@@ -15,10 +26,21 @@ class Vertex(object):
         neighbors: set of vertices adjacent to self, stored in dictionary with:
             key = vertex object
             value = weight of edge between self and neighbor
+        sorted neighbors: list of the neighbors in sorted order, built the
+            first time it is asked for and then kept up to date
         """
         self.id = vertex_id
-        self.neighbors = {}
+        self._init_neighbors()
         self.parent = None
+        self._sorted_neighbors = None
+        # Snapshot generation of the neighbors dictionary, and older
+        # dictionaries that snapshots may still read, see Graph.snapshot
+        self._generation = 0
+        self._history = None
+
+    def _init_neighbors(self):
+        """Give the vertex its own, empty neighbors dictionary."""
+        self.neighbors = {}
 
     def __repr__(self):
         """Return representation of vertex object."""
@@ -101,12 +123,44 @@ class Vertex(object):
             raise KeyError(f"{vertex.id} is already a neighbor of {self.id}")
         # If not, add vertex to neighbors and assign weight
         self.neighbors[vertex] = weight
+        # Keep the sorted neighbors up to date, if they have been built
+        if self._sorted_neighbors is not None:
+            try:
+                insort(self._sorted_neighbors, vertex)
+            except TypeError:
+                # Ids that can't be compared can't be kept in order
+                self._sorted_neighbors = None
+
+    def remove_neighbor(self, vertex):
+        """Remove the edge from this vertex to a neighbor."""
+        # Check if vertex is a neighbor
+        if vertex not in self.neighbors:
+            # If not, raise KeyError
+            raise KeyError(f"{vertex.id} is not a neighbor of {self.id}")
+        # If so, remove vertex from neighbors
+        del self.neighbors[vertex]
+        # Keep the sorted neighbors up to date, if they have been built
+        if self._sorted_neighbors is not None:
+            position = bisect_left(self._sorted_neighbors, vertex)
+            del self._sorted_neighbors[position]
 
     def get_neighbors(self):
         """Return the neighbors of this vertex."""
         # Return the neighbors
         return set(self.neighbors.keys())
 
+    def get_sorted_neighbors(self):
+        """Return the neighbors of this vertex as a list in sorted order.
+
+        The list is sorted once and then kept in order as neighbors are added
+        or removed, so callers must not change it.
+        """
+        # Sort the neighbors the first time they are asked for
+        if self._sorted_neighbors is None:
+            self._sorted_neighbors = sorted(self.neighbors)
+        # Return the sorted neighbors
+        return self._sorted_neighbors
+
     def get_id(self):
         """Return the id of this vertex."""
         # Return the id of the vertex
@@ -118,6 +172,463 @@ class Vertex(object):
         return self.neighbors[vertex]
 
 
+def _open_text(file_name, mode, compress=None, newline=None):
+    """Open a text file, using gzip if asked to or if the name ends in .gz."""
+    if compress is None:
+        compress = file_name.endswith(".gz")
+    if compress:
+        return gzip.open(file_name, mode + "t", newline=newline)
+    return open(file_name, mode, newline=newline)
+
+
+def _parse_number(text):
+    """Return the int or float written in text."""
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+class TraversalBudget(object):
+    """Limits the work one traversal may do, and lets another thread stop it.
+
+    Pass a budget to breadth_first_search, find_shortest_path, find_path,
+    depth_first_search or find_maximal_clique. When the budget runs out, the
+    traversal stops early, returns what it has found so far, and sets
+    truncated to True.
+    """
+
+    def __init__(self, timeout=None, max_vertices=None, max_edges=None):
+        """Initialize a budget; None means no limit.
+
+        timeout: seconds the traversal may run, from now
+        max_vertices: number of vertices the traversal may expand
+        max_edges: number of edges the traversal may look at
+        """
+        self.deadline = None if timeout is None else \
+            time.monotonic() + timeout
+        self.max_vertices = max_vertices
+        self.max_edges = max_edges
+        # Work done so far
+        self.vertices = 0
+        self.edges = 0
+        self.truncated = False
+        self.cancelled = False
+
+    def cancel(self):
+        """Ask the traversal using this budget to stop at its next step.
+
+        Safe to call from another thread, or from another asyncio task while
+        the traversal runs in an executor.
+        """
+        self.cancelled = True
+
+    def visit(self, edges):
+        """Charge for expanding one vertex with the given number of edges.
+
+        Return True if the traversal may go ahead, or False (and mark the
+        budget truncated) if that would go over a limit.
+        """
+        if self.truncated:
+            return False
+        if self.cancelled or \
+                (self.max_vertices is not None and
+                 self.vertices + 1 > self.max_vertices) or \
+                (self.max_edges is not None and
+                 self.edges + edges > self.max_edges) or \
+                (self.deadline is not None and
+                 time.monotonic() > self.deadline):
+            self.truncated = True
+            return False
+        self.vertices += 1
+        self.edges += edges
+        return True
+
+
+class ReachabilityIndex(object):
+    """Answers "can vertex a reach vertex b" queries for a fixed graph.
+
+    Vertices that can reach each other (strongly connected components) are
+    merged into one node, which leaves a directed acyclic graph. Each node
+    then gets a few GRAIL interval labels, from depth first searches that
+    visit children in random orders, and a topological level. If a can reach
+    b, a's intervals contain b's intervals and a's level is below b's, so
+    most "no" answers need no search at all. The remaining queries search
+    the acyclic graph, skipping nodes whose labels rule them out.
+    """
+
+    def __init__(self, graph, num_labels=2, seed=None):
+        """Build the index for graph, with num_labels intervals per node."""
+        rng = random.Random(seed)
+        self.component = self._find_components(graph)
+        num_components = len(set(self.component.values()))
+
+        # Edges between different components form the acyclic graph
+        children = [set() for _ in range(num_components)]
+        for vert, c in self.component.items():
+            for neighbor in vert.neighbors:
+                if self.component[neighbor] != c:
+                    children[c].add(self.component[neighbor])
+        self.children = [list(c) for c in children]
+
+        # Components are numbered in reverse topological order, so every
+        # child has a lower number than its parents
+        self.levels = [0] * num_components
+        for c in range(num_components):
+            for child in self.children[c]:
+                self.levels[c] = max(self.levels[c], self.levels[child] + 1)
+
+        self.labels = [self._label(rng) for _ in range(num_labels)]
+
+    def _find_components(self, graph):
+        """Return a dictionary mapping each vertex to its component number.
+
+        Uses Tarjan's algorithm, without recursion so deep graphs don't hit
+        the recursion limit. Components are numbered in the order they are
+        completed, which puts every component after the ones it can reach.
+        """
+        component = {}
+        num_components = 0
+        order = {}
+        low = {}
+        stack = []
+        on_stack = set()
+
+        for root in graph:
+            if root in order:
+                continue
+            order[root] = low[root] = len(order)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(root.neighbors))]
+            while len(work) > 0:
+                vert, neighbor_iter = work[-1]
+                for neighbor in neighbor_iter:
+                    if neighbor not in order:
+                        # Visit the neighbor before finishing this vertex
+                        order[neighbor] = low[neighbor] = len(order)
+                        stack.append(neighbor)
+                        on_stack.add(neighbor)
+                        work.append((neighbor, iter(neighbor.neighbors)))
+                        break
+                    if neighbor in on_stack:
+                        low[vert] = min(low[vert], order[neighbor])
+                else:
+                    # Every neighbor is done, so finish this vertex
+                    work.pop()
+                    if len(work) > 0:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[vert])
+                    # A vertex that can't reach higher up starts a component
+                    if low[vert] == order[vert]:
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component[member] = num_components
+                            if member == vert:
+                                break
+                        num_components += 1
+        return component
+
+    def _label(self, rng):
+        """Return one GRAIL labeling: a (low, rank) interval for each node."""
+        num_components = len(self.children)
+        ranks = [None] * num_components
+        lows = [None] * num_components
+        next_rank = 0
+
+        roots = list(range(num_components))
+        rng.shuffle(roots)
+        for root in roots:
+            if ranks[root] is not None:
+                continue
+            # Mark the node as started, so it is not entered twice
+            ranks[root] = -1
+            children = self.children[root][:]
+            rng.shuffle(children)
+            work = [(root, iter(children))]
+            while len(work) > 0:
+                c, child_iter = work[-1]
+                for child in child_iter:
+                    if ranks[child] is None:
+                        ranks[child] = -1
+                        grandchildren = self.children[child][:]
+                        rng.shuffle(grandchildren)
+                        work.append((child, iter(grandchildren)))
+                        break
+                else:
+                    # Number nodes after their children (post-order)
+                    work.pop()
+                    ranks[c] = next_rank
+                    next_rank += 1
+                    lows[c] = min([ranks[c]] + [lows[child]
+                                                for child in self.children[c]])
+        return lows, ranks
+
+    def _may_reach(self, a, b):
+        """Return False if the labels prove node a can't reach node b."""
+        if self.levels[a] <= self.levels[b]:
+            return False
+        for lows, ranks in self.labels:
+            if lows[b] < lows[a] or ranks[b] > ranks[a]:
+                return False
+        return True
+
+    def reachable(self, start_vert, end_vert):
+        """Return True if there is a path from start_vert to end_vert."""
+        a = self.component[start_vert]
+        b = self.component[end_vert]
+        if a == b:
+            return True
+        if not self._may_reach(a, b):
+            return False
+
+        # Search the acyclic graph, skipping nodes that can't reach b
+        seen = {a}
+        stack = [a]
+        while len(stack) > 0:
+            c = stack.pop()
+            for child in self.children[c]:
+                if child == b:
+                    return True
+                if child not in seen and self._may_reach(child, b):
+                    seen.add(child)
+                    stack.append(child)
+        return False
+
+
+class SourceDistances(object):
+    """Shortest path distances from one "hot" source, kept up to date.
+
+    Made by Graph.track_distances. Distances count edges in an unweighted
+    graph and add up weights in a weighted one, and every edge weight must be
+    non-negative. When an edge is added, only the vertices it brings closer
+    to the source are visited: the edge's end is relaxed, and a Dijkstra
+    search spreads from it through just the vertices whose distance drops.
+    Removing a tree edge or a reached vertex can make distances grow, which
+    this can't repair locally, so the distances are then recomputed the next
+    time they are read.
+    """
+
+    def __init__(self, graph, source):
+        """Compute the distances from source, which must be in graph."""
+        self.graph = graph
+        self.source = source
+        # Vertex id -> distance, for every vertex the source can reach
+        self._distances = {}
+        # Vertex id -> the id before it on a shortest path from the source
+        self._parents = {}
+        self._stale = True
+        # Number of vertices whose distance was lowered by edge insertions
+        self.repaired = 0
+
+    @property
+    def distances(self):
+        """Return a dictionary of the distance to every reachable vertex."""
+        self._refresh()
+        return self._distances
+
+    def distance(self, key):
+        """Return the distance from the source to key, or None if unreachable.
+        """
+        self._refresh()
+        return self._distances.get(key)
+
+    def path_to(self, key):
+        """Return the ids on a shortest path from the source to key, or None.
+        """
+        self._refresh()
+        if key not in self._distances:
+            return None
+        path = [key]
+        while path[-1] != self.source:
+            path.append(self._parents[path[-1]])
+        return path[::-1]
+
+    def _refresh(self):
+        """Recompute every distance, if a removal left them stale."""
+        if not self._stale:
+            return
+        self._stale = False
+        self._distances = {self.source: 0}
+        self._parents = {}
+        self._spread([self.source])
+
+    def _spread(self, keys):
+        """Lower the distances of everything reachable from keys.
+
+        keys: ids whose distance was just set or lowered
+        Returns the number of distances set or lowered on the way.
+        """
+        vert_list = self.graph.vert_list
+        weighted = self.graph.weighted
+        distances = self._distances
+        parents = self._parents
+        tie_breaker = count()
+        heap = [(distances[key], next(tie_breaker), key) for key in keys]
+        heapq.heapify(heap)
+        changed = 0
+        while len(heap) > 0:
+            distance, _, key = heapq.heappop(heap)
+            # Skip entries left behind after a shorter distance was found
+            if distance > distances[key]:
+                continue
+            for neighbor, weight in vert_list[key].neighbors.items():
+                new_distance = distance + (weight if weighted else 1)
+                old_distance = distances.get(neighbor.id)
+                if old_distance is None or new_distance < old_distance:
+                    distances[neighbor.id] = new_distance
+                    parents[neighbor.id] = key
+                    changed += 1
+                    heapq.heappush(heap, (new_distance, next(tie_breaker),
+                                          neighbor.id))
+        return changed
+
+    def _relax(self, from_key, to_key, weight, lowered):
+        """Lower to_key's distance through the edge from from_key, if shorter.
+
+        Appends to_key to lowered when its distance drops.
+        """
+        from_distance = self._distances.get(from_key)
+        if from_distance is None:
+            return
+        new_distance = from_distance + (weight if self.graph.weighted else 1)
+        old_distance = self._distances.get(to_key)
+        if old_distance is not None and old_distance <= new_distance:
+            return
+        self._distances[to_key] = new_distance
+        self._parents[to_key] = from_key
+        lowered.append(to_key)
+
+    def _changed(self, operation, args):
+        """Bring the distances up to date after a change to the graph."""
+        if self._stale:
+            # Everything is recomputed on the next read anyway
+            return
+
+        if operation == "add_edge":
+            from_key, to_key, weight = args
+            lowered = []
+            self._relax(from_key, to_key, weight, lowered)
+            if not self.graph.directed:
+                self._relax(to_key, from_key, weight, lowered)
+            if len(lowered) > 0:
+                self.repaired += len(lowered) + self._spread(lowered)
+        elif operation == "remove_edge":
+            # Only edges on the shortest path tree carry any distance
+            from_key, to_key = args
+            if self._parents.get(to_key) == from_key or \
+                    (not self.graph.directed and
+                     self._parents.get(from_key) == to_key):
+                self._stale = True
+        elif operation == "remove_vertex":
+            if args[0] in self._distances:
+                self._stale = True
+
+
+class ReadOnlyVertex(Vertex, metaclass=ABCMeta):
+    """Vertex of a ReadOnlyGraph, which can't be changed.
+
+    Subclasses define the neighbors property, to say where the neighbors
+    come from; the vertex itself only keeps its id and traversal state.
+    """
+
+    def _init_neighbors(self):
+        """Do nothing, as the neighbors property provides the neighbors."""
+
+    @property
+    @abstractmethod
+    def neighbors(self):
+        """Return the neighbors dictionary."""
+
+    def get_sorted_neighbors(self):
+        """Return the neighbors in sorted order, without keeping them."""
+        return sorted(self.neighbors)
+
+    def add_neighbor(self, vertex, weight=1):
+        """Raise TypeError, because the vertex can't be changed."""
+        raise TypeError(f"{type(self).__name__} is read-only")
+
+    def remove_neighbor(self, vertex):
+        """Raise TypeError, because the vertex can't be changed."""
+        raise TypeError(f"{type(self).__name__} is read-only")
+
+
+class SnapshotVertex(ReadOnlyVertex):
+    """Read-only vertex of a GraphSnapshot.
+
+    Traversals store their parents on the snapshot's vertices, so they
+    never interfere with traversals of the live graph.
+    """
+
+    def __init__(self, vertex, vert_list):
+        """Initialize a view of a live vertex, as seen by a snapshot.
+
+        vertex: the vertex in the live graph
+        vert_list: the vert_list of the snapshot the view belongs to
+        """
+        super().__init__(vertex.id)
+        # Snapshot generation the view reads the neighbors of
+        self._generation = vert_list.generation
+        self._vertex = vertex
+        self._vert_list = vert_list
+        self._neighbors = None
+
+    @property
+    def neighbors(self):
+        """Return the neighbors the vertex had when the snapshot was taken."""
+        if self._neighbors is None:
+            vertex = self._vertex
+            generation = self._generation
+            # Read the dictionary before its generation, see _copy_on_write
+            neighbors = vertex.neighbors
+            if vertex._generation > generation:
+                # The vertex changed since, so find the dictionary in use
+                # when the snapshot was taken
+                for old_generation, old in reversed(vertex._history or ()):
+                    if old_generation <= generation:
+                        neighbors = old
+                        break
+            vert_list = self._vert_list
+            self._neighbors = {vert_list[neighbor.id]: weight
+                               for neighbor, weight in neighbors.items()}
+        return self._neighbors
+
+
+class _SnapshotVertices(Mapping):
+    """The vert_list of a GraphSnapshot, creating its vertices as needed.
+
+    The live graph keeps copying what it changes for as long as this object,
+    or any vertex of the snapshot, is still around.
+    """
+
+    def __init__(self, vert_list, generation):
+        """Initialize from the live vert_list at the time of the snapshot."""
+        self.generation = generation
+        self._vert_list = vert_list
+        self._vertices = {}
+
+    def __getitem__(self, key):
+        """Return the snapshot's vertex for the key, else raise KeyError."""
+        vertex = self._vertices.get(key)
+        if vertex is None:
+            vertex = SnapshotVertex(self._vert_list[key], self)
+            self._vertices[key] = vertex
+        return vertex
+
+    def __contains__(self, key):
+        """Return True if the key was in the graph at the snapshot."""
+        return key in self._vert_list
+
+    def __iter__(self):
+        """Iterate over the keys in the graph at the snapshot."""
+        return iter(self._vert_list)
+
+    def __len__(self):
+        """Return the number of vertices in the graph at the snapshot."""
+        return len(self._vert_list)
+
+
 class Graph:
     """Demonstrates the essential facts and functionalities of graphs."""
 
@@ -128,11 +639,21 @@ class Graph:
             key = the id of a vertex
             value = a vertex object with an id that matches the key
         num_vertices: number of vertices in the graph
+        journal: optional GraphJournal that records every change to the graph
         """
         self.vert_list = {}
         self.num_vertices = 0
         self.weighted = weighted
         self.directed = directed
+        self.journal = None
+        self._reach_index = None
+        # SourceDistances kept up to date for each hot source, by vertex id
+        self._hot_sources = {}
+        # Snapshots that may still be reading vertices of this graph, by
+        # generation
+        self._generation = 0
+        self._snapshots = weakref.WeakValueDictionary()
+        self._vert_list_shared = False
 
     def __iter__(self):
         """Iterate over the vertex objects in the graph.
@@ -153,8 +674,12 @@ class Graph:
         self.num_vertices += 1
         # Create a new vertex
         new_vertex = Vertex(key)
+        new_vertex._generation = self._generation
         # Add the new vertex to the vertex list
+        self._copy_vert_list_on_write()
         self.vert_list[key] = new_vertex
+        # Record the change, for the journal and any indexes
+        self._record("add_vertex", key)
         # Return the new vertex
         return new_vertex
 
@@ -189,17 +714,149 @@ class Graph:
         to_vert = self.vert_list[to_key]
 
         # When both vertices in graph, make from_vert a neighbor of to_vert
+        self._copy_on_write(from_vert)
         from_vert.add_neighbor(to_vert, weight)
         # If the graph undirected, add connection back from to_vert to from_key
         if not self.directed:
+            self._copy_on_write(to_vert)
             to_vert.add_neighbor(from_vert, weight)
 
+        # Record the change, for the journal and any indexes
+        self._record("add_edge", from_key, to_key, weight)
+
+    def remove_edge(self, from_key, to_key):
+        """Remove the edge from vertex `from_key` to vertex `to_key`.
+
+        Raise KeyError if either vertex or the edge is not in the graph.
+        """
+        # Get vertices from keys, raising KeyError if they do not exist
+        from_vert = self.get_vertex(from_key)
+        to_vert = self.get_vertex(to_key)
+
+        # Remove the edge, raising KeyError if it does not exist
+        self._copy_on_write(from_vert)
+        from_vert.remove_neighbor(to_vert)
+        # If the graph undirected, remove the connection back as well
+        if not self.directed and from_vert != to_vert:
+            self._copy_on_write(to_vert)
+            to_vert.remove_neighbor(from_vert)
+
+        # Record the change, for the journal and any indexes
+        self._record("remove_edge", from_key, to_key)
+
+    def remove_vertex(self, key):
+        """Remove a vertex and every edge into or out of it.
+
+        Raise KeyError if the vertex is not in the graph.
+        """
+        # Get the vertex from the key, raising KeyError if it does not exist
+        vertex = self.get_vertex(key)
+
+        # Remove the edges pointing at the vertex
+        if self.directed:
+            # Any vertex could have an edge into a directed vertex
+            for other in self.vert_list.values():
+                if vertex in other.neighbors:
+                    self._copy_on_write(other)
+                    other.remove_neighbor(vertex)
+        else:
+            # Only neighbors have an edge back into an undirected vertex
+            for neighbor in vertex.get_neighbors():
+                if vertex in neighbor.neighbors:
+                    self._copy_on_write(neighbor)
+                    neighbor.remove_neighbor(vertex)
+
+        # Remove the vertex itself
+        self._copy_vert_list_on_write()
+        del self.vert_list[key]
+        self.num_vertices -= 1
+
+        # Record the change, for the journal and any indexes
+        self._record("remove_vertex", key)
+
+    def snapshot(self):
+        """Return a read-only view of the graph as it is right now.
+
+        Taking a snapshot is O(1). Later changes made through add_vertex,
+        add_edge, remove_edge and remove_vertex copy what they change
+        instead of changing it in place, so the snapshot stays consistent
+        while the graph keeps taking writes, and traversals can run on the
+        snapshot from other threads.
+        """
+        snapshot = GraphSnapshot(self)
+        self._snapshots[snapshot.generation] = snapshot.vert_list
+        # Writes from now on must not touch what the snapshot reads
+        self._generation += 1
+        self._vert_list_shared = True
+        return snapshot
+
+    def _copy_vert_list_on_write(self):
+        """Copy vert_list before changing it, if a snapshot is reading it."""
+        if self._vert_list_shared:
+            self._vert_list_shared = False
+            if len(self._snapshots) > 0:
+                self.vert_list = dict(self.vert_list)
+
+    def _copy_on_write(self, vertex):
+        """Copy a vertex's neighbors before changing them, if needed.
+
+        A snapshot reads the neighbors dictionary a vertex had when the
+        snapshot was taken. If a live snapshot could be reading the current
+        dictionary, keep it in the vertex's history and give the vertex a
+        copy to change.
+        """
+        # Nothing to do if the dictionary was already copied since the last
+        # snapshot was taken
+        if vertex._generation == self._generation:
+            return
+
+        # Snapshot generations that are still alive
+        live = list(self._snapshots.keys())
+        history = []
+        if len(live) > 0:
+            # Keep every dictionary some live snapshot still reads, even if
+            # the snapshots taken after it are gone
+            old_history = (vertex._history or []) + \
+                [(vertex._generation, vertex.neighbors)]
+            for i, (generation, neighbors) in enumerate(old_history):
+                if i + 1 < len(old_history):
+                    next_generation = old_history[i + 1][0]
+                else:
+                    next_generation = self._generation
+                if any(generation <= g < next_generation for g in live):
+                    history.append((generation, neighbors))
+
+        # Always replace the history, as snapshots may be reading the old one
+        vertex._history = history or None
+        # Move the generation before the dictionary, so a reader that sees
+        # the new dictionary also sees the new generation
+        vertex._generation = self._generation
+        if len(history) > 0:
+            vertex.neighbors = dict(vertex.neighbors)
+
+    def _record(self, operation, *args):
+        """Note a change made to the graph by one of the graph's methods."""
+        # The reachability index no longer matches the graph
+        self._reach_index = None
+        # Repair the distances from the hot sources
+        if len(self._hot_sources) > 0:
+            if operation == "remove_vertex":
+                self._hot_sources.pop(args[0], None)
+            for tracker in self._hot_sources.values():
+                tracker._changed(operation, args)
+        # Record the change so it can be replayed after a crash
+        if self.journal is not None:
+            self.journal.record(operation, *args)
+
     def get_vertices(self):
         """Return all the vertices in the graph."""
         return set(self.vert_list.values())
 
     def make_graph_from_file(self, file_name):
-        """Read graph data from a file, and create a graph based on it."""
+        """Read graph data from a file, and create a graph based on it.
+
+        Files ending in .gz are decompressed while they are read.
+        """
         valid_types = "gGdD"
 
         graph_type = ""
@@ -208,8 +865,8 @@ class Graph:
         directed = False
         weighted = False
 
-        with open(file_name, 'r') as f:
-            for line in f.readlines():
+        with _open_text(file_name, 'r') as f:
+            for line in f:
                 # Strip trailing whitespace
                 line = line.rstrip()
 
@@ -237,7 +894,7 @@ class Graph:
         if graph_type == "D":
             directed = True
         # See if graph is weighted
-        if len(edge_list[0].split(",")) == 3:
+        if len(edge_list) > 0 and len(edge_list[0].split(",")) == 3:
             weighted = True
 
         # Set the graph type if it has not been set yet
@@ -247,11 +904,12 @@ class Graph:
 
         # Add vertices to graph
         # TODO: Does not handle string vertex names
-        for vertex in vertices.split(","):
-            self.add_vertex(int(vertex))
+        if vertices != "":
+            for vertex in vertices.split(","):
+                self.add_vertex(int(vertex))
 
         # Add edges to graph
-        # TODO: Does not handle string vertex names or decimal weights
+        # TODO: Does not handle string vertex names
         for edge in edge_list:
             # Remove parenthesis
             data = edge[1:-1]
@@ -261,11 +919,254 @@ class Graph:
             # Split the tuple correctly
             if weighted:
                 # Remove parenthesis from strings, and convert strings to ints
-                self.add_edge(int(data[0]), int(data[1]), int(data[2]))
+                self.add_edge(int(data[0]), int(data[1]),
+                              _parse_number(data[2]))
             else:
                 # Remove parenthesis from strings, and convert strings to ints
                 self.add_edge(int(data[0]), int(data[1]))
 
+    def freeze(self):
+        """Return a read-only CompactGraph copy of this graph.
+
+        The copy stores the adjacency in flat arrays, which can be published
+        to other processes with CompactGraph.to_shared_memory.
+        """
+        return CompactGraph.from_graph(self)
+
+    def reorder(self, strategy="bfs", seed=None):
+        """Renumber the vertices so neighbors sit close together.
+
+        vert_list and every neighbors dictionary are rebuilt in the order
+        given by CompactGraph.vertex_order(strategy), so later calls to
+        freeze() lay out neighbors close together in the arrays. Vertex ids
+        and edges don't change, so lookups and traversals by id work as
+        before; only the iteration order of vertices and neighbors moves.
+        """
+        compact = self.freeze()
+        order = compact.vertex_order(strategy, seed)
+        vertices = [self.vert_list[compact.ids[i]] for i in order]
+        position = {vertex: i for i, vertex in enumerate(vertices)}
+
+        # A new dictionary, so snapshots keep reading the old one
+        self.vert_list = {vertex.id: vertex for vertex in vertices}
+        self._vert_list_shared = False
+        for vertex in vertices:
+            self._copy_on_write(vertex)
+            items = sorted(vertex.neighbors.items(),
+                           key=lambda item: position[item[0]])
+            vertex.neighbors.clear()
+            vertex.neighbors.update(items)
+
+    def random_walks(self, starts=None, length=80, p=1, q=1, n_per_node=1,
+                     seed=None, processes=None):
+        """Return random walks through the graph as lists of vertex ids.
+
+        Walks are sampled from a frozen copy of the graph, see
+        CompactGraph.random_walks for the parameters. To sample many batches,
+        freeze the graph once and call random_walks on the CompactGraph,
+        which returns the walks as integer arrays.
+        """
+        compact = self.freeze()
+        walks = compact.random_walks(starts, length, p, q, n_per_node, seed,
+                                     processes)
+        return [[compact.ids[i] for i in walk] for walk in walks]
+
+    def communities(self, method="label_propagation", seed=None,
+                    processes=None):
+        """Return the community number of every vertex, as an integer array.
+
+        The array is in vert_list order, so the community of the vertex with
+        key list(g.vert_list)[i] is at index i. See CompactGraph.communities
+        for the methods.
+        """
+        return self.freeze().communities(method, seed=seed,
+                                         processes=processes)
+
+    def partition(self, k, method="fennel", seed=None, passes=1,
+                  balance=1.1):
+        """Return the shard number of every vertex, as an integer array.
+
+        The array is in vert_list order, like communities. See
+        CompactGraph.partition for the methods.
+        """
+        return self.freeze().partition(k, method, seed, passes, balance)
+
+    def eccentricity(self, vertex):
+        """Return the most edges on a shortest path from the vertex id.
+
+        Only vertices that can be reached count.
+        """
+        return self.freeze().eccentricity(vertex)
+
+    def diameter(self, exact=True):
+        """Return the most edges on any shortest path in the graph.
+
+        See CompactGraph.diameter.
+        """
+        return self.freeze().diameter(exact)
+
+    def radius(self, exact=True):
+        """Return the smallest eccentricity of any vertex.
+
+        See CompactGraph.radius.
+        """
+        return self.freeze().radius(exact)
+
+    def all_pairs_distances(self, method="auto", predecessors=False,
+                            path=None):
+        """Return a DistanceMatrix of shortest path lengths between all pairs.
+
+        The matrix is indexed by vertex ids, for example table["A", "B"]. See
+        CompactGraph.all_pairs_distances for the options.
+        """
+        return self.freeze().all_pairs_distances(method, predecessors, path)
+
+    def neighborhood_sizes(self, max_hops=None, precision=7, seed=None):
+        """Estimate how many vertices are within h hops of each vertex.
+
+        Returns a list with one array per hop, in vert_list order. See
+        CompactGraph.neighborhood_sizes.
+        """
+        return self.freeze().neighborhood_sizes(max_hops, precision, seed)
+
+    def neighborhood_function(self, max_hops=None, precision=7, seed=None):
+        """Estimate the number of pairs of vertices within h hops, for each h.
+
+        See CompactGraph.neighborhood_function.
+        """
+        return self.freeze().neighborhood_function(max_hops, precision, seed)
+
+    def effective_diameter(self, fraction=0.9, max_hops=None, precision=7,
+                           seed=None):
+        """Estimate the hops needed to connect fraction of connected pairs.
+
+        See CompactGraph.effective_diameter.
+        """
+        return self.freeze().effective_diameter(fraction, max_hops,
+                                                precision, seed)
+
+    def iter_edges(self):
+        """Generate the edges one at a time, like the tuples of get_edge_list.
+
+        Each undirected edge is generated once, from the vertex that comes
+        first in vert_list, without keeping a set of every edge.
+        """
+        # Undirected edges to vertices already done were generated already
+        done = set()
+        for from_vert in self.vert_list.values():
+            for to_vert, weight in from_vert.neighbors.items():
+                if not self.directed and to_vert in done:
+                    continue
+                if self.weighted:
+                    yield (from_vert.id, to_vert.id, weight)
+                else:
+                    yield (from_vert.id, to_vert.id)
+            if not self.directed:
+                done.add(from_vert)
+
+    def _edge_chunks(self, chunk_size):
+        """Generate lists of up to chunk_size edges from iter_edges."""
+        chunk = []
+        for edge in self.iter_edges():
+            chunk.append(edge)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if len(chunk) > 0:
+            yield chunk
+
+    def write_edge_list(self, file_name, compress=None, chunk_size=4096):
+        """Write the graph in the format read by make_graph_from_file.
+
+        The first line is G (undirected) or D (directed), the second lists
+        the vertices, then each edge is written as (from,to) or, if the graph
+        is weighted, (from,to,weight). Edges are streamed in chunks of
+        chunk_size, and the file is gzipped if compress is True, or if
+        compress is None and file_name ends in .gz.
+
+        make_graph_from_file only reads non-negative integer ids, so raise
+        ValueError, before anything is written, if the graph has any other
+        id. Use write_csv or write_graphml for those graphs.
+        """
+        for key in self.vert_list:
+            if type(key) is not int or key < 0:
+                raise ValueError(f"Vertex id {key!r} can't be read back by "
+                                 "make_graph_from_file, which only reads "
+                                 "non-negative integer ids")
+
+        with _open_text(file_name, 'w', compress) as f:
+            f.write("D\n" if self.directed else "G\n")
+
+            # Write the vertices a chunk at a time, separated by commas
+            keys = iter(self.vert_list)
+            separator = ""
+            while True:
+                chunk = [str(key) for _, key in zip(range(chunk_size), keys)]
+                if len(chunk) == 0:
+                    break
+                f.write(separator + ",".join(chunk))
+                separator = ","
+            f.write("\n")
+
+            for chunk in self._edge_chunks(chunk_size):
+                f.write("".join("(" + ",".join(str(x) for x in edge) + ")\n"
+                                for edge in chunk))
+
+    def write_csv(self, file_name, compress=None, chunk_size=4096):
+        """Write the edges as CSV rows: from, to, and weight if weighted.
+
+        Vertices without any edges are not written. Compression works like
+        in write_edge_list.
+        """
+        with _open_text(file_name, 'w', compress, newline="") as f:
+            writer = csv.writer(f)
+            if self.weighted:
+                writer.writerow(["from", "to", "weight"])
+            else:
+                writer.writerow(["from", "to"])
+            for chunk in self._edge_chunks(chunk_size):
+                writer.writerows(chunk)
+
+    def write_graphml(self, file_name, compress=None, chunk_size=4096):
+        """Write the graph as GraphML, with weights as an edge attribute.
+
+        Compression works like in write_edge_list.
+        """
+        with _open_text(file_name, 'w', compress) as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                    '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">'
+                    '\n')
+            if self.weighted:
+                f.write('  <key id="weight" for="edge" attr.name="weight" '
+                        'attr.type="double"/>\n')
+            edge_default = "directed" if self.directed else "undirected"
+            f.write(f'  <graph id="G" edgedefault="{edge_default}">\n')
+
+            # Write the vertices a chunk at a time
+            keys = iter(self.vert_list)
+            while True:
+                chunk = [key for _, key in zip(range(chunk_size), keys)]
+                if len(chunk) == 0:
+                    break
+                f.write("".join(f'    <node id={quoteattr(str(key))}/>\n'
+                                for key in chunk))
+
+            for chunk in self._edge_chunks(chunk_size):
+                lines = []
+                for edge in chunk:
+                    source = quoteattr(str(edge[0]))
+                    target = quoteattr(str(edge[1]))
+                    if self.weighted:
+                        weight = escape(str(edge[2]))
+                        lines.append(f'    <edge source={source} '
+                                     f'target={target}><data key="weight">'
+                                     f'{weight}</data></edge>\n')
+                    else:
+                        lines.append(f'    <edge source={source} '
+                                     f'target={target}/>\n')
+                f.write("".join(lines))
+            f.write("  </graph>\n</graphml>\n")
+
     def get_edge_list(self):
         """Return a list of edges (with their weights if weighted)."""
         edge_list = set()
@@ -294,8 +1195,78 @@ class Graph:
 
         return edge_list
 
-    def breadth_first_search(self, vertex, n, only_new=True):
-        """Find all vertices n edges away from the passed in vertex."""
+    def has_edges(self, pairs):
+        """Return whether each (from_key, to_key) pair is joined by an edge.
+
+        Pairs with a key that is not in the graph are not edges. Each answer
+        is one dictionary lookup, without copying any neighbors.
+        """
+        vert_list = self.vert_list
+        result = []
+        for from_key, to_key in pairs:
+            from_vert = vert_list.get(from_key)
+            to_vert = vert_list.get(to_key)
+            result.append(from_vert is not None and to_vert is not None and
+                          to_vert in from_vert.neighbors)
+        return result
+
+    def edge_weights(self, pairs):
+        """Return the weight of the edge for each (from_key, to_key) pair.
+
+        Pairs that are not edges get None.
+        """
+        vert_list = self.vert_list
+        result = []
+        for from_key, to_key in pairs:
+            from_vert = vert_list.get(from_key)
+            to_vert = vert_list.get(to_key)
+            if from_vert is None or to_vert is None:
+                result.append(None)
+            else:
+                result.append(from_vert.neighbors.get(to_vert))
+        return result
+
+    def mutual_friends(self, pairs, counts=False):
+        """Return the ids of the neighbors shared by each pair of vertex keys.
+
+        For directed graphs, these are the vertices both keys have an edge
+        to. Keys that are not in the graph have no neighbors.
+        counts: if True, return the number of mutual neighbors of each pair
+            instead of a list of their ids
+        """
+        vert_list = self.vert_list
+        result = []
+        for a_key, b_key in pairs:
+            a_vert = vert_list.get(a_key)
+            b_vert = vert_list.get(b_key)
+            if a_vert is None or b_vert is None:
+                result.append(0 if counts else [])
+                continue
+            # Probe the larger neighbors dictionary with the smaller one
+            small = a_vert.neighbors
+            large = b_vert.neighbors
+            if len(small) > len(large):
+                small, large = large, small
+            if counts:
+                result.append(sum(1 for vert in small if vert in large))
+            else:
+                result.append([vert.id for vert in small if vert in large])
+        return result
+
+    def breadth_first_search(self, vertex, n, only_new=True, counts=False,
+                             budget=None):
+        """Find all vertices n edges away from the passed in vertex.
+
+        only_new: if True, only find vertices whose shortest path from vertex
+            has n edges. If False, find every vertex at the end of a walk of
+            n edges, which may revisit vertices.
+        counts: if True, return a dictionary mapping each vertex found to the
+            number of walks (shortest paths when only_new is True) of n edges
+            that reach it, instead of a set
+        budget: optional TraversalBudget. If it runs out while level n is
+            being found, the vertices found so far are returned; if it runs
+            out before that, none are.
+        """
         # Raise error if non vertex object is passed in as vertex
         if not isinstance(vertex, Vertex):
             raise TypeError("vertex parameter must be of type Vertex")
@@ -309,54 +1280,113 @@ class Graph:
             # Create a set of vertices that have already been visited
             seen_vertices = set([vertex])
 
-        # Create deque with passed in vertex
-        vertex_deque = deque([vertex])
+        # Map each vertex on the current level to the number of walks from
+        # vertex that reach it. Walks that meet at a vertex are counted
+        # together, so a level never holds more than every vertex once
+        frontier = {vertex: 1}
         # n_counter tracks the current level
         n_counter = 0
-        # counter tracks how many vertices from level n are still in the deque
-        counter = 1
 
         # Keep looping until there are no more vertices to go through, or
         # until the nth level has been reached
-        while len(vertex_deque) > 0 and n_counter < n:
-            # Grab a vertex from the front of the deque
-            popped_vertex = vertex_deque.popleft()
-
-            # Queue vertices if they will be seen for the first time
-            if only_new:
+        stopped = False
+        while len(frontier) > 0 and n_counter < n:
+            next_frontier = {}
+            for popped_vertex, walks in frontier.items():
+                # Stop when the budget can't pay for this vertex's edges
+                if budget is not None and \
+                        not budget.visit(len(popped_vertex.neighbors)):
+                    stopped = True
+                    break
                 # Go through the neighbors of the popped_vertex
                 for vert in popped_vertex.get_neighbors():
-                    # If this vertex is new, allow it to be traversed
-                    if vert not in seen_vertices:
-                        # Set the parent of this vertex as the popped vertex
-                        vert.parent = popped_vertex
-                        # Add vertex to back of the deque
-                        vertex_deque.append(vert)
-                        # Mark that the vertex has been seen
-                        seen_vertices.add(vert)
-            # Otherwise, just add all vertices
-            else:
-                # Add all vertices that vert can reach to the back of the deque
-                vertex_deque.extend(popped_vertex.get_neighbors())
-            # Remove one from the counter because a vertex was just popped
-            counter -= 1
-
-            # When all nodes from the current level are removed
-            if counter == 0:
-                # Set the current level that all the current vertices are on
-                n_counter += 1
-                # Track how many vertices can be reached on this level
-                counter = len(vertex_deque)
+                    # Vertices seen on an earlier level can't be new
+                    if only_new and vert in seen_vertices:
+                        continue
+                    if vert in next_frontier:
+                        # Another walk already reached vert on this level
+                        next_frontier[vert] += walks
+                    else:
+                        next_frontier[vert] = walks
+                        if only_new:
+                            # Set the parent of this vertex as the popped
+                            # vertex, the first one it was found from
+                            vert.parent = popped_vertex
+
+            # Mark every vertex on the new level as seen
+            if only_new:
+                seen_vertices.update(next_frontier)
+            frontier = next_frontier
+            # Set the current level that all the current vertices are on
+            n_counter += 1
+            if stopped:
+                break
 
         # If the loop above ends early due to lack of levels,
         if n_counter < n:
-            # Return empty set because no vertices exist n edges away
-            return set()
+            # No vertices exist n edges away
+            frontier = {}
+        if counts:
+            return frontier
         # Return a set of all the vertices that can be reached at the nth level
-        return set(vertex_deque)
+        return set(frontier)
+
+    def ego_graph(self, vertex, k, induced=True):
+        """Return a new graph of all vertices at most k edges from vertex.
+
+        induced: if True, keep every edge between the vertices found. If
+            False, only keep the edges the search could follow, which leaves
+            out edges between two vertices that are both k edges away (for
+            directed graphs, every edge out of a vertex k edges away).
+        """
+        # Raise error if non vertex object is passed in as vertex
+        if not isinstance(vertex, Vertex):
+            raise TypeError("vertex parameter must be of type Vertex")
 
-    def find_shortest_path(self, start, end):
-        """Find the shortest path between two vertices."""
+        # Raise error if vertex not in the graph
+        if self.vert_list.get(vertex.id) is not vertex:
+            raise ValueError(f"{vertex} is not in the Graph")
+
+        # Find the distance to every vertex within k edges, in one search
+        distances = {vertex: 0}
+        current_level = [vertex]
+        for level in range(1, k + 1):
+            next_level = []
+            for popped_vertex in current_level:
+                for vert in popped_vertex.neighbors:
+                    # Only record the first (shortest) distance to a vertex
+                    if vert not in distances:
+                        distances[vert] = level
+                        next_level.append(vert)
+            current_level = next_level
+
+        # Build the new graph directly, rather than edge by edge
+        ego = Graph(weighted=self.weighted, directed=self.directed)
+        copies = {vert: Vertex(vert.id) for vert in distances}
+        ego.vert_list = {vert.id: copy for vert, copy in copies.items()}
+        ego.num_vertices = len(copies)
+
+        for vert, copy in copies.items():
+            # Vertices k edges away were not searched from
+            if not induced and self.directed and distances[vert] == k:
+                continue
+            for neighbor, weight in vert.neighbors.items():
+                # Leave out edges to vertices more than k edges away
+                if neighbor not in copies:
+                    continue
+                # Leave out edges between two vertices on the last level
+                if not induced and distances[vert] == k and \
+                        distances[neighbor] == k:
+                    continue
+                copy.neighbors[copies[neighbor]] = weight
+        return ego
+
+    def find_shortest_path(self, start, end, budget=None):
+        """Find the shortest path between two vertices.
+
+        budget: optional TraversalBudget; if it runs out before end is
+            found, return None
+        """
         # Raise error if start or end does not exist in graph
         if start not in self.vert_list:
             raise KeyError(f"Vertex({start}) is not in the Graph")
@@ -367,34 +1397,364 @@ class Graph:
         start_vert = self.vert_list[start]
         end_vert = self.vert_list[end]
 
-        # Get the vertices one edge away from starting vertex
-        level = 1
-        verts_at_n_level = self.breadth_first_search(start_vert, level)
-        # Keep searching levels there is nothing, or the end vertex is found
-        while end_vert not in verts_at_n_level:
-            # If there are no more vertices to search
-            if len(verts_at_n_level) == 0:
-                # Return None because there is no path between the vertices
-                return None
-            # Get the vertices one more edge away from the starting vertex
-            level += 1
-            verts_at_n_level = self.breadth_first_search(start_vert, level)
+        # Search one level at a time, remembering where each vertex was
+        # first found from, until the end vertex is found
+        parents = {start_vert: None}
+        current_level = [start_vert]
+        while len(current_level) > 0:
+            next_level = []
+            for popped_vertex in current_level:
+                # Give up when the budget can't pay for this vertex's edges
+                if budget is not None and \
+                        not budget.visit(len(popped_vertex.neighbors)):
+                    return None
+                for vert in popped_vertex.get_neighbors():
+                    if vert in parents:
+                        continue
+                    parents[vert] = popped_vertex
+                    if vert == end_vert:
+                        # Create the path from the end vertex back to start
+                        path = [end_vert]
+                        while path[-1] != start_vert:
+                            path.append(parents[path[-1]])
+                        # Reverse the path, and return it
+                        path[:] = reversed(path)
+                        return path
+                    next_level.append(vert)
+            current_level = next_level
+
+        # Return None because there is no path between the vertices
+        return None
+
+    def _reverse_adjacency(self):
+        """Return a dictionary mapping each vertex to its incoming edges.
+
+        Undirected graphs store both directions of each edge, so for them the
+        incoming edges are the same as the neighbors.
+        """
+        if not self.directed:
+            return {vert: vert.neighbors for vert in self}
+        reverse = {vert: {} for vert in self}
+        for vert in self:
+            for neighbor, weight in vert.neighbors.items():
+                reverse[neighbor][vert] = weight
+        return reverse
+
+    def _bidirectional_dijkstra(self, start_vert, end_vert, reverse,
+                                blocked_vertices=(), blocked_edges=()):
+        """Return the cost and vertices of a cheapest path, or None.
+
+        Searches forward from start_vert and backward from end_vert at the
+        same time, and stops once the two searches can't find anything
+        cheaper. Vertices in blocked_vertices and (from, to) vertex pairs in
+        blocked_edges are treated as if they were not in the graph.
+        """
+        # Index 0 holds the forward search, index 1 the backward search
+        costs = ({start_vert: 0}, {end_vert: 0})
+        parents = ({start_vert: None}, {end_vert: None})
+        settled = (set(), set())
+        # The counter breaks ties, so vertices are never compared
+        tie_breaker = count()
+        heaps = ([(0, next(tie_breaker), start_vert)],
+                 [(0, next(tie_breaker), end_vert)])
+        best_cost = float("inf")
+        meeting_vert = None
+
+        while len(heaps[0]) > 0 and len(heaps[1]) > 0:
+            # Stop once no path through the frontiers can be cheaper
+            if heaps[0][0][0] + heaps[1][0][0] >= best_cost:
+                break
+            # Expand the side with the cheaper frontier
+            side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+            cost, _, vert = heapq.heappop(heaps[side])
+            if vert in settled[side]:
+                continue
+            settled[side].add(vert)
+
+            # Forward, follow edges out. Backward, follow edges in
+            if side == 0:
+                edges = vert.neighbors.items()
+            else:
+                edges = reverse[vert].items()
+            for neighbor, weight in edges:
+                if neighbor in blocked_vertices:
+                    continue
+                edge = (vert, neighbor) if side == 0 else (neighbor, vert)
+                if edge in blocked_edges:
+                    continue
+                if weight < 0:
+                    raise ValueError("edge weights must not be negative")
+                new_cost = cost + weight
+                if new_cost < costs[side].get(neighbor, float("inf")):
+                    costs[side][neighbor] = new_cost
+                    parents[side][neighbor] = vert
+                    heapq.heappush(heaps[side],
+                                   (new_cost, next(tie_breaker), neighbor))
+                # Check if the two searches have met at a cheaper path
+                other_cost = costs[1 - side].get(neighbor)
+                if other_cost is not None and \
+                        new_cost + other_cost < best_cost:
+                    best_cost = new_cost + other_cost
+                    meeting_vert = neighbor
+
+        if meeting_vert is None:
+            return None
+
+        # Join the forward path to the meeting vertex with the backward path
+        path = [meeting_vert]
+        while parents[0][path[-1]] is not None:
+            path.append(parents[0][path[-1]])
+        path.reverse()
+        while parents[1][path[-1]] is not None:
+            path.append(parents[1][path[-1]])
+        return best_cost, path
+
+    def k_shortest_paths(self, start, end, k=None):
+        """Generate up to k simple paths from start to end, cheapest first.
+
+        Uses Yen's algorithm: each new path leaves an earlier path at some
+        vertex (the spur) and takes the cheapest detour from there that no
+        earlier path with the same beginning has taken. Edge weights are
+        the costs, so unweighted graphs yield the paths with fewest edges.
+        Like find_shortest_path, there is no path from a vertex to itself.
+        Raise ValueError if k is negative.
+        """
+        # Raise error if start or end does not exist in graph
+        if start not in self.vert_list:
+            raise KeyError(f"Vertex({start}) is not in the Graph")
+        if end not in self.vert_list:
+            raise KeyError(f"Vertex({end}) is not in the Graph")
+        if k is not None and k < 0:
+            raise ValueError(f"k must be at least 0, not {k}")
 
-        # Create a path list and the ending vertex
-        path = [end_vert]
-        parent = end_vert
-        # Go through the parents of each vertex, until start vertex is reached
-        while start_vert != parent:
-            # Move to the parent of the current vertex, and add it to the path
-            parent = parent.parent
-            path.append(parent)
+        start_vert = self.vert_list[start]
+        end_vert = self.vert_list[end]
+        if start_vert == end_vert or k == 0:
+            return
+
+        # Every spur search shares the same incoming edge lists
+        reverse = self._reverse_adjacency()
+        result = self._bidirectional_dijkstra(start_vert, end_vert, reverse)
+        if result is None:
+            return
+        cost, path = result
+
+        # Paths found so far, and the cost of each of their prefixes
+        found = [path]
+        prefix_costs = [self._prefix_costs(path)]
+        # Candidate paths waiting to be yielded, cheapest first
+        candidates = []
+        seen = {tuple(path)}
+        tie_breaker = count()
+
+        while True:
+            yield path
+            if k is not None and len(found) >= k:
+                return
+
+            # Look for detours from every vertex of the last path
+            for i in range(len(path) - 1):
+                spur_vert = path[i]
+                root = path[:i + 1]
+                # Don't repeat an edge taken by a path with the same root
+                blocked_edges = set()
+                for other in found:
+                    if other[:i + 1] == root:
+                        blocked_edges.add((other[i], other[i + 1]))
+                        blocked_edges.add((other[i + 1], other[i]))
+                # Keep paths simple by not revisiting the root
+                blocked_vertices = set(root[:-1])
+
+                result = self._bidirectional_dijkstra(
+                    spur_vert, end_vert, reverse, blocked_vertices,
+                    blocked_edges)
+                if result is None:
+                    continue
+                spur_cost, spur_path = result
+                candidate = root[:-1] + spur_path
+                if tuple(candidate) not in seen:
+                    seen.add(tuple(candidate))
+                    candidate_cost = prefix_costs[-1][i] + spur_cost
+                    heapq.heappush(candidates, (candidate_cost,
+                                                next(tie_breaker), candidate))
+
+            if len(candidates) == 0:
+                return
+            cost, _, path = heapq.heappop(candidates)
+            found.append(path)
+            prefix_costs.append(self._prefix_costs(path))
+
+    def _prefix_costs(self, path):
+        """Return the cost of reaching each vertex of path from its start."""
+        costs = [0]
+        for from_vert, to_vert in zip(path, path[1:]):
+            costs.append(costs[-1] + from_vert.neighbors[to_vert])
+        return costs
+
+    def minimum_spanning_forest(self, algorithm="kruskal", as_graph=False):
+        """Return the edges of a minimum spanning tree of each component.
+
+        algorithm: "kruskal" sorts every edge by weight and joins components
+            with a union-find; "prim" grows each tree from a heap of the
+            edges leaving it
+        as_graph: if True, return the forest as a new undirected Graph
+            instead of a list of edges
+
+        Edges are (from id, to id, weight) tuples when the graph is weighted,
+        else (from id, to id) tuples, like get_edge_list.
+        """
+        # Raise error if called when graph is directed
+        if self.directed:
+            raise TypeError("spanning forest can't be found on directed graph")
 
-        # Reverse the path, and return it
-        path[:] = reversed(path)
-        return path
+        if algorithm == "kruskal":
+            forest = self._kruskal()
+        elif algorithm == "prim":
+            forest = self._prim()
+        else:
+            raise ValueError(f"Unknown algorithm {algorithm!r}")
+
+        if as_graph:
+            tree = Graph(weighted=self.weighted, directed=False)
+            # Keep every vertex, including ones with no edges
+            for key in self.vert_list:
+                tree.add_vertex(key)
+            for from_key, to_key, weight in forest:
+                tree.add_edge(from_key, to_key, weight)
+            return tree
+        if self.weighted:
+            return forest
+        return [(from_key, to_key) for from_key, to_key, _ in forest]
+
+    def _kruskal(self):
+        """Return the minimum spanning forest edges, using Kruskal's method."""
+        index = {vert: i for i, vert in enumerate(self)}
+
+        # List each undirected edge once, as parallel lists
+        from_list = []
+        to_list = []
+        weights = []
+        for vert, i in index.items():
+            for neighbor, weight in vert.neighbors.items():
+                # Keep the copy of the edge leading to a later vertex
+                if i < index[neighbor]:
+                    from_list.append(vert)
+                    to_list.append(neighbor)
+                    weights.append(weight)
+
+        # Union-find: each vertex points towards the root of its component
+        roots = list(range(len(index)))
+        sizes = [1] * len(index)
+
+        def find(i):
+            """Return the root of the component containing vertex i."""
+            while roots[i] != i:
+                # Skip a level on the way up, to keep the paths short
+                roots[i] = roots[roots[i]]
+                i = roots[i]
+            return i
+
+        forest = []
+        # Go through the edges from lightest to heaviest
+        for e in sorted(range(len(weights)), key=weights.__getitem__):
+            root_a = find(index[from_list[e]])
+            root_b = find(index[to_list[e]])
+            # Skip edges inside a component, they would form a cycle
+            if root_a == root_b:
+                continue
+            # Hang the smaller component below the larger one
+            if sizes[root_a] < sizes[root_b]:
+                root_a, root_b = root_b, root_a
+            roots[root_b] = root_a
+            sizes[root_a] += sizes[root_b]
+            forest.append((from_list[e].id, to_list[e].id, weights[e]))
+            # A spanning tree of every vertex is complete
+            if len(forest) == len(index) - 1:
+                break
+        return forest
+
+    def _prim(self):
+        """Return the minimum spanning forest edges, using Prim's method."""
+        in_tree = set()
+        forest = []
+        # The counter breaks ties, so vertices are never compared
+        tie_breaker = count()
+
+        # Grow a new tree from each vertex not yet in a tree
+        for root in self:
+            if root in in_tree:
+                continue
+            in_tree.add(root)
+            heap = [(weight, next(tie_breaker), root, neighbor)
+                    for neighbor, weight in root.neighbors.items()]
+            heapq.heapify(heap)
+
+            while len(heap) > 0:
+                weight, _, from_vert, to_vert = heapq.heappop(heap)
+                # Skip edges back into the tree
+                if to_vert in in_tree:
+                    continue
+                in_tree.add(to_vert)
+                forest.append((from_vert.id, to_vert.id, weight))
+                # The edges out of the new vertex can now extend the tree
+                for neighbor, next_weight in to_vert.neighbors.items():
+                    if neighbor not in in_tree:
+                        heapq.heappush(heap, (next_weight, next(tie_breaker),
+                                              to_vert, neighbor))
+        return forest
+
+    def build_reachability_index(self, num_labels=2, seed=None):
+        """Build the index used by reachable, and by find_path for pruning.
+
+        The index is dropped whenever the graph is changed through its
+        add/remove methods, and rebuilt by the next call to reachable.
+        """
+        self._reach_index = ReachabilityIndex(self, num_labels, seed)
+        return self._reach_index
+
+    def reachable(self, start, end):
+        """Return True if there is a path from vertex start to vertex end.
 
-    def depth_first_search(self, vertex, least_first=True, clear_parents=True):
-        """Create DFS spanning tree by setting parent property of vertex."""
+        Every vertex can reach itself. Builds the reachability index first if
+        it is missing, so repeated queries are fast.
+        """
+        # Raise error if start or end keys do not exist in graph
+        if start not in self.vert_list:
+            raise KeyError(f"Vertex({start}) is not in the Graph")
+        if end not in self.vert_list:
+            raise KeyError(f"Vertex({end}) is not in the Graph")
+
+        if self._reach_index is None:
+            self.build_reachability_index()
+        return self._reach_index.reachable(self.vert_list[start],
+                                           self.vert_list[end])
+
+    def track_distances(self, source):
+        """Keep the distances from vertex source up to date, and return them.
+
+        Returns the SourceDistances for source, which add_edge repairs in
+        place as edges arrive. Calling it again for the same source returns
+        the same object. Tracking stops if the source is removed.
+        """
+        if source not in self.vert_list:
+            raise KeyError(f"Vertex({source}) is not in the Graph")
+        if source not in self._hot_sources:
+            self._hot_sources[source] = SourceDistances(self, source)
+        return self._hot_sources[source]
+
+    def untrack_distances(self, source):
+        """Stop keeping the distances from vertex source up to date."""
+        self._hot_sources.pop(source, None)
+
+    def depth_first_search(self, vertex, least_first=True, clear_parents=True,
+                           prune=None, budget=None):
+        """Create DFS spanning tree by setting parent property of vertex.
+
+        prune: optional function of a vertex; the search does not enter
+            vertices it returns True for, which keep a parent of None
+        budget: optional TraversalBudget; when it runs out, the search stops
+            and vertices it did not reach keep a parent of None
+        """
         # Raise error if non vertex object is passed in as vertex
         if not isinstance(vertex, Vertex):
             raise TypeError("vertex parameter must be of type Vertex")
@@ -415,10 +1775,14 @@ class Graph:
             # Set starting vertex parent to False, it does not get a parent
             vertex.parent = False
 
-        # If order matters, sort the neighbors
+        # Stop when the budget can't pay for this vertex's edges
+        if budget is not None and not budget.visit(len(vertex.neighbors)):
+            return
+
+        # If order matters, get the neighbors in sorted order
         if least_first:
-            # Sort the neighbors
-            neighbors = sorted(vertex.get_neighbors())
+            # Use the sorted neighbors kept by the vertex
+            neighbors = vertex.get_sorted_neighbors()
         else:
             # Otherwise, just get the unordered set
             neighbors = vertex.get_neighbors()
@@ -427,13 +1791,28 @@ class Graph:
         for neighbor in neighbors:
             # Check if it does not have a parent
             if neighbor.parent is None:
+                # Skip the neighbor if the caller has no use for it
+                if prune is not None and prune(neighbor):
+                    continue
                 # If it doesn't, give it a parent
                 neighbor.parent = vertex
                 # Continue the depth first search (no return needed)
-                self.depth_first_search(neighbor, least_first, False)
+                self.depth_first_search(neighbor, least_first, False, prune,
+                                        budget)
+                # Stop here too if the budget ran out further down
+                if budget is not None and budget.truncated:
+                    return
+
+    def find_path(self, start, end, budget=None):
+        """Find any path from from_vert to to_vert.
+
+        If the reachability index has been built, it is used to return None
+        right away when there is no path, and to skip every vertex that can't
+        reach end during the search. The path found is the same either way.
 
-    def find_path(self, start, end):
-        """Find any path from from_vert to to_vert."""
+        budget: optional TraversalBudget; if it runs out before the search
+            reaches end, return None
+        """
         # Raise error if vertex object is passed in as start or end
         if isinstance(start, Vertex) or isinstance(end, Vertex):
             raise TypeError("Expected vertex ids as start and end.")
@@ -448,8 +1827,20 @@ class Graph:
         start_vert = self.vert_list[start]
         end_vert = self.vert_list[end]
 
+        # Use the reachability index, if there is one, to avoid searching
+        index = self._reach_index
+        prune = None
+        if index is not None:
+            # Skip the search when the end can't be reached at all
+            if not index.reachable(start_vert, end_vert):
+                return None
+
+            def prune(vert):
+                return not index.reachable(vert, end_vert)
+
         # Run depth first tree that creates spanning tree of graph
-        self.depth_first_search(start_vert, least_first=True)
+        self.depth_first_search(start_vert, least_first=True, prune=prune,
+                                budget=budget)
 
         # Create a path list and the ending vertex
         path = [end_vert]
@@ -469,8 +1860,13 @@ class Graph:
         path[:] = reversed(path)
         return path
 
-    def find_maximal_clique(self, vertex=None, least_first=True):
-        """Return a maximal clique of a given vertex."""
+    def find_maximal_clique(self, vertex=None, least_first=True, budget=None):
+        """Return a maximal clique of a given vertex.
+
+        budget: optional TraversalBudget, charged for each neighbor checked
+            against the clique; when it runs out, the clique found so far is
+            returned, which may not be maximal
+        """
         # Raise error if non vertex object is passed in as vertex
         if not isinstance(vertex, Vertex) and vertex is not None:
             raise TypeError("vertex parameter must be of type Vertex")
@@ -491,22 +1887,25 @@ class Graph:
         # Initialize clique as a set of vertices
         clique = set([vertex])
 
-        # If order matters, sort the neighbors
+        # If order matters, get the neighbors in sorted order
         if least_first:
-            # Sort the neighbors
-            neighbors = sorted(vertex.get_neighbors())
+            # Use the sorted neighbors kept by the vertex
+            neighbors = vertex.get_sorted_neighbors()
         else:
             # Otherwise, just get the unordered set
             neighbors = vertex.get_neighbors()
 
         # Clique members must be neighor of vertex parameter
         for neighor in neighbors:
+            # Stop when the budget can't pay for checking this neighor
+            if budget is not None and not budget.visit(len(clique)):
+                break
             # Keep track of clique memebers that are adjacent to neighor
             clique_counter = 0
             # Check each clique member if it is adjacent to current neighor
             for clique_member in clique:
                 # If the current neighor is not adjacent to this clique member
-                if neighor not in clique_member.get_neighbors():
+                if neighor not in clique_member.neighbors:
                     # Break out of this loop, and move to next neighor
                     break
                 # If it is, increase the count of adjacent clique members
@@ -523,6 +1922,57 @@ class Graph:
         return clique
 
 
+class ReadOnlyGraph(Graph):
+    """Graph that can be traversed, but not changed.
+
+    Every method that would change the graph raises TypeError. Subclasses
+    fill vert_list with ReadOnlyVertex objects, whose neighbors they provide.
+    """
+
+    def _read_only(self):
+        """Raise TypeError, because the graph can't be changed."""
+        raise TypeError(f"{type(self).__name__} is read-only")
+
+    def add_vertex(self, key):
+        """Raise TypeError, because the graph can't be changed."""
+        self._read_only()
+
+    def add_edge(self, from_key, to_key, weight=1):
+        """Raise TypeError, because the graph can't be changed."""
+        self._read_only()
+
+    def remove_edge(self, from_key, to_key):
+        """Raise TypeError, because the graph can't be changed."""
+        self._read_only()
+
+    def remove_vertex(self, key):
+        """Raise TypeError, because the graph can't be changed."""
+        self._read_only()
+
+    def reorder(self, strategy="bfs", seed=None):
+        """Raise TypeError, because the graph can't be changed."""
+        self._read_only()
+
+    def _record(self, operation, *args):
+        """Raise TypeError, as nothing may change a read-only graph."""
+        self._read_only()
+
+
+class GraphSnapshot(ReadOnlyGraph):
+    """Read-only, consistent view of a Graph, made by Graph.snapshot."""
+
+    def __init__(self, graph):
+        """Initialize a snapshot of the graph's current state."""
+        super().__init__(weighted=graph.weighted, directed=graph.directed)
+        self.generation = graph._generation
+        self.num_vertices = graph.num_vertices
+        self.vert_list = _SnapshotVertices(graph.vert_list, self.generation)
+
+    def snapshot(self):
+        """Return the snapshot itself, as it can't change."""
+        return self
+
+
 # Driver code
 if __name__ == "__main__":
 
@@ -0,0 +1,201 @@
+#!python
+
+"""Replay a query workload against a graph file, and report its latency.
+
+The workload file holds one JSON request per line, in the format served by
+graph_server.py, so sampled production requests can be replayed as they are:
+    {"op": "shortest_path", "start": 1, "end": 5}
+    {"op": "k_hop", "vertex": 1, "n": 2, "only_new": true}
+    {"op": "clique", "vertex": 1, "least_first": true}
+    {"op": "path", "start": 1, "end": 5}
+Blank lines and lines starting with # are skipped.
+"""
+
+import argparse
+import cProfile
+import io
+import json
+import math
+import pstats
+import time
+import tracemalloc
+
+from graph import Graph
+
+
+# Query operations, and the Graph call each one makes
+_OPERATIONS = {
+    "shortest_path": lambda g, r: g.find_shortest_path(r["start"], r["end"]),
+    "k_hop": lambda g, r: g.breadth_first_search(
+        g.get_vertex(r["vertex"]), r["n"], r.get("only_new", True)),
+    "clique": lambda g, r: g.find_maximal_clique(
+        g.get_vertex(r["vertex"]), r.get("least_first", True)),
+    "path": lambda g, r: g.find_path(r["start"], r["end"]),
+}
+
+
+def read_workload(file_name):
+    """Return the list of requests in a workload file."""
+    requests = []
+    with open(file_name, "r") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if line == "" or line.startswith("#"):
+                continue
+            request = json.loads(line)
+            if request.get("op") not in _OPERATIONS:
+                raise ValueError(f"Unknown op {request.get('op')!r} on line "
+                                 f"{line_number} of {file_name}")
+            requests.append(request)
+    return requests
+
+
+def run_workload(graph, requests, repeat=1):
+    """Run every request repeat times, and return the statistics.
+
+    Requests that raise KeyError, TypeError or ValueError (an unknown vertex,
+    a clique query on a directed graph, ...) are timed and counted as errors,
+    like the server would report them.
+    """
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for request in requests:
+            query = _OPERATIONS[request["op"]]
+            before = time.perf_counter()
+            try:
+                query(graph, request)
+            except (KeyError, TypeError, ValueError):
+                errors += 1
+            latencies.append(time.perf_counter() - before)
+    elapsed = time.perf_counter() - started
+    return summarize(latencies, elapsed, errors)
+
+
+def percentile(sorted_values, fraction):
+    """Return the nearest-rank percentile of an already sorted list."""
+    if len(sorted_values) == 0:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, elapsed, errors=0):
+    """Return the throughput and latency percentiles of a run, in seconds."""
+    latencies = sorted(latencies)
+    return {
+        "queries": len(latencies),
+        "errors": errors,
+        "seconds": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed > 0 else None,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "max": latencies[-1] if len(latencies) > 0 else None,
+    }
+
+
+def format_report(stats):
+    """Return the statistics of a run as human readable lines."""
+    lines = [f"queries:    {stats['queries']} ({stats['errors']} errors) in "
+             f"{stats['seconds']:.3f} s"]
+    if stats["throughput"] is not None:
+        lines.append(f"throughput: {stats['throughput']:.1f} queries/s")
+    for name in ("p50", "p95", "p99", "max"):
+        if stats[name] is not None:
+            lines.append(f"{name + ':':<11} {stats[name] * 1000:.3f} ms")
+    return "\n".join(lines)
+
+
+def profile_cpu(graph, requests, repeat=1, top=20, output=None):
+    """Run the workload under cProfile, and return its stats and report.
+
+    output: if given, the raw profile is also dumped there for pstats or
+        snakeviz
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    stats = run_workload(graph, requests, repeat)
+    profiler.disable()
+    if output is not None:
+        profiler.dump_stats(output)
+
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats("cumulative") \
+        .print_stats(top)
+    return stats, text.getvalue()
+
+
+def profile_memory(graph, requests, repeat=1, top=20):
+    """Run the workload under tracemalloc, and return its stats and report.
+
+    The report shows the peak traced memory, and the lines that still hold
+    the most memory once the workload has finished.
+    """
+    tracemalloc.start()
+    try:
+        stats = run_workload(graph, requests, repeat)
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    lines = [f"peak traced memory: {peak / 1024:.1f} KiB"]
+    for statistic in snapshot.statistics("lineno")[:top]:
+        lines.append(str(statistic))
+    return stats, "\n".join(lines)
+
+
+def main(argv=None):
+    """Load a graph and a workload, run it, and print the report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("graph_file", help="graph file in the G/D text format")
+    parser.add_argument("workload_file", help="JSON lines of requests")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="number of times to replay the workload")
+    parser.add_argument("--warmup", type=int, default=0,
+                        help="untimed replays before the measured ones")
+    parser.add_argument("--profile", choices=("cpu", "memory"),
+                        help="run under cProfile or tracemalloc")
+    parser.add_argument("--top", type=int, default=20,
+                        help="number of profile entries to print")
+    parser.add_argument("--profile-output",
+                        help="file to dump the raw cProfile data to")
+    parser.add_argument("--json", action="store_true",
+                        help="print the statistics as JSON")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    graph = Graph()
+    graph.make_graph_from_file(args.graph_file)
+    load_seconds = time.perf_counter() - started
+    requests = read_workload(args.workload_file)
+
+    if args.warmup > 0:
+        run_workload(graph, requests, args.warmup)
+
+    profile = None
+    if args.profile == "cpu":
+        stats, profile = profile_cpu(graph, requests, args.repeat, args.top,
+                                     args.profile_output)
+    elif args.profile == "memory":
+        stats, profile = profile_memory(graph, requests, args.repeat,
+                                        args.top)
+    else:
+        stats = run_workload(graph, requests, args.repeat)
+    stats["load_seconds"] = load_seconds
+
+    if args.json:
+        print(json.dumps(stats))
+    else:
+        print(f"loaded {graph.num_vertices} vertices in {load_seconds:.3f} s")
+        print(format_report(stats))
+    if profile is not None:
+        print()
+        print(profile)
+    return stats
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!python
+
+from graph import Graph
+import graph_bench
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class GraphBenchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        g = Graph(directed=False)
+        for a, b in [(1, 2), (1, 3), (2, 3), (3, 4), (4, 5)]:
+            g.add_edge(a, b)
+        g.add_vertex(6)
+        self.graph = g
+        self.graph_file = os.path.join(self.directory, "graph.txt")
+        g.write_edge_list(self.graph_file)
+
+        self.workload_file = os.path.join(self.directory, "workload.jsonl")
+        with open(self.workload_file, "w") as f:
+            f.write("# sampled requests\n")
+            for request in [{"op": "shortest_path", "start": 1, "end": 5},
+                            {"op": "k_hop", "vertex": 1, "n": 2},
+                            {"op": "clique", "vertex": 1},
+                            {"op": "path", "start": 1, "end": 6},
+                            {"op": "path", "start": 1, "end": 9}]:
+                f.write(json.dumps(request) + "\n\n")
+
+    def test_run_workload(self):
+        requests = graph_bench.read_workload(self.workload_file)
+        assert len(requests) == 5
+        stats = graph_bench.run_workload(self.graph, requests, repeat=3)
+        assert stats["queries"] == 15
+        # The unknown vertex 9 is an error, every time
+        assert stats["errors"] == 3
+        assert stats["p50"] <= stats["p95"] <= stats["p99"] <= stats["max"]
+        assert stats["throughput"] > 0
+
+        with open(self.workload_file, "a") as f:
+            f.write('{"op": "delete"}\n')
+        with self.assertRaises(ValueError):
+            graph_bench.read_workload(self.workload_file)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        assert graph_bench.percentile(values, 0.50) == 50
+        assert graph_bench.percentile(values, 0.95) == 95
+        assert graph_bench.percentile(values, 0.99) == 99
+        assert graph_bench.percentile([7], 0.99) == 7
+        assert graph_bench.percentile([], 0.5) is None
+
+    def test_main(self):
+        for options, expected in [
+                ([], "loaded 6 vertices"),
+                (["--profile", "cpu", "--top", "5"], "function calls"),
+                (["--profile", "memory", "--warmup", "1"],
+                 "peak traced memory")]:
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                stats = graph_bench.main([self.graph_file, self.workload_file]
+                                         + options)
+            assert stats["queries"] == 5
+            self.assertIn("p99:", output.getvalue())
+            self.assertIn(expected, output.getvalue())
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            graph_bench.main([self.graph_file, self.workload_file, "--json"])
+        assert json.loads(output.getvalue())["errors"] == 1
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,21 @@
+#!python
+
+"""Graphs shared by the test modules."""
+
+from graph import Graph
+
+
+def make_graph():
+    """Create the 4 level graph used throughout the tests.
+
+    A reaches C and B at level 1, D and E at level 2, F and H at level 3,
+    and G, I and J at level 4. X has no edges.
+    """
+    g = Graph()
+    for from_key, to_key in [("A", "B"), ("A", "C"), ("B", "A"), ("B", "E"),
+                             ("C", "D"), ("D", "F"), ("E", "H"), ("F", "G"),
+                             ("G", "H"), ("H", "I"), ("H", "J"), ("H", "G"),
+                             ("J", "B")]:
+        g.add_edge(from_key, to_key)
+    g.add_vertex("X")
+    return g
@@ -0,0 +1,180 @@
+#!python
+
+"""Persist a Graph as a snapshot plus an append-only journal of changes.
+
+Every add_vertex, add_edge, remove_edge and remove_vertex call on a journaled
+graph is appended to the journal as one line of JSON before the call returns.
+Reopening the journal loads the last snapshot and replays the journal on top
+of it, and compact() folds the journal into a new snapshot.
+
+Vertex ids and weights must be JSON values (numbers or strings).
+"""
+
+import json
+import os
+
+from graph import Graph
+
+
+# Graph methods that may appear in the journal
+_OPERATIONS = ("add_vertex", "add_edge", "remove_edge", "remove_vertex")
+
+
+class GraphJournal(object):
+    """Write-ahead log of the changes made to one Graph."""
+
+    def __init__(self, directory, sync=True):
+        """Initialize a journal that keeps its files in directory.
+
+        directory: folder holding snapshot.json and journal.log
+        sync: if True, fsync after every record so a record survives a crash
+            of the whole machine, not only of the process
+        """
+        self.directory = directory
+        self.sync = sync
+        self.snapshot_path = os.path.join(directory, "snapshot.json")
+        self.log_path = os.path.join(directory, "journal.log")
+        self.graph = None
+        # Sequence number of the last change, shared by snapshot and journal
+        self.seq = 0
+        self._log = None
+
+    def open(self, weighted=False, directed=True):
+        """Return the graph rebuilt from disk, and start journaling it.
+
+        weighted, directed: graph type used when there is no snapshot yet
+        """
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Start from the last snapshot, or an empty graph
+        if os.path.exists(self.snapshot_path):
+            graph = self._read_snapshot()
+        else:
+            graph = Graph(weighted=weighted, directed=directed)
+            # Save an empty snapshot so the graph type is remembered
+            self.graph = graph
+            self._save_snapshot()
+
+        # Replay the changes made since the snapshot was written
+        good_size = self._replay(graph)
+
+        # Cut off a record that was only partly written before a crash
+        self._log = open(self.log_path, "ab")
+        self._log.truncate(good_size)
+
+        self.graph = graph
+        graph.journal = self
+        return graph
+
+    def record(self, operation, *args):
+        """Append one change to the journal."""
+        self.seq += 1
+        line = json.dumps([self.seq, operation] + list(args))
+        self._log.write(line.encode() + b"\n")
+        self._log.flush()
+        if self.sync:
+            os.fsync(self._log.fileno())
+
+    def compact(self):
+        """Fold the journal into a new snapshot, and empty the journal."""
+        self._save_snapshot()
+
+        # Records up to self.seq are now in the snapshot. If the process dies
+        # before the truncate, replay skips them using their sequence numbers
+        self._log.truncate(0)
+        self._log.flush()
+        if self.sync:
+            os.fsync(self._log.fileno())
+
+    def close(self):
+        """Stop journaling the graph, and close the journal file."""
+        if self.graph is not None:
+            self.graph.journal = None
+            self.graph = None
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def _save_snapshot(self):
+        """Replace the snapshot file with the current state of the graph."""
+        # Write the new snapshot next to the old one, then swap them, so a
+        # crash leaves either the old or the new snapshot in place
+        temp_path = self.snapshot_path + ".tmp"
+        with open(temp_path, "w") as f:
+            self._write_snapshot(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.snapshot_path)
+
+    def _write_snapshot(self, f):
+        """Write the whole graph as JSON lines: a header, then each vertex."""
+        graph = self.graph
+        header = {"weighted": graph.weighted, "directed": graph.directed,
+                  "seq": self.seq}
+        f.write(json.dumps(header) + "\n")
+        for vertex in graph.vert_list.values():
+            neighbors = [[neighbor.id, weight]
+                         for neighbor, weight in vertex.neighbors.items()]
+            f.write(json.dumps([vertex.id, neighbors]) + "\n")
+
+    def _read_snapshot(self):
+        """Return the graph stored in the snapshot file."""
+        with open(self.snapshot_path, "r") as f:
+            header = json.loads(f.readline())
+            graph = Graph(weighted=header["weighted"],
+                          directed=header["directed"])
+            self.seq = header["seq"]
+
+            # Vertices may be listed as neighbors before their own line
+            adjacency = []
+            for line in f:
+                key, neighbors = json.loads(line)
+                graph.add_vertex(key)
+                adjacency.append((key, neighbors))
+
+        # Both directions of undirected edges are stored, so add each
+        # neighbor directly instead of going through add_edge
+        for key, neighbors in adjacency:
+            vertex = graph.vert_list[key]
+            for neighbor_key, weight in neighbors:
+                vertex.add_neighbor(graph.vert_list[neighbor_key], weight)
+        return graph
+
+    def _replay(self, graph):
+        """Apply the journal to the graph, and return the size of the log.
+
+        Records already folded into the snapshot are skipped. A trailing
+        record that was cut off by a crash is ignored, and the returned size
+        excludes it. Raise ValueError if a record before the last one can't
+        be read, since dropping it would also drop every record after it.
+        """
+        if not os.path.exists(self.log_path):
+            return 0
+
+        good_size = 0
+        with open(self.log_path, "rb") as f:
+            for line in f:
+                # A record without its newline was never fully written
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Only the last record can have been torn by a crash
+                    if f.read(1) == b"":
+                        break
+                    raise ValueError(f"Corrupt journal record at byte "
+                                     f"{good_size} of {self.log_path}")
+                seq, operation, args = record[0], record[1], record[2:]
+                if operation not in _OPERATIONS:
+                    raise ValueError(f"Unknown journal operation {operation}")
+                if seq > self.seq:
+                    getattr(graph, operation)(*args)
+                    self.seq = seq
+                good_size += len(line)
+        return good_size
+
+
+def open_graph(directory, weighted=False, directed=True, sync=True):
+    """Return a journaled graph stored in directory, creating it if needed."""
+    return GraphJournal(directory, sync=sync).open(weighted, directed)
@@ -0,0 +1,115 @@
+#!python
+
+from graph_journal import GraphJournal, open_graph
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class GraphJournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_replay(self):
+        # Build a graph while journaling it
+        g = open_graph(self.directory, weighted=True, directed=False)
+        g.add_edge(1, 2, 4)
+        g.add_edge(2, 3, 5)
+        g.add_edge(3, 4, 6)
+        g.add_vertex(9)
+        g.remove_edge(2, 3)
+        g.remove_vertex(4)
+        # Failed changes are not journaled
+        with self.assertRaises(KeyError):
+            g.add_edge(1, 2)
+        edges = g.get_edge_list()
+        g.journal.close()
+
+        # Reopening replays the journal
+        g2 = open_graph(self.directory)
+        self.assertEqual(g2.get_edge_list(), edges)
+        self.assertCountEqual(g2.vert_list, [1, 2, 3, 9])
+        assert g2.num_vertices == 4
+        assert g2.weighted and not g2.directed
+        # Changes after reopening are journaled too
+        g2.add_edge(3, 9, 2)
+        g2.journal.close()
+        g3 = open_graph(self.directory)
+        self.assertEqual(g3.get_edge_list(), {(1, 2, 4), (3, 9, 2)})
+        g3.journal.close()
+
+    def test_compact(self):
+        journal = GraphJournal(self.directory)
+        g = journal.open()
+        g.add_edge("A", "B")
+        g.add_edge("B", "C")
+        g.add_edge("C", "A")
+        journal.compact()
+        assert os.path.getsize(journal.log_path) == 0
+        g.remove_edge("C", "A")
+        g.add_edge("C", "D")
+        journal.close()
+
+        # The snapshot and the journal are combined on restart
+        g2 = open_graph(self.directory)
+        self.assertEqual(g2.get_edge_list(),
+                         {("A", "B"), ("B", "C"), ("C", "D")})
+        assert g2.directed and not g2.weighted
+        g2.journal.close()
+
+    def test_crash_recovery(self):
+        journal = GraphJournal(self.directory, sync=False)
+        g = journal.open()
+        g.add_edge(1, 2)
+        g.add_edge(2, 3)
+        # Simulate a crash between writing the snapshot and emptying the log
+        with open(journal.snapshot_path, "w") as f:
+            journal._write_snapshot(f)
+        g.add_edge(3, 1)
+        journal.close()
+        # Simulate a record cut off half way through being written
+        with open(journal.log_path, "ab") as f:
+            f.write(b'[99, "add_edge", 1')
+
+        # Records in the snapshot are skipped, and the torn record is dropped
+        g2 = open_graph(self.directory)
+        self.assertEqual(g2.get_edge_list(), {(1, 2), (2, 3), (3, 1)})
+        g2.add_edge(1, 3)
+        g2.journal.close()
+        g3 = open_graph(self.directory)
+        self.assertEqual(g3.get_edge_list(),
+                         {(1, 2), (2, 3), (3, 1), (1, 3)})
+        g3.journal.close()
+
+    def test_corrupt_record(self):
+        g = open_graph(self.directory, sync=False)
+        g.add_edge(1, 2)
+        log_path = g.journal.log_path
+        g.journal.close()
+        # A torn last record that still got its newline is dropped
+        with open(log_path, "ab") as f:
+            f.write(b'[2, "add_ed\n')
+        g2 = open_graph(self.directory, sync=False)
+        self.assertEqual(g2.get_edge_list(), {(1, 2)})
+        g2.add_edge(2, 3)
+        g2.journal.close()
+
+        # A bad record followed by good ones is an error, not a crash to
+        # recover from, and the good records are left on disk
+        with open(log_path, "rb") as f:
+            lines = f.readlines()
+        with open(log_path, "wb") as f:
+            f.writelines([lines[0], b"not json\n"] + lines[1:])
+        size = os.path.getsize(log_path)
+        with self.assertRaises(ValueError):
+            open_graph(self.directory, sync=False)
+        self.assertEqual(os.path.getsize(log_path), size)
+
+
+if __name__ == '__main__':
+    unittest.main()
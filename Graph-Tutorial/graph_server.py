@@ -0,0 +1,379 @@
+#!python
+
+"""Serve queries against one in-memory Graph over a local socket.
+
+Every request and response is a single line of JSON. Supported requests:
+    {"op": "shortest_path", "start": 1, "end": 5}
+    {"op": "k_hop", "vertex": 1, "n": 2, "only_new": true}
+    {"op": "clique", "vertex": 1, "least_first": true}
+An optional "id" field is echoed back so clients can pipeline requests.
+"""
+
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import threading
+
+from graph import Graph
+
+
+class _SharedSearch(object):
+    """A BFS from one start vertex, shared by every request waiting on it.
+
+    Each request adds what it needs before waiting: a vertex to reach, or a
+    level to finish. The search stops as soon as every need added so far is
+    met, instead of exploring the start vertex's whole component. Unlike
+    breadth_first_search, it does not write to Vertex.parent, so it is safe
+    to run in a worker thread while other queries read the graph.
+    """
+
+    def __init__(self, start_vert):
+        """Initialize a search that has only found the start vertex."""
+        self.start_vert = start_vert
+        # Map each discovered vertex to the vertex it was discovered from
+        self.parents = {start_vert: None}
+        # levels[n] holds the vertices exactly n edges away from start_vert
+        self.levels = [[start_vert]]
+        # True once every vertex reachable from start_vert has been found
+        self.complete = False
+        self._targets = set()
+        self._depth = 0
+        self._stopped = False
+        # Needs are added from the event loop while the search runs
+        self._lock = threading.Lock()
+
+    def need(self, target=None, depth=0):
+        """Ask the search to find target, and to finish level depth.
+
+        Returns False if the search already stopped without meeting the need.
+        """
+        with self._lock:
+            if self._stopped:
+                return self.has(target, depth)
+            if target is not None:
+                self._targets.add(target)
+            self._depth = max(self._depth, depth)
+            return True
+
+    def has(self, target=None, depth=0):
+        """Return True if the search found target and finished level depth."""
+        if self.complete:
+            return True
+        return (target is None or target in self.parents) and \
+            depth < len(self.levels)
+
+    def run(self):
+        """Search level by level until every need is met, and return self."""
+        while True:
+            with self._lock:
+                if all(self.has(target, self._depth)
+                       for target in self._targets or [None]):
+                    self._stopped = True
+                    return self
+
+            next_level = []
+            for popped_vertex in self.levels[-1]:
+                # Visit neighbors in the same order as breadth_first_search
+                for vert in popped_vertex.get_neighbors():
+                    # Only vertices seen for the first time join the level
+                    if vert not in self.parents:
+                        self.parents[vert] = popped_vertex
+                        next_level.append(vert)
+
+            if len(next_level) == 0:
+                with self._lock:
+                    self.complete = True
+                    self._stopped = True
+                return self
+            self.levels.append(next_level)
+
+
+def _ids(vertices):
+    """Return the ids of the vertices, sorted when the ids are comparable."""
+    ids = [vertex.id for vertex in vertices]
+    try:
+        return sorted(ids)
+    except TypeError:
+        return ids
+
+
+class GraphServer(object):
+    """Answer graph queries for many clients from a single shared Graph."""
+
+    def __init__(self, graph, max_pending=64, workers=1):
+        """Initialize the server around an already loaded graph.
+
+        graph: the Graph every query runs against (treated as read-only)
+        max_pending: number of requests that may be in flight at once, across
+            all clients. Once reached, the server stops reading from sockets
+            until a request finishes, which pushes back on the clients.
+        workers: number of threads running traversals off the event loop
+        """
+        self.graph = graph
+        self.max_pending = max_pending
+        # Number of traversals actually run (coalesced requests share one)
+        self.traversals = 0
+        self._pending = None
+        self._in_flight = {}
+        # Shared BFS searches in flight, by start vertex id
+        self._searches = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._server = None
+
+    async def start(self, host="127.0.0.1", port=0, path=None):
+        """Start listening on a TCP port on localhost, or on a Unix socket."""
+        self._pending = asyncio.Semaphore(self.max_pending)
+        if path is not None:
+            self._server = await asyncio.start_unix_server(
+                self._handle_client, path=path)
+        else:
+            self._server = await asyncio.start_server(
+                self._handle_client, host=host, port=port)
+        return self._server
+
+    @property
+    def address(self):
+        """Return the address the server is listening on."""
+        return self._server.sockets[0].getsockname()
+
+    async def close(self):
+        """Stop accepting clients and shut down the worker threads."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=True)
+
+    async def serve_forever(self):
+        """Serve clients until the task is cancelled."""
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _coalesce(self, key, func, *args):
+        """Run func in the executor, sharing the run with identical requests.
+
+        While a traversal for key is in flight, every other request with the
+        same key waits on that traversal instead of starting its own.
+        """
+        future = self._in_flight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, func, *args)
+            self._in_flight[key] = future
+            self.traversals += 1
+
+            def forget(done, key=key):
+                # Only remove the entry if it still belongs to this run
+                if self._in_flight.get(key) is done:
+                    del self._in_flight[key]
+
+            future.add_done_callback(forget)
+        # Shield the shared run so one cancelled waiter does not cancel it
+        return await asyncio.shield(future)
+
+    async def _search(self, start_vert, target=None, depth=0):
+        """Return a BFS from start_vert that found target and level depth.
+
+        Requests from the same start vertex share one search while it runs.
+        A new search only starts when none is running, or the running one
+        stopped before meeting this request's need.
+        """
+        key = start_vert.id
+        entry = self._searches.get(key)
+        if entry is not None and entry[0].need(target, depth):
+            search, future = entry
+        else:
+            search = _SharedSearch(start_vert)
+            search.need(target, depth)
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._searches[key] = (search, future)
+            self.traversals += 1
+
+            def run():
+                # Start on the next pass of the event loop, so requests that
+                # arrived together add their needs before the search begins
+                done = loop.run_in_executor(self._executor, search.run)
+                done.add_done_callback(finish)
+
+            def finish(done):
+                # Only remove the entry if it still belongs to this search
+                if self._searches.get(key, (None, None))[1] is future:
+                    del self._searches[key]
+                if done.exception() is not None:
+                    future.set_exception(done.exception())
+                else:
+                    future.set_result(done.result())
+
+            loop.call_soon(run)
+        # Shield the shared search so one cancelled waiter does not cancel it
+        return await asyncio.shield(future)
+
+    def _get_vertex(self, key):
+        """Return the vertex with the given key, else raise KeyError."""
+        return self.graph.get_vertex(key)
+
+    async def shortest_path(self, start, end):
+        """Return the ids on the shortest path from start to end, or None.
+
+        Requests from the same start vertex share one BFS, even when they
+        are looking for different end vertices. The BFS stops once every
+        vertex its requests look for is found.
+        """
+        start_vert = self._get_vertex(start)
+        end_vert = self._get_vertex(end)
+        search = await self._search(start_vert, target=end_vert)
+        parents = search.parents
+
+        # Like find_shortest_path, there is no path to the same vertex
+        if end_vert not in parents or start_vert == end_vert:
+            return None
+
+        # Walk the parents back from the end vertex to the start vertex
+        path = [end_vert]
+        while path[-1] != start_vert:
+            path.append(parents[path[-1]])
+        return [vertex.id for vertex in reversed(path)]
+
+    async def k_hop(self, vertex, n, only_new=True):
+        """Return the ids of the vertices n edges away from vertex.
+
+        When only_new is set, the query shares its BFS with every other
+        shortest_path and k_hop request from the same vertex.
+        """
+        vert = self._get_vertex(vertex)
+        if not isinstance(n, int) or n < 0:
+            raise ValueError("n must be a non-negative integer")
+
+        if only_new:
+            levels = (await self._search(vert, depth=n)).levels
+            return _ids(levels[n]) if n < len(levels) else []
+
+        verts = await self._coalesce(("walk", vertex, n),
+                                     self.graph.breadth_first_search,
+                                     vert, n, False)
+        return _ids(verts)
+
+    async def clique(self, vertex, least_first=True):
+        """Return the ids of a maximal clique containing vertex."""
+        vert = self._get_vertex(vertex)
+        clique = await self._coalesce(("clique", vertex, least_first),
+                                      self.graph.find_maximal_clique,
+                                      vert, least_first)
+        return _ids(clique)
+
+    async def handle_request(self, request):
+        """Answer one decoded request, and return the response dictionary."""
+        response = {}
+        if isinstance(request, dict) and "id" in request:
+            response["id"] = request["id"]
+
+        try:
+            if not isinstance(request, dict):
+                raise TypeError("request must be a JSON object")
+            op = request.get("op")
+            if op == "shortest_path":
+                result = await self.shortest_path(request["start"],
+                                                  request["end"])
+            elif op == "k_hop":
+                result = await self.k_hop(request["vertex"], request["n"],
+                                          request.get("only_new", True))
+            elif op == "clique":
+                result = await self.clique(request["vertex"],
+                                           request.get("least_first", True))
+            else:
+                raise ValueError(f"Unknown op {op!r}")
+        except (KeyError, TypeError, ValueError) as error:
+            response["ok"] = False
+            response["error"] = f"{type(error).__name__}: {error}"
+        else:
+            response["ok"] = True
+            response["result"] = result
+        return response
+
+    async def _respond(self, line, writer, lock):
+        """Answer one request line, then release its pending slot."""
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError as error:
+                response = {"ok": False, "error": f"ValueError: {error}"}
+            else:
+                response = await self.handle_request(request)
+
+            # Responses from concurrent requests must not interleave
+            async with lock:
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._pending.release()
+
+    async def _handle_client(self, reader, writer):
+        """Read requests from one client until it disconnects."""
+        lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                # Stop reading while too many requests are in flight
+                await self._pending.acquire()
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # The line is longer than the stream limit. The rest of
+                    # it can't be told apart from the next request, so
+                    # answer with an error and hang up
+                    self._pending.release()
+                    response = {"ok": False,
+                                "error": "ValueError: request line too long"}
+                    async with lock:
+                        writer.write(json.dumps(response).encode() + b"\n")
+                        await writer.drain()
+                    break
+                except BaseException:
+                    # Give the slot back however else the read failed
+                    self._pending.release()
+                    raise
+                if not line:
+                    self._pending.release()
+                    break
+                task = asyncio.create_task(self._respond(line, writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            # Finish answering the client before hanging up
+            if tasks:
+                await asyncio.gather(*tasks)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(file_name, host="127.0.0.1", port=8765, path=None,
+                max_pending=64, workers=1):
+    """Load a graph file once, and serve queries against it forever."""
+    graph = Graph()
+    graph.make_graph_from_file(file_name)
+    server = GraphServer(graph, max_pending=max_pending, workers=workers)
+    await server.start(host=host, port=port, path=path)
+    print(f"Serving {graph.num_vertices} vertices on {server.address}")
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("file_name", help="graph file in the G/D text format")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="serve on this Unix socket instead")
+    parser.add_argument("--max-pending", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    asyncio.run(serve(args.file_name, host=args.host, port=args.port,
+                      path=args.unix, max_pending=args.max_pending,
+                      workers=args.workers))
@@ -0,0 +1,209 @@
+#!python
+
+from graph import Graph
+from graph_fixtures import make_graph
+from graph_server import GraphServer
+import asyncio
+import json
+import unittest
+
+
+class GraphServerTest(unittest.TestCase):
+
+    def test_handle_request(self):
+        g = make_graph()
+
+        async def run():
+            server = GraphServer(g)
+            try:
+                # Shortest paths match find_shortest_path
+                response = await server.handle_request(
+                    {"op": "shortest_path", "start": "A", "end": "I"})
+                expected = [v.id for v in g.find_shortest_path("A", "I")]
+                self.assertEqual(response, {"ok": True, "result": expected})
+                response = await server.handle_request(
+                    {"op": "shortest_path", "start": "G", "end": "X"})
+                self.assertEqual(response["result"], None)
+                response = await server.handle_request(
+                    {"op": "shortest_path", "start": "A", "end": "A"})
+                self.assertEqual(response["result"], None)
+
+                # k_hop matches breadth_first_search, in both modes
+                response = await server.handle_request(
+                    {"op": "k_hop", "vertex": "A", "n": 3, "id": 7})
+                self.assertEqual(response["id"], 7)
+                self.assertEqual(response["result"], ["F", "H"])
+                response = await server.handle_request(
+                    {"op": "k_hop", "vertex": "A", "n": 4, "only_new": False})
+                self.assertEqual(response["result"],
+                                 ["A", "D", "E", "G", "I", "J"])
+                response = await server.handle_request(
+                    {"op": "k_hop", "vertex": "A", "n": 9})
+                self.assertEqual(response["result"], [])
+
+                # Errors are reported rather than raised
+                response = await server.handle_request(
+                    {"op": "shortest_path", "start": "A", "end": "Y"})
+                self.assertFalse(response["ok"])
+                self.assertIn("KeyError", response["error"])
+                response = await server.handle_request({"op": "delete"})
+                self.assertIn("ValueError", response["error"])
+                # Clique requires an undirected graph
+                response = await server.handle_request(
+                    {"op": "clique", "vertex": "A"})
+                self.assertIn("TypeError", response["error"])
+            finally:
+                await server.close()
+
+        asyncio.run(run())
+
+    def test_clique(self):
+        g = Graph(directed=False)
+        g.add_edge("A", "B")
+        g.add_edge("A", "C")
+        g.add_edge("B", "C")
+        g.add_edge("C", "D")
+
+        async def run():
+            server = GraphServer(g)
+            try:
+                response = await server.handle_request(
+                    {"op": "clique", "vertex": "A"})
+                self.assertEqual(response["result"], ["A", "B", "C"])
+            finally:
+                await server.close()
+
+        asyncio.run(run())
+
+    def test_coalescing(self):
+        g = make_graph()
+
+        async def run():
+            server = GraphServer(g)
+            try:
+                # Same-source requests share one BFS
+                requests = [{"op": "shortest_path", "start": "A", "end": end}
+                            for end in "BCDEFGHIJ"]
+                requests.append({"op": "k_hop", "vertex": "A", "n": 2})
+                responses = await asyncio.gather(
+                    *[server.handle_request(r) for r in requests])
+                self.assertEqual(server.traversals, 1)
+                self.assertEqual(responses[-1]["result"], ["D", "E"])
+                self.assertEqual(responses[7]["result"],
+                                 ["A", "B", "E", "H", "I"])
+                # Once finished, a new request runs a new traversal
+                await server.handle_request(requests[0])
+                self.assertEqual(server.traversals, 2)
+            finally:
+                await server.close()
+
+        asyncio.run(run())
+
+    def test_early_exit(self):
+        # A long path, where a full BFS would visit every vertex
+        g = Graph(directed=False)
+        for i in range(999):
+            g.add_edge(i, i + 1)
+
+        async def run():
+            server = GraphServer(g)
+            await server.start()
+            try:
+                # The search stops at the level holding the end vertex
+                search = await server._search(g.get_vertex(0),
+                                              target=g.get_vertex(2))
+                self.assertEqual(len(search.levels), 3)
+                assert not search.complete
+                search = await server._search(g.get_vertex(0), depth=5)
+                self.assertEqual(len(search.levels), 6)
+
+                # Requests that arrive together share one search, which
+                # runs until the farthest of them is met
+                responses = await asyncio.gather(
+                    server.shortest_path(0, 3), server.shortest_path(0, 50),
+                    server.k_hop(0, 20), server.shortest_path(0, 1))
+                self.assertEqual(server.traversals, 3)
+                self.assertEqual(responses[0], [0, 1, 2, 3])
+                self.assertEqual(responses[1], list(range(51)))
+                self.assertEqual(responses[2], [20])
+                self.assertEqual(responses[3], [0, 1])
+
+                # Vertices past the end of the component are still None
+                response = await server.shortest_path(998, 999)
+                self.assertEqual(response, [998, 999])
+                g.add_vertex("X")
+                self.assertEqual(await server.shortest_path(0, "X"), None)
+            finally:
+                await server.close()
+
+        asyncio.run(run())
+
+    def test_tcp(self):
+        g = make_graph()
+
+        async def run():
+            server = GraphServer(g, max_pending=2)
+            await server.start()
+            host, port = server.address[:2]
+            try:
+                reader, writer = await asyncio.open_connection(host, port)
+                # Pipeline more requests than max_pending allows at once
+                for i, end in enumerate("BEIX"):
+                    request = {"op": "shortest_path", "start": "A",
+                               "end": end, "id": i}
+                    writer.write(json.dumps(request).encode() + b"\n")
+                writer.write(b"not json\n")
+                await writer.drain()
+
+                responses = {}
+                for _ in range(5):
+                    response = json.loads(await reader.readline())
+                    responses[response.get("id")] = response
+                self.assertEqual(responses[1]["result"], ["A", "B", "E"])
+                self.assertEqual(responses[3]["result"], None)
+                self.assertFalse(responses[None]["ok"])
+                writer.close()
+                await writer.wait_closed()
+            finally:
+                await server.close()
+
+        asyncio.run(run())
+
+    def test_line_too_long(self):
+        g = make_graph()
+
+        async def run():
+            server = GraphServer(g, max_pending=1)
+            await server.start()
+            host, port = server.address[:2]
+            try:
+                # More oversized lines than max_pending, each on its own client
+                for _ in range(3):
+                    reader, writer = await asyncio.open_connection(host, port)
+                    writer.write(b"x" * (100 * 1024) + b"\n")
+                    await writer.drain()
+                    response = json.loads(await reader.readline())
+                    self.assertFalse(response["ok"])
+                    assert "too long" in response["error"]
+                    # The server hangs up
+                    self.assertEqual(await reader.readline(), b"")
+                    writer.close()
+                    await writer.wait_closed()
+
+                # Every slot was given back, so other clients are answered
+                reader, writer = await asyncio.open_connection(host, port)
+                request = {"op": "shortest_path", "start": "A", "end": "B"}
+                writer.write(json.dumps(request).encode() + b"\n")
+                await writer.drain()
+                response = await asyncio.wait_for(reader.readline(), 5)
+                self.assertEqual(json.loads(response)["result"], ["A", "B"])
+                writer.close()
+                await writer.wait_closed()
+            finally:
+                await server.close()
+
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,17 @@
 #!python
 
-from graph import Graph, Vertex
+from graph import Graph, ReadOnlyVertex, TraversalBudget, Vertex
+from graph_fixtures import make_graph
+import csv
+import gc
+import gzip
+import os
+import random
+import shutil
+import tempfile
+import threading
 import unittest
+from xml.etree import ElementTree
 # Python 2 and 3 compatibility: unittest module renamed this assertion method
 if not hasattr(unittest.TestCase, 'assertCountEqual'):
     unittest.TestCase.assertCountEqual = unittest.TestCase.assertItemsEqual
@@ -52,6 +62,23 @@ class VertexTest(unittest.TestCase):
         v3.add_neighbor(v2, 3)
         self.assertCountEqual(v3.get_neighbors(), [v1, v2])
 
+    def test_get_sorted_neighbors(self):
+        v1 = Vertex(1)
+        v2 = Vertex(2)
+        v3 = Vertex(3)
+        v4 = Vertex(4)
+        v1.add_neighbor(v3)
+        v1.add_neighbor(v2)
+        self.assertEqual(v1.get_sorted_neighbors(), [v2, v3])
+        # The sorted neighbors are kept in order as neighbors change
+        v1.add_neighbor(v4)
+        self.assertEqual(v1.get_sorted_neighbors(), [v2, v3, v4])
+        v1.remove_neighbor(v3)
+        self.assertEqual(v1.get_sorted_neighbors(), [v2, v4])
+        v1.add_neighbor(v3, 5)
+        self.assertEqual(v1.get_sorted_neighbors(), [v2, v3, v4])
+        self.assertEqual(v3.get_sorted_neighbors(), [])
+
     def test_get_id(self):
         # Test alphabetical ids
         v_a = Vertex("A")
@@ -216,6 +243,49 @@ class GraphTest(unittest.TestCase):
         g.add_edge('G', 'H', 5)
         assert v_g.get_edge_weight(v_h) == 5
 
+    def test_remove_edge(self):
+        g = Graph()
+        v_a = g.add_vertex('A')
+        v_b = g.add_vertex('B')
+        g.add_edge('A', 'B')
+        g.add_edge('B', 'A')
+
+        # Removing a directed edge leaves the edge back in place
+        g.remove_edge('A', 'B')
+        self.assertCountEqual(v_a.get_neighbors(), [])
+        self.assertCountEqual(v_b.get_neighbors(), [v_a])
+        # Error should be raised when the edge or vertex does not exist
+        with self.assertRaises(KeyError):
+            g.remove_edge('A', 'B')
+        with self.assertRaises(KeyError):
+            g.remove_edge('A', 'C')
+
+        # Removing an undirected edge removes both directions
+        g = Graph(directed=False)
+        g.add_edge(1, 2)
+        g.remove_edge(2, 1)
+        self.assertEqual(g.get_edge_list(), set())
+
+    def test_remove_vertex(self):
+        g = Graph()
+        g.add_edge('A', 'B')
+        g.add_edge('B', 'C')
+        g.add_edge('C', 'A')
+        g.remove_vertex('A')
+        assert g.num_vertices == 2
+        self.assertEqual(g.get_edge_list(), {('B', 'C')})
+        with self.assertRaises(KeyError):
+            g.get_vertex('A')
+        with self.assertRaises(KeyError):
+            g.remove_vertex('A')
+
+        g = Graph(directed=False)
+        g.add_edge(1, 2)
+        g.add_edge(2, 3)
+        g.remove_vertex(2)
+        self.assertEqual(g.get_edge_list(), set())
+        assert g.num_vertices == 2
+
     def test_get_vertices(self):
         # Test getting alphabetical vertices
         g_letters = Graph()
@@ -231,6 +301,134 @@ class GraphTest(unittest.TestCase):
         v3 = g_numbers.add_vertex(3)
         self.assertCountEqual(g_numbers.get_vertices(), [v1, v2, v3])
 
+    def test_has_edges(self):
+        g = Graph(weighted=True, directed=True)
+        g.add_edge("A", "B", 3)
+        g.add_edge("B", "C", 4)
+        pairs = [("A", "B"), ("B", "A"), ("B", "C"), ("A", "Z"), ("Z", "A")]
+        self.assertEqual(g.has_edges(pairs),
+                         [True, False, True, False, False])
+        self.assertEqual(g.edge_weights(pairs), [3, None, 4, None, None])
+        self.assertEqual(g.has_edges([]), [])
+
+    def test_mutual_friends(self):
+        g = Graph(directed=False)
+        for a, b in [("A", "B"), ("A", "C"), ("A", "D"), ("B", "C"),
+                     ("B", "D"), ("C", "E")]:
+            g.add_edge(a, b)
+        pairs = [("A", "B"), ("B", "A"), ("A", "E"), ("D", "E"), ("A", "Z")]
+        mutuals = g.mutual_friends(pairs)
+        self.assertCountEqual(mutuals[0], ["C", "D"])
+        self.assertCountEqual(mutuals[1], ["C", "D"])
+        self.assertEqual(mutuals[2:], [["C"], [], []])
+        self.assertEqual(g.mutual_friends(pairs, counts=True),
+                         [2, 2, 1, 0, 0])
+
+        # Directed graphs share the vertices both have edges to
+        d = Graph(directed=True)
+        d.add_edge("A", "C")
+        d.add_edge("B", "C")
+        d.add_edge("C", "A")
+        self.assertEqual(d.mutual_friends([("A", "B"), ("C", "B")]),
+                         [["C"], []])
+
+    def test_write_edge_list(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        # Weighted undirected and unweighted directed graphs round-trip,
+        # with and without gzip
+        weighted = Graph(weighted=True, directed=False)
+        weighted.add_edge(1, 2, 5)
+        weighted.add_edge(2, 3, 2.5)
+        weighted.add_edge(3, 1, 1)
+        weighted.add_vertex(4)
+        directed = Graph(weighted=False, directed=True)
+        for a, b in [(1, 2), (2, 1), (2, 3), (3, 4)]:
+            directed.add_edge(a, b)
+        for g in (weighted, directed):
+            for name in ("graph.txt", "graph.txt.gz"):
+                path = os.path.join(directory, name)
+                g.write_edge_list(path, chunk_size=2)
+                copy = Graph()
+                copy.make_graph_from_file(path)
+                assert copy.weighted == g.weighted
+                assert copy.directed == g.directed
+                self.assertEqual(list(copy.vert_list), list(g.vert_list))
+                self.assertCountEqual(copy.get_edge_list(), g.get_edge_list())
+
+        # Undirected edges are written once
+        path = os.path.join(directory, "graph.txt")
+        weighted.write_edge_list(path)
+        with open(path) as f:
+            self.assertEqual(f.read(),
+                             "G\n1,2,3,4\n(1,2,5)\n(1,3,1)\n(2,3,2.5)\n")
+        # gzip can be chosen regardless of the name
+        weighted.write_edge_list(path, compress=True)
+        with gzip.open(path, "rt") as f:
+            assert f.readline() == "G\n"
+
+        # A graph without edges round-trips too
+        empty = Graph()
+        empty.add_vertex(7)
+        empty.write_edge_list(path)
+        copy = Graph()
+        copy.make_graph_from_file(path)
+        self.assertEqual(list(copy.vert_list), [7])
+
+        # Ids the reader can't parse are refused before the file is written,
+        # rather than written to a file that won't read back
+        path = os.path.join(directory, "strings.txt")
+        strings = Graph(directed=False)
+        strings.add_edge("Myself", "Friend 1")
+        strings.add_vertex(3)
+        with self.assertRaises(ValueError):
+            strings.write_edge_list(path)
+        assert not os.path.exists(path)
+        negative = Graph()
+        negative.add_edge(1, 2)
+        negative.add_vertex(-1)
+        with self.assertRaises(ValueError):
+            negative.write_edge_list(path)
+        assert not os.path.exists(path)
+        # The same string ids round-trip through CSV instead
+        strings.write_csv(path)
+        with open(path, newline="") as f:
+            self.assertEqual(list(csv.reader(f)),
+                             [["from", "to"], ["Myself", "Friend 1"]])
+
+    def test_write_csv(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        g = Graph(weighted=True, directed=True)
+        g.add_edge("A", "B", 3)
+        g.add_edge("B", "A", 4)
+        path = os.path.join(directory, "edges.csv.gz")
+        g.write_csv(path)
+        with gzip.open(path, "rt", newline="") as f:
+            self.assertEqual(list(csv.reader(f)),
+                             [["from", "to", "weight"], ["A", "B", "3"],
+                              ["B", "A", "4"]])
+
+    def test_write_graphml(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        g = Graph(weighted=True, directed=False)
+        g.add_edge("A", "B&C", 3)
+        g.add_vertex("D")
+        path = os.path.join(directory, "graph.graphml")
+        g.write_graphml(path, chunk_size=1)
+
+        ns = "{http://graphml.graphdrawing.org/xmlns}"
+        graph = ElementTree.parse(path).getroot().find(ns + "graph")
+        assert graph.get("edgedefault") == "undirected"
+        self.assertEqual([node.get("id") for node in graph.iter(ns + "node")],
+                         ["A", "B&C", "D"])
+        edges = [(edge.get("source"), edge.get("target"),
+                  edge.find(ns + "data").text)
+                 for edge in graph.iter(ns + "edge")]
+        self.assertEqual(edges, [("A", "B&C", "3")])
+
     def test_breadth_first_search(self):
         # Create graph with 4 levels
         g = Graph()
@@ -318,6 +516,27 @@ class GraphTest(unittest.TestCase):
         g_new_level_8 = g.breadth_first_search(v_g, 8)
         self.assertCountEqual(g_new_level_8, [])
 
+        # Count the walks that reach each vertex
+        walks_4 = g.breadth_first_search(v_a, 4, only_new=False, counts=True)
+        self.assertDictEqual(walks_4, {v_a: 1, v_d: 1, v_e: 1, v_g: 2,
+                                       v_i: 1, v_j: 1})
+        self.assertDictEqual(g.breadth_first_search(v_a, 3, counts=True),
+                             {v_f: 1, v_h: 1})
+        self.assertDictEqual(g.breadth_first_search(v_g, 8, counts=True), {})
+        # Long walks don't need a queue entry per walk
+        walks_200 = g.breadth_first_search(v_a, 200, only_new=False,
+                                           counts=True)
+        assert sum(walks_200.values()) > 10 ** 30
+        self.assertCountEqual(walks_200,
+                              g.breadth_first_search(v_a, 200, False))
+        # With only_new, the counts are the number of shortest paths
+        square = Graph(directed=False)
+        for a, b in [(1, 2), (1, 3), (2, 4), (3, 4)]:
+            square.add_edge(a, b)
+        self.assertDictEqual(
+            square.breadth_first_search(square.get_vertex(1), 2, counts=True),
+            {square.get_vertex(4): 2})
+
         # Error should be raised if passing key rather than vertex object
         with self.assertRaises(TypeError):
             g.breadth_first_search("A", 1, only_new=False)
@@ -331,6 +550,65 @@ class GraphTest(unittest.TestCase):
         with self.assertRaises(ValueError):
             g.breadth_first_search(v_z, 1)
 
+    def test_ego_graph(self):
+        # Create graph with 4 levels
+        g = Graph()
+        v_a = g.add_vertex('A')
+        v_g = g.add_vertex('G')
+        g.add_edge("A", "B")
+        g.add_edge("A", "C")
+        g.add_edge("B", "A")
+        g.add_edge("B", "E")
+        g.add_edge("C", "D")
+        g.add_edge("D", "F")
+        g.add_edge("E", "H")
+        g.add_edge("F", "G")
+        g.add_edge("G", "H")
+        g.add_edge("H", "I")
+        g.add_edge("H", "J")
+        g.add_edge("H", "G")
+        g.add_edge("J", "B")
+        g.add_edge("E", "D")
+
+        # Every vertex within 2 edges, with the edges between them
+        ego = g.ego_graph(v_a, 2)
+        self.assertCountEqual(ego.vert_list, ['A', 'B', 'C', 'D', 'E'])
+        assert ego.num_vertices == 5
+        self.assertEqual(ego.get_edge_list(), {("A", "B"), ("A", "C"),
+                                               ("B", "A"), ("B", "E"),
+                                               ("C", "D"), ("E", "D")})
+        # Without induced edges, edges out of the last level are left out
+        ego = g.ego_graph(v_a, 2, induced=False)
+        self.assertEqual(ego.get_edge_list(), {("A", "B"), ("A", "C"),
+                                               ("B", "A"), ("B", "E"),
+                                               ("C", "D")})
+        # The ego graph is a copy, and traversals work on it
+        assert ego.get_vertex('A') is not v_a
+        self.assertEqual([v.id for v in ego.find_shortest_path('A', 'D')],
+                         ['A', 'C', 'D'])
+        # A ball of radius 0 is the vertex alone
+        self.assertCountEqual(g.ego_graph(v_g, 0).vert_list, ['G'])
+        self.assertCountEqual(g.ego_graph(v_g, 2).vert_list,
+                              ['G', 'H', 'I', 'J'])
+
+        # Undirected graphs keep both directions of each edge
+        u = Graph(weighted=True, directed=False)
+        u.add_edge(1, 2, 5)
+        u.add_edge(2, 3, 6)
+        u.add_edge(1, 3, 7)
+        u.add_edge(3, 4, 8)
+        ego = u.ego_graph(u.get_vertex(1), 1)
+        self.assertEqual(len(ego.get_edge_list()), 3)
+        assert ego.get_vertex(2).get_edge_weight(ego.get_vertex(3)) == 6
+        ego = u.ego_graph(u.get_vertex(1), 1, induced=False)
+        self.assertCountEqual(ego.get_edge_list(), [(1, 2, 5), (1, 3, 7)])
+
+        # Error should be raised for keys and vertices not in the graph
+        with self.assertRaises(TypeError):
+            g.ego_graph('A', 1)
+        with self.assertRaises(ValueError):
+            g.ego_graph(Vertex('Z'), 1)
+
     def test_find_shortest_path(self):
         # Create graph with 4 levels
         g = Graph()
@@ -397,6 +675,110 @@ class GraphTest(unittest.TestCase):
         with self.assertRaises(KeyError):
             g.find_shortest_path("T", "A")
 
+    def test_k_shortest_paths(self):
+        # Create graph from the classic example of Yen's algorithm
+        g = Graph(weighted=True)
+        g.add_edge("C", "D", 3)
+        g.add_edge("C", "E", 2)
+        g.add_edge("D", "F", 4)
+        g.add_edge("E", "D", 1)
+        g.add_edge("E", "F", 2)
+        g.add_edge("E", "G", 3)
+        g.add_edge("F", "G", 2)
+        g.add_edge("F", "H", 1)
+        g.add_edge("G", "H", 2)
+        g.add_vertex("X")
+
+        def ids(paths):
+            return ["".join(v.id for v in path) for path in paths]
+
+        # Paths come out cheapest first
+        paths = ids(g.k_shortest_paths("C", "H", 3))
+        self.assertEqual(paths, ["CEFH", "CEGH", "CDFH"])
+        # Without k, every simple path is generated
+        paths = ids(g.k_shortest_paths("C", "H"))
+        self.assertEqual(paths[:2], ["CEFH", "CEGH"])
+        self.assertCountEqual(paths, ["CEFH", "CEGH", "CDFH", "CEDFH",
+                                      "CDFGH", "CEFGH", "CEDFGH"])
+        # The generator is lazy
+        generator = g.k_shortest_paths("C", "H", 100)
+        self.assertEqual(ids([next(generator)]), ["CEFH"])
+        # Unreachable vertices, and the vertex itself, have no paths
+        self.assertEqual(list(g.k_shortest_paths("C", "X", 5)), [])
+        self.assertEqual(list(g.k_shortest_paths("H", "C", 5)), [])
+        self.assertEqual(list(g.k_shortest_paths("C", "C", 5)), [])
+        # Asking for no paths gives none, and k can't be negative
+        self.assertEqual(list(g.k_shortest_paths("C", "H", 0)), [])
+        with self.assertRaises(ValueError):
+            next(g.k_shortest_paths("C", "H", -1))
+
+        # Unweighted graphs count edges
+        u = Graph(directed=False)
+        u.add_edge(1, 2)
+        u.add_edge(2, 4)
+        u.add_edge(1, 3)
+        u.add_edge(3, 5)
+        u.add_edge(5, 4)
+        u.add_edge(1, 4)
+        paths = [[v.id for v in path] for path in u.k_shortest_paths(1, 4, 5)]
+        self.assertEqual(paths, [[1, 4], [1, 2, 4], [1, 3, 5, 4]])
+
+        # Error should be raised when vertex not in graph
+        with self.assertRaises(KeyError):
+            next(g.k_shortest_paths("C", "Y", 2))
+        with self.assertRaises(KeyError):
+            next(g.k_shortest_paths("Y", "C", 2))
+
+    def test_minimum_spanning_forest(self):
+        g = Graph(weighted=True, directed=False)
+        g.add_edge("A", "B", 7)
+        g.add_edge("A", "D", 5)
+        g.add_edge("B", "C", 8)
+        g.add_edge("B", "D", 9)
+        g.add_edge("B", "E", 7)
+        g.add_edge("C", "E", 5)
+        g.add_edge("D", "E", 15)
+        g.add_edge("D", "F", 6)
+        g.add_edge("E", "F", 8)
+        g.add_edge("E", "G", 9)
+        g.add_edge("F", "G", 11)
+        # A second component
+        g.add_edge("X", "Y", 2)
+        g.add_edge("Y", "Z", 1)
+        g.add_edge("X", "Z", 3)
+        g.add_vertex("W")
+
+        for algorithm in ("kruskal", "prim"):
+            forest = g.minimum_spanning_forest(algorithm)
+            assert len(forest) == 8
+            assert sum(weight for _, _, weight in forest) == 39 + 3
+            # Each edge is listed once, in either direction
+            edges = set(frozenset(edge[:2]) for edge in forest)
+            assert frozenset(("A", "D")) in edges
+            assert frozenset(("X", "Z")) not in edges
+
+            # The forest can be returned as a graph with every vertex
+            tree = g.minimum_spanning_forest(algorithm, as_graph=True)
+            assert tree.num_vertices == g.num_vertices
+            assert not tree.directed and tree.weighted
+            self.assertEqual(len(tree.get_edge_list()), 8)
+            assert tree.find_path("A", "G") is not None
+            assert tree.find_path("A", "X") is None
+
+        # Unweighted graphs give unweighted edges
+        u = Graph(directed=False)
+        u.add_edge(1, 2)
+        u.add_edge(2, 3)
+        u.add_edge(3, 1)
+        self.assertEqual(len(u.minimum_spanning_forest()), 2)
+        assert all(len(edge) == 2 for edge in u.minimum_spanning_forest())
+
+        # Error should be raised on directed graphs and unknown algorithms
+        with self.assertRaises(TypeError):
+            Graph(directed=True).minimum_spanning_forest()
+        with self.assertRaises(ValueError):
+            g.minimum_spanning_forest("boruvka")
+
     def test_depth_first_search(self):
         # Create graph
         g = Graph()
@@ -551,6 +933,242 @@ class GraphTest(unittest.TestCase):
         with self.assertRaises(KeyError):
             g.find_path("Z", "A")
 
+    def test_reachable(self):
+        # Create graph with a cycle (B, E, H, J) and a dead end (I)
+        g = Graph()
+        g.add_edge("A", "B")
+        g.add_edge("A", "C")
+        g.add_edge("B", "E")
+        g.add_edge("C", "D")
+        g.add_edge("D", "F")
+        g.add_edge("E", "H")
+        g.add_edge("F", "G")
+        g.add_edge("G", "H")
+        g.add_edge("H", "I")
+        g.add_edge("H", "J")
+        g.add_edge("J", "B")
+        g.add_vertex("X")
+
+        # Answers match find_path for every pair of vertices
+        g.build_reachability_index(num_labels=3, seed=1)
+        for start in g.vert_list:
+            for end in g.vert_list:
+                expected = g.find_path(start, end) is not None
+                self.assertEqual(g.reachable(start, end), expected)
+        assert g.reachable("J", "E")
+        assert not g.reachable("I", "H")
+        assert not g.reachable("B", "A")
+
+        # The index still finds the same paths as a full search
+        path = [v.id for v in g.find_path("A", "I")]
+        self.assertEqual(path, ["A", "B", "E", "H", "I"])
+        # Unreachable ends return before searching at all
+        g.get_vertex("C").parent = "untouched"
+        assert g.find_path("I", "C") is None
+        assert g.get_vertex("C").parent == "untouched"
+
+        # Changing the graph drops the index, and reachable rebuilds it
+        g.add_edge("I", "A")
+        assert g._reach_index is None
+        assert g.reachable("I", "C")
+        g.remove_edge("I", "A")
+        assert not g.reachable("I", "C")
+
+        # Error should be raised when vertex not in graph
+        with self.assertRaises(KeyError):
+            g.reachable("A", "Y")
+        with self.assertRaises(KeyError):
+            g.reachable("Y", "A")
+
+    def test_snapshot(self):
+        g = Graph()
+        g.add_edge("A", "B")
+        g.add_edge("B", "C")
+        g.add_edge("C", "D")
+        g.add_edge("D", "B")
+        edges = g.get_edge_list()
+        snap = g.snapshot()
+
+        # Changes after the snapshot are not seen by the snapshot
+        g.add_edge("A", "C")
+        g.add_edge("D", "E")
+        g.remove_edge("C", "D")
+        g.remove_vertex("B")
+        assert g.num_vertices == 4
+        assert snap.num_vertices == 4
+        self.assertEqual(snap.get_edge_list(), edges)
+        self.assertCountEqual(snap.vert_list, ["A", "B", "C", "D"])
+        self.assertEqual(g.get_edge_list(), {("A", "C"), ("D", "E")})
+
+        # Traversals run on the snapshot, without touching the live graph
+        path = snap.find_shortest_path("A", "D")
+        self.assertEqual([v.id for v in path], ["A", "B", "C", "D"])
+        self.assertEqual([v.id for v in snap.find_path("A", "D")],
+                         ["A", "B", "C", "D"])
+        assert g.get_vertex("D").parent is None
+        assert snap.get_vertex("A") is not g.get_vertex("A")
+
+        # A second snapshot sees the changes, the first one still does not
+        snap_2 = g.snapshot()
+        g.add_edge("E", "A")
+        self.assertEqual(snap_2.get_edge_list(), {("A", "C"), ("D", "E")})
+        self.assertEqual(snap.get_edge_list(), edges)
+
+        # Snapshots can't be changed
+        with self.assertRaises(TypeError):
+            snap.add_edge("A", "D")
+        with self.assertRaises(TypeError):
+            snap.get_vertex("A").add_neighbor(snap.get_vertex("D"))
+        with self.assertRaises(KeyError):
+            snap.get_vertex("E")
+        with self.assertRaises(TypeError):
+            snap.reorder()
+
+        # Reordering the live graph leaves snapshots as they were
+        order = list(snap_2.vert_list)
+        neighbors = list(snap_2.get_vertex("A").neighbors)
+        g.add_edge("A", "E")
+        g.reorder("degree")
+        self.assertEqual(list(snap_2.vert_list), order)
+        self.assertEqual(list(snap_2.get_vertex("A").neighbors), neighbors)
+        self.assertEqual(list(g.vert_list)[0], "A")
+
+        # Without live snapshots, vertices are changed in place again
+        del snap, snap_2
+        gc.collect()
+        neighbors = g.get_vertex("A").neighbors
+        g.add_edge("A", "D")
+        assert g.get_vertex("A").neighbors is neighbors
+
+    def test_read_only(self):
+        g = make_graph()
+        snap = g.snapshot()
+        vertex = snap.get_vertex("A")
+        # Read-only vertices have every attribute a Vertex has
+        for name in vars(Vertex("A")):
+            if name != "neighbors":
+                assert hasattr(vertex, name), name
+        # Every change is refused
+        for change in (lambda: snap.add_vertex("Y"),
+                       lambda: snap.add_edge("A", "X"),
+                       lambda: snap.remove_edge("A", "B"),
+                       lambda: snap.remove_vertex("A"),
+                       lambda: snap.reorder(),
+                       lambda: vertex.add_neighbor(snap.get_vertex("X")),
+                       lambda: vertex.remove_neighbor(snap.get_vertex("B"))):
+            with self.assertRaises(TypeError):
+                change()
+        self.assertEqual(snap.get_edge_list(), g.get_edge_list())
+        # Subclasses have to say where the neighbors come from
+        with self.assertRaises(TypeError):
+            ReadOnlyVertex("A")
+
+    def test_snapshot_after_newer_snapshot_dropped(self):
+        g = Graph()
+        g.add_edge("A", "B")
+        g.add_vertex("C")
+        g.add_vertex("D")
+        snap = g.snapshot()
+        g.add_edge("A", "C")
+        newer = g.snapshot()
+        # Dropping the newer snapshot must not drop what the older one reads
+        del newer
+        gc.collect()
+        g.add_edge("A", "D")
+        self.assertEqual([v.id for v in snap.get_vertex("A").neighbors],
+                         ["B"])
+        self.assertEqual(snap.get_edge_list(), {("A", "B")})
+        self.assertCountEqual([v.id for v in g.get_vertex("A").neighbors],
+                              ["B", "C", "D"])
+
+    def test_snapshot_concurrent_writes(self):
+        g = Graph(directed=False)
+        for i in range(200):
+            g.add_edge(i, i + 1)
+        snap = g.snapshot()
+        start = snap.get_vertex(0)
+        errors = []
+
+        def sweep():
+            # Every sweep of the snapshot sees the same path graph
+            try:
+                for _ in range(20):
+                    for n in (5, 50, 150):
+                        assert snap.breadth_first_search(start, n) == \
+                            {snap.get_vertex(n)}
+            except Exception as error:
+                errors.append(error)
+
+        reader = threading.Thread(target=sweep)
+        reader.start()
+        # Keep writing to the live graph while the reader runs
+        for i in range(200):
+            g.add_edge(i, i + 2)
+            g.add_edge(i, 1000 + i)
+        reader.join()
+        self.assertEqual(errors, [])
+        assert len(snap.get_edge_list()) == 200
+        assert len(g.get_edge_list()) == 600
+
+    def test_traversal_budget(self):
+        # A path of 10 vertices
+        g = Graph(directed=False)
+        for i in range(9):
+            g.add_edge(i, i + 1)
+        v0 = g.get_vertex(0)
+
+        # Budgets that are big enough change nothing
+        budget = TraversalBudget(timeout=60, max_vertices=100, max_edges=100)
+        self.assertEqual([v.id for v in g.find_shortest_path(0, 9, budget)],
+                         list(range(10)))
+        assert not budget.truncated
+        assert budget.vertices == 9 and budget.edges == 17
+
+        # Breadth first search stops partway
+        budget = TraversalBudget(max_vertices=3)
+        self.assertEqual(g.breadth_first_search(v0, 5, budget=budget), set())
+        assert budget.truncated and budget.vertices == 3
+        # Level 6 is cut off after expanding vertices 1 and 3, but not 5
+        budget = TraversalBudget(max_edges=20)
+        self.assertCountEqual(
+            g.breadth_first_search(v0, 6, only_new=False, budget=budget),
+            [v0, g.get_vertex(2), g.get_vertex(4)])
+        assert budget.truncated
+
+        # Paths that can't be found within the budget are None
+        budget = TraversalBudget(max_vertices=5)
+        assert g.find_shortest_path(0, 9, budget) is None
+        assert budget.truncated
+        budget = TraversalBudget(max_vertices=5)
+        assert g.find_path(0, 9, budget) is None
+        assert budget.truncated
+        # Ends reached before the budget ran out are still found
+        budget = TraversalBudget(max_vertices=5)
+        self.assertEqual([v.id for v in g.find_path(0, 4, budget)],
+                         [0, 1, 2, 3, 4])
+
+        # Timeouts and cancellation
+        budget = TraversalBudget(timeout=-1)
+        assert g.find_shortest_path(0, 9, budget) is None
+        assert budget.truncated
+        budget = TraversalBudget()
+        budget.cancel()
+        assert g.find_path(0, 9, budget) is None
+        assert budget.truncated and budget.vertices == 0
+
+        # Cliques stop growing when the budget runs out
+        k = Graph(directed=False)
+        for a in "ABCD":
+            for b in "ABCD":
+                if a < b:
+                    k.add_edge(a, b)
+        budget = TraversalBudget(max_edges=3)
+        self.assertEqual(
+            sorted(v.id for v in k.find_maximal_clique(k.get_vertex("A"),
+                                                       budget=budget)),
+            ["A", "B", "C"])
+        assert budget.truncated
+
     def test_find_maximal_clique(self):
         # Create graph unweighted, undirected graph
         g = Graph(weighted=False, directed=False)
@@ -689,6 +1307,62 @@ class GraphTest(unittest.TestCase):
         with self.assertRaises(ValueError):
             g.find_maximal_clique(v_z, least_first=False)
 
+    def test_track_distances(self):
+        g = make_graph()
+        hot = g.track_distances("A")
+        assert g.track_distances("A") is hot
+        self.assertEqual(hot.distances, {"A": 0, "B": 1, "C": 1, "D": 2,
+                                         "E": 2, "F": 3, "H": 3, "G": 4,
+                                         "I": 4, "J": 4})
+        assert hot.distance("X") is None
+        self.assertEqual(hot.path_to("I"), ["A", "B", "E", "H", "I"])
+
+        # A shortcut only repairs the vertices it brings closer
+        g.add_edge("C", "G")
+        self.assertEqual(hot.distance("G"), 2)
+        self.assertEqual(hot.path_to("G"), ["A", "C", "G"])
+        self.assertEqual(hot.repaired, 1)
+        g.add_edge("A", "X")
+        self.assertEqual(hot.distance("X"), 1)
+        # Removing an edge off the shortest path tree changes nothing
+        g.remove_edge("H", "G")
+        self.assertEqual(hot.distance("G"), 2)
+        g.remove_edge("C", "G")
+        self.assertEqual(hot.distance("G"), 4)
+        g.remove_vertex("E")
+        self.assertEqual(hot.distance("H"), 5)
+        with self.assertRaises(KeyError):
+            g.track_distances("E")
+        g.untrack_distances("A")
+        g.add_edge("A", "J")
+        self.assertEqual(hot.distance("J"), 6)
+
+        # Random insertions match distances computed from scratch
+        rng = random.Random(0)
+        for weighted in (False, True):
+            for directed in (False, True):
+                g = Graph(weighted=weighted, directed=directed)
+                for key in range(40):
+                    g.add_vertex(key)
+                trackers = [g.track_distances(key) for key in (0, 1, 2)]
+                for _ in range(150):
+                    a, b = rng.randrange(40), rng.randrange(40)
+                    if a == b or g.get_vertex(b) in g.get_vertex(a).neighbors:
+                        continue
+                    g.add_edge(a, b, rng.randint(1, 9) if weighted else 1)
+                    for tracker in trackers:
+                        self.assertEqual(
+                            tracker.distances,
+                            type(tracker)(g, tracker.source).distances)
+                if not weighted:
+                    # Unweighted distances are breadth first search levels
+                    for n in range(1, 4):
+                        self.assertEqual(
+                            {key for key, d in trackers[0].distances.items()
+                             if d == n},
+                            {v.id for v in g.breadth_first_search(
+                                g.get_vertex(0), n)})
+
 
 if __name__ == '__main__':
     unittest.main()
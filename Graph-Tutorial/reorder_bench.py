@@ -0,0 +1,108 @@
+#!python
+
+"""Time breadth first searches on a CompactGraph under each vertex order.
+
+Builds a grid-like graph whose vertices were added in a random order (or
+loads a graph file), renumbers it with every CompactGraph.vertex_order
+strategy, and reports the average index gap between neighbors and the time
+taken by full breadth first searches from the same sources.
+"""
+
+import argparse
+import random
+import time
+
+from graph import Graph
+
+
+STRATEGIES = ("bfs", "rcm", "degree", "rabbit")
+
+
+def make_grid(side, seed=None):
+    """Return an undirected side x side grid, with vertices added shuffled.
+
+    Vertex (x, y) has id x * side + y. Random insertion order scatters
+    neighbors across the arrays, like ids handed out as users sign up.
+    """
+    rng = random.Random(seed)
+    keys = list(range(side * side))
+    rng.shuffle(keys)
+    g = Graph(directed=False)
+    for key in keys:
+        g.add_vertex(key)
+    for x in range(side):
+        for y in range(side):
+            key = x * side + y
+            if x + 1 < side:
+                g.add_edge(key, key + side)
+            if y + 1 < side:
+                g.add_edge(key, key + 1)
+    return g
+
+
+def time_searches(compact, sources):
+    """Return the time taken to search from every source once."""
+    started = time.perf_counter()
+    for key in sources:
+        compact.eccentricity(key)
+    return time.perf_counter() - started
+
+
+def run(graph, strategies=STRATEGIES, num_sources=20, repeat=3, seed=None):
+    """Return a list of (strategy, average gap, seconds) rows.
+
+    The first row, with strategy None, is the graph in vert_list order.
+    seconds is the best of repeat rounds. Each round times every order once,
+    one after another and starting from a different order each round, so
+    changes in machine load and warm-up hit them all alike.
+    """
+    compact = graph.freeze()
+    rng = random.Random(seed)
+    sources = [rng.choice(compact.ids) for _ in range(num_sources)]
+
+    graphs = [(None, compact)]
+    graphs.extend((strategy, compact.reorder(strategy, seed=seed))
+                  for strategy in strategies)
+    best = [None] * len(graphs)
+    for round_number in range(repeat):
+        for step in range(len(graphs)):
+            k = (round_number + step) % len(graphs)
+            elapsed = time_searches(graphs[k][1], sources)
+            best[k] = elapsed if best[k] is None else min(best[k], elapsed)
+    return [(strategy, g.average_gap(), seconds)
+            for (strategy, g), seconds in zip(graphs, best)]
+
+
+def main(argv=None):
+    """Build or load a graph, and print the timings of every order."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("graph_file", nargs="?",
+                        help="graph file in the G/D text format; a shuffled "
+                             "grid is built if left out")
+    parser.add_argument("--side", type=int, default=200,
+                        help="side of the generated grid")
+    parser.add_argument("--sources", type=int, default=20,
+                        help="number of searches per timing")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.graph_file is None:
+        graph = make_grid(args.side, args.seed)
+    else:
+        graph = Graph()
+        graph.make_graph_from_file(args.graph_file)
+
+    rows = run(graph, num_sources=args.sources, repeat=args.repeat,
+               seed=args.seed)
+    baseline = rows[0][2]
+    print(f"{'order':<10}{'avg gap':>12}{'seconds':>10}{'speedup':>9}")
+    for strategy, gap, seconds in rows:
+        name = "insertion" if strategy is None else strategy
+        print(f"{name:<10}{gap:>12.1f}{seconds:>10.3f}"
+              f"{baseline / seconds:>8.2f}x")
+    return rows
+
+
+if __name__ == "__main__":
+    main()
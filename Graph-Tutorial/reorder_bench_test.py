@@ -0,0 +1,33 @@
+#!python
+
+import reorder_bench
+import contextlib
+import io
+import unittest
+
+
+class ReorderBenchTest(unittest.TestCase):
+
+    def test_run(self):
+        g = reorder_bench.make_grid(10, seed=0)
+        assert g.num_vertices == 100
+        assert len(g.get_edge_list()) == 180
+        rows = reorder_bench.run(g, num_sources=2, repeat=1, seed=0)
+        self.assertEqual([row[0] for row in rows],
+                         [None] + list(reorder_bench.STRATEGIES))
+        gaps = dict((row[0], row[1]) for row in rows)
+        # Breadth first orders keep grid neighbors closer than shuffling
+        assert gaps["bfs"] < gaps[None]
+        assert gaps["rcm"] < gaps[None]
+
+    def test_main(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            reorder_bench.main(["--side", "6", "--sources", "2",
+                                "--repeat", "1"])
+        self.assertIn("rabbit", output.getvalue())
+        self.assertIn("speedup", output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,239 @@
+#!python
+
+"""Run breadth first queries over a graph split across worker processes.
+
+ShardedGraph partitions a graph (see CompactGraph.partition) and starts one
+worker process per shard. A worker holds only the edges leaving the vertices
+it owns, and the search state of those vertices. The coordinator runs each
+search one level at a time. Each worker expands the vertices it found on the
+level: neighbors it owns stay inside the worker for the next level, and only
+neighbors owned by other shards come back, grouped by shard, for the
+coordinator to pass on. Edges inside a shard never cross a process boundary.
+
+Vertices are passed around as vertex indices, and turned back into ids by
+the coordinator. Once the workers are loaded, the coordinator keeps only the
+ids and the shard of every vertex, not the adjacency.
+"""
+
+import multiprocessing
+
+from compact_graph import CompactGraph
+
+
+def _shard_worker(connection, shard, owners):
+    """Answer search messages for one shard until told to stop.
+
+    shard: the number of this worker's shard
+    owners: sequence giving the shard of every vertex index
+    The worker's adjacency arrives in a "load" message: a dictionary mapping
+    each owned vertex index to the indices of its neighbors.
+    """
+    adjacency = {}
+    # Parents of the owned vertices found by the current search
+    parents = {}
+    # (vertex, parent) pairs found inside the shard, for the next level
+    pending = []
+    # Vertices of other shards already sent on, which their owner has found
+    sent = set()
+    target = None
+    while True:
+        message = connection.recv()
+        command = message[0]
+        if command == "load":
+            adjacency = message[1]
+            connection.send(None)
+        elif command == "start":
+            parents = {}
+            pending = []
+            sent = set()
+            target = message[1]
+            connection.send(None)
+        elif command == "expand":
+            # message[1] holds (vertex, parent) pairs from other shards, and
+            # message[2] asks for the found vertices rather than a count
+            found = []
+            outgoing = {}
+            candidates = pending + message[1]
+            pending = []
+            for vertex, parent in candidates:
+                if vertex in parents:
+                    continue
+                parents[vertex] = parent
+                found.append(vertex)
+                for neighbor in adjacency[vertex]:
+                    owner = owners[neighbor]
+                    if owner == shard:
+                        if neighbor not in parents:
+                            pending.append((neighbor, vertex))
+                    elif neighbor not in sent:
+                        sent.add(neighbor)
+                        outgoing.setdefault(owner, []).append(
+                            (neighbor, vertex))
+            connection.send((found if message[2] else len(found), outgoing,
+                             len(pending) > 0, target in parents))
+        elif command == "path":
+            # Follow parents back while they stay in this shard
+            path = [message[1]]
+            while True:
+                parent = parents[path[-1]]
+                if parent == path[-1]:
+                    # Only the start vertex is its own parent
+                    break
+                path.append(parent)
+                if owners[parent] != shard:
+                    break
+            connection.send(path)
+        elif command == "stop":
+            connection.close()
+            return
+        else:
+            connection.send(ValueError(f"Unknown command {command!r}"))
+
+
+class ShardedGraph(object):
+    """A graph whose shards live in separate worker processes."""
+
+    def __init__(self, graph, k=2, parts=None, method="fennel", seed=None,
+                 passes=1):
+        """Partition graph into k shards, and start a worker for each.
+
+        graph: a Graph or a CompactGraph
+        parts: shard of every vertex index, in vert_list order; if None,
+            the graph is partitioned with method, seed and passes
+        """
+        compact = graph if isinstance(graph, CompactGraph) else graph.freeze()
+        if parts is None:
+            parts = compact.partition(k, method=method, seed=seed,
+                                      passes=passes)
+        self.ids = compact.ids
+        self.index = compact.index
+        self.parts = parts
+        self.num_shards = k
+        # Number of (vertex, parent) messages passed between shards
+        self.messages = 0
+
+        self._connections = []
+        self._workers = []
+        for shard in range(k):
+            parent_end, child_end = multiprocessing.Pipe()
+            worker = multiprocessing.Process(
+                target=_shard_worker, args=(child_end, shard, parts),
+                daemon=True)
+            worker.start()
+            child_end.close()
+            self._connections.append(parent_end)
+            self._workers.append(worker)
+
+        # Send each worker its own edges, one shard at a time, so the
+        # coordinator never holds more than one shard's adjacency
+        for shard in range(k):
+            adjacency = {i: list(compact.neighbors(i))
+                         for i in range(compact.num_vertices)
+                         if parts[i] == shard}
+            self._ask(shard, ("load", adjacency))
+
+    def __enter__(self):
+        """Return the sharded graph, for use in a with statement."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stop the workers at the end of a with statement."""
+        self.close()
+
+    def close(self):
+        """Stop every worker process."""
+        for connection in self._connections:
+            connection.send(("stop",))
+            connection.close()
+        for worker in self._workers:
+            worker.join()
+        self._connections = []
+        self._workers = []
+
+    def _get_index(self, key):
+        """Return the index of the vertex with the given id, else KeyError."""
+        if key not in self.index:
+            raise KeyError(f"Vertex({key}) is not in the Graph")
+        return self.index[key]
+
+    def _ask(self, shard, message):
+        """Send one message to a shard's worker, and return its reply."""
+        self._connections[shard].send(message)
+        return self._connections[shard].recv()
+
+    def _levels(self, start, target=None, report=None):
+        """Generate each level of a breadth first search from start.
+
+        Yields (found, reached) per level, where reached is True once the
+        target vertex index has been found. found is the list of vertex
+        indices first found on the level if its number is report, else
+        only how many there were.
+        """
+        for connection in self._connections:
+            connection.send(("start", target))
+        for connection in self._connections:
+            connection.recv()
+
+        inbox = {self.parts[start]: [(start, start)]}
+        # Shards holding vertices found inside the shard for the next level
+        busy = set()
+        level_number = 0
+        while len(inbox) > 0 or len(busy) > 0:
+            # Every shard with work takes its part of the level at once
+            shards = set(inbox) | busy
+            want = level_number == report
+            for shard in shards:
+                messages = inbox.get(shard, [])
+                self.messages += len(messages)
+                self._connections[shard].send(("expand", messages, want))
+            found = [] if want else 0
+            reached = False
+            next_inbox = {}
+            busy = set()
+            for shard in shards:
+                shard_found, outgoing, pending, shard_reached = \
+                    self._connections[shard].recv()
+                found += shard_found
+                reached = reached or shard_reached
+                if pending:
+                    busy.add(shard)
+                for owner, messages in outgoing.items():
+                    next_inbox.setdefault(owner, []).extend(messages)
+            if len(found) == 0 if want else found == 0:
+                return
+            yield found, reached
+            inbox = next_inbox
+            level_number += 1
+
+    def breadth_first_search(self, vertex, n):
+        """Return the ids of the vertices whose shortest path has n edges.
+
+        Matches Graph.breadth_first_search with only_new set.
+        """
+        start = self._get_index(vertex)
+        for level_number, (found, _) in enumerate(
+                self._levels(start, report=n)):
+            if level_number == n:
+                return {self.ids[i] for i in found}
+        return set()
+
+    def find_shortest_path(self, start, end):
+        """Return the ids on a shortest path from start to end, or None."""
+        start_index = self._get_index(start)
+        end_index = self._get_index(end)
+        # Like Graph.find_shortest_path, there is no path to the same vertex
+        if start_index == end_index:
+            return None
+
+        for _, reached in self._levels(start_index, target=end_index):
+            if reached:
+                break
+        else:
+            return None
+
+        # Each shard on the path walks back through the part it owns
+        path = [end_index]
+        while path[-1] != start_index:
+            path.extend(self._ask(self.parts[path[-1]],
+                                  ("path", path[-1]))[1:])
+        return [self.ids[i] for i in reversed(path)]
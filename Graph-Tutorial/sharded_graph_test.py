@@ -0,0 +1,101 @@
+#!python
+
+from graph import Graph
+from graph_fixtures import make_graph
+from sharded_graph import ShardedGraph
+import random
+import unittest
+
+
+def make_groups(num_groups, size, seed):
+    """Create an undirected graph of dense groups with a few edges between."""
+    rng = random.Random(seed)
+    g = Graph(directed=False)
+    keys = list(range(num_groups * size))
+    rng.shuffle(keys)
+    for key in keys:
+        g.add_vertex(key)
+    for a in range(num_groups * size):
+        for b in range(a + 1, num_groups * size):
+            same_group = a // size == b // size
+            if rng.random() < (0.5 if same_group else 0.002):
+                g.add_edge(a, b)
+    return g
+
+
+class PartitionTest(unittest.TestCase):
+
+    def test_partition(self):
+        g = make_groups(4, 25, seed=0)
+        compact = g.freeze()
+        for method in ("ldg", "fennel"):
+            parts = g.partition(4, method, seed=1, passes=3)
+            assert len(parts) == 100
+            # No shard goes over its capacity
+            for shard in range(4):
+                assert list(parts).count(shard) <= 28
+            # Far fewer edges are cut than by a random split
+            rng = random.Random(2)
+            random_parts = [rng.randrange(4) for _ in range(100)]
+            assert compact.cut_size(parts) * 3 < \
+                compact.cut_size(random_parts)
+
+        # One shard cuts nothing
+        self.assertEqual(list(g.partition(1)), [0] * 100)
+        with self.assertRaises(ValueError):
+            g.partition(0)
+        with self.assertRaises(ValueError):
+            g.partition(2, "metis")
+        # Shards below the average size can't hold every vertex
+        with self.assertRaises(ValueError):
+            g.partition(4, balance=0.5)
+
+
+class ShardedGraphTest(unittest.TestCase):
+
+    def test_traversals(self):
+        g = make_graph()
+        for k in (1, 2, 3):
+            with ShardedGraph(g, k, seed=k) as sharded:
+                # Breadth first search matches the Graph
+                for n in range(0, 6):
+                    expected = g.breadth_first_search(g.get_vertex("A"), n)
+                    self.assertEqual(sharded.breadth_first_search("A", n),
+                                     {v.id for v in expected})
+
+                # Shortest paths have the same length as the Graph's
+                for start in g.vert_list:
+                    for end in g.vert_list:
+                        path = sharded.find_shortest_path(start, end)
+                        expected = g.find_shortest_path(start, end)
+                        if expected is None:
+                            self.assertEqual(path, None)
+                            continue
+                        self.assertEqual(len(path), len(expected))
+                        self.assertEqual((path[0], path[-1]), (start, end))
+                        for a, b in zip(path, path[1:]):
+                            assert g.get_vertex(b) in \
+                                g.get_vertex(a).neighbors
+
+                with self.assertRaises(KeyError):
+                    sharded.find_shortest_path("A", "Y")
+                assert sharded.messages > 0
+
+    def test_given_parts(self):
+        g = make_groups(2, 10, seed=3)
+        parts = [key // 10 for key in g.vert_list]
+        cut = g.freeze().cut_size(parts)
+        with ShardedGraph(g, 2, parts=parts) as sharded:
+            for n in range(4):
+                expected = g.breadth_first_search(g.get_vertex(0), n)
+                self.assertEqual(sharded.breadth_first_search(0, n),
+                                 {v.id for v in expected})
+            # Edges inside a shard are expanded by its worker, so a full
+            # search only passes on the start and each cut edge's ends
+            sharded.messages = 0
+            sharded.breadth_first_search(0, 100)
+            assert sharded.messages <= 1 + 2 * cut
+
+
+if __name__ == '__main__':
+    unittest.main()